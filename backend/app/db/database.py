@@ -1,77 +1,159 @@
 import os
+import ssl
 import tempfile
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
+from .pool import TimedAsyncQueuePool, TimedQueuePool, instrument_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 CA_CERT = os.getenv("CA_CERT")  # Full certificate content (multiline or \n)
+# Optional explicit URL for the async engine; derived from DATABASE_URL when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool sizing, per engine. Request handlers use the async engine; the sync
+# engine serves the enrichment worker, registries and scripts.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))  # Recycle connections every hour
+# true: ping on every checkout (one extra round trip each). false: only connections idle
+# for longer than DB_POOL_PING_IDLE_SECONDS are checked (see app/db/pool.py)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "300"))
+
+# Async drivers used in place of the synchronous ones
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "mysql": "aiomysql"}
+
+_ca_cert_path = None
+
+def _write_ca_cert():
+    """Write CA_CERT to a temporary file once and return its path"""
+    global _ca_cert_path
+    if _ca_cert_path is None:
+        ca_cert_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pem", mode='w')
+        ca_cert_file.write(CA_CERT.replace('\\n', '\n'))  # Handle escaped newlines
+        ca_cert_file.close()
+        _ca_cert_path = ca_cert_file.name
+    return _ca_cert_path
+
+def _sqlite_url(driver=None):
+    db_path = os.path.join(os.path.dirname(__file__), "..", "..", "digital_wardrobe.db")
+    return f"sqlite+{driver}:///{db_path}" if driver else f"sqlite:///{db_path}"
+
+def _pool_options(name, pool_class):
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+
+def _instrument(engine, name):
+    instrument_engine(engine, name, ping_idle_seconds=None if DB_POOL_PRE_PING else DB_POOL_PING_IDLE_SECONDS)
+    return engine
 
 def create_database_engine():
     """Create database engine with proper SSL configuration for Aiven MySQL"""
     
     # Use SQLite for development if no DATABASE_URL is provided
     if not DATABASE_URL:
-        db_path = os.path.join(os.path.dirname(__file__), "..", "..", "digital_wardrobe.db")
-        database_url = f"sqlite:///{db_path}"
+        database_url = _sqlite_url()
         print(f"Using SQLite database: {database_url}")
         
         engine = create_engine(
             database_url,
-            pool_pre_ping=True,
+            **_pool_options("sync", TimedQueuePool),
             echo=False
         )
-        return engine
+        return _instrument(engine, "sync")
     
     # Check if we need SSL configuration (for Aiven MySQL)
     if CA_CERT and CA_CERT.strip():
-        # Write CA cert to a temporary file
-        ca_cert_file = tempfile.NamedTemporaryFile(delete=False, suffix=".pem", mode='w')
-        ca_cert_file.write(CA_CERT.replace('\\n', '\n'))  # Handle escaped newlines
-        ca_cert_file.close()
-        
         # Connect with SQLAlchemy using temp CA cert
         connect_args = {
             "ssl": {
-                "ca": ca_cert_file.name
+                "ca": _write_ca_cert()
             }
         }
         
         engine = create_engine(
             DATABASE_URL,
             connect_args=connect_args,
-            pool_pre_ping=True,
-            pool_recycle=3600,  # Recycle connections every hour
+            **_pool_options("sync", TimedQueuePool),
             echo=False  # Set to True for SQL debugging
         )
     else:
         # For local development or non-SSL connections
         engine = create_engine(
             DATABASE_URL,
-            pool_pre_ping=True,
-            pool_recycle=3600,
+            **_pool_options("sync", TimedQueuePool),
             echo=False
         )
     
+    return _instrument(engine, "sync")
+
+def async_database_url(url=None):
+    """The async-driver form of a database URL (sqlite -> aiosqlite, mysql -> aiomysql)"""
+    if not url:
+        return _sqlite_url(ASYNC_DRIVERS["sqlite"])
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+def create_async_database_engine():
+    """Create the async engine used by the API routers (same database as the sync engine)"""
+    database_url = ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+
+    connect_args = {}
+    if CA_CERT and CA_CERT.strip() and make_url(database_url).get_backend_name() != "sqlite":
+        # aiomysql takes an SSLContext rather than PyMySQL's {"ca": path} dict
+        connect_args["ssl"] = ssl.create_default_context(cafile=_write_ca_cert())
+
+    engine = create_async_engine(
+        database_url,
+        connect_args=connect_args,
+        **_pool_options("async", TimedAsyncQueuePool),
+        echo=False
+    )
+    _instrument(engine.sync_engine, "async")
     return engine
 
-# Create the engine
+# Create the engines. The sync engine serves background workers, migrations and CLI
+# tools; request handlers use the async engine so database waits do not block the
+# event loop.
 engine = create_database_engine()
+async_engine = create_async_database_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: objects stay readable after commit, since an expired
+# attribute cannot be lazily reloaded outside of an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
-    """Dependency to get database session"""
+    """Dependency to get a synchronous database session (background work, scripts)"""
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_async_db():
+    """Dependency to get an async database session for request handlers"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def test_database_connection():
     """Test database connection"""
     try:
@@ -0,0 +1,245 @@
+# Lightweight, idempotent schema migrations.
+# The app has no Alembic setup: tables are created with Base.metadata.create_all,
+# which never alters existing tables. This module fills that gap for the
+# additive changes we ship (new columns, new tables, data conversions) and
+# records what has been applied in a small `schema_migrations` table.
+
+import logging
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, LargeBinary, MetaData, String, Table, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from .database import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+_migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations", _migration_metadata,
+    Column("id", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+# --- Helpers ---
+
+def table_exists(connection: Connection, table_name: str) -> bool:
+    return inspect(connection).has_table(table_name)
+
+
+def column_exists(connection: Connection, table_name: str, column_name: str) -> bool:
+    if not table_exists(connection, table_name):
+        return False
+    return any(col["name"] == column_name for col in inspect(connection).get_columns(table_name))
+
+
+def add_column_if_missing(connection: Connection, table_name: str, column: Column):
+    """Adds a standalone `column` (e.g. Column("ai_status", String(20))) to an existing table."""
+    if not table_exists(connection, table_name):
+        # Table will be created with the column by create_all.
+        return
+    if column_exists(connection, table_name, column.name):
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column.name} {column_type}"))
+    logger.info(f"Added column {table_name}.{column.name} ({column_type})")
+
+
+def drop_column_if_exists(connection: Connection, table_name: str, column_name: str):
+    if not column_exists(connection, table_name, column_name):
+        return
+    connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {column_name}"))
+    logger.info(f"Dropped column {table_name}.{column_name}")
+
+
+def create_table_if_missing(connection: Connection, table: Table):
+    table.create(bind=connection, checkfirst=True)
+
+
+# --- Migrations ---
+
+def _0001_wardrobe_item_ai_status(connection: Connection):
+    from .. import model as models
+    add_column_if_missing(connection, "wardrobe_items", Column("ai_status", String(20)))
+    create_table_if_missing(connection, models.EnrichmentJob.__table__)
+
+
+def _0002_binary_embeddings(connection: Connection, batch_size: int = 500):
+    """Rewrites JSON float-list embeddings into the EmbeddingBlob binary format."""
+    from .types import decode_embedding, encode_embedding, is_encoded_embedding
+
+    if not column_exists(connection, "wardrobe_items", "ai_embedding"):
+        return
+
+    if connection.dialect.name == "mysql":
+        # MySQL validates JSON columns, so the column must become a BLOB before binary values fit.
+        column = next(col for col in inspect(connection).get_columns("wardrobe_items") if col["name"] == "ai_embedding")
+        if "JSON" in str(column["type"]).upper():
+            blob_type = LargeBinary().compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE wardrobe_items MODIFY ai_embedding {blob_type} NULL"))
+            logger.info(f"Changed wardrobe_items.ai_embedding to {blob_type}")
+
+    converted = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text("SELECT id, ai_embedding FROM wardrobe_items "
+                 "WHERE id > :last_id AND ai_embedding IS NOT NULL ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": batch_size}
+        ).all()
+        if not rows:
+            break
+        updates = []
+        for item_id, raw in rows:
+            if is_encoded_embedding(raw):
+                continue
+            try:
+                values = decode_embedding(raw)
+            except (ValueError, UnicodeDecodeError):
+                values = None
+            updates.append({"id": item_id, "blob": encode_embedding(values) if values is not None else None})
+        if updates:
+            connection.execute(text("UPDATE wardrobe_items SET ai_embedding = :blob WHERE id = :id"), updates)
+            converted += len(updates)
+        last_id = rows[-1][0]
+
+    if converted:
+        logger.info(f"Converted {converted} wardrobe item embedding(s) to binary storage")
+
+
+def _0003_occasion_text_embedding(connection: Connection):
+    add_column_if_missing(connection, "occasions", Column("text_embedding", LargeBinary))
+    add_column_if_missing(connection, "occasions", Column("text_embedding_key", String(64)))
+
+
+def _0004_outfit_embedding(connection: Connection):
+    """Adds outfits.outfit_embedding and fills it from the outfits' current items."""
+    from ..services.outfit_embeddings import compute_outfit_embedding
+    from .types import decode_embedding, encode_embedding
+
+    if not table_exists(connection, "outfits"):
+        return
+    add_column_if_missing(connection, "outfits", Column("outfit_embedding", LargeBinary))
+
+    item_embeddings = {}
+    rows = connection.execute(text(
+        "SELECT a.outfit_id, w.ai_embedding FROM outfit_item_association a "
+        "JOIN wardrobe_items w ON w.id = a.wardrobe_item_id WHERE w.ai_embedding IS NOT NULL"
+    ))
+    for outfit_id, raw in rows:
+        item_embeddings.setdefault(outfit_id, []).append(decode_embedding(raw))
+
+    updates = []
+    for outfit_id, embeddings in item_embeddings.items():
+        embedding = compute_outfit_embedding(embeddings)
+        if embedding is not None:
+            updates.append({"id": outfit_id, "blob": encode_embedding(embedding)})
+    if updates:
+        connection.execute(text("UPDATE outfits SET outfit_embedding = :blob WHERE id = :id"), updates)
+        logger.info(f"Computed embeddings for {len(updates)} outfit(s)")
+
+
+def _0005_user_wardrobe_stats(connection: Connection):
+    """Creates the materialized per-user statistics table and fills it."""
+    from .. import model as models
+    from ..services.wardrobe_stats import rebuild_stats
+
+    if not all(table_exists(connection, table) for table in ("users", "wardrobe_items", "outfits")):
+        return
+    create_table_if_missing(connection, models.UserWardrobeStats.__table__)
+    logger.info(f"Computed wardrobe statistics for {rebuild_stats(connection)} user(s)")
+
+
+def _0006_keyset_pagination_indexes(connection: Connection):
+    """Adds the (user_id, date, id) indexes behind cursor pagination of the list endpoints."""
+    from .. import model as models
+
+    names = {
+        "ix_wardrobe_items_user_date_added_id", "ix_outfits_user_created_at_id", "ix_weekly_plans_user_start_date_id",
+        "ix_occasions_user_date_id", "ix_style_history_user_date_worn_id",
+    }
+    for model in (models.WardrobeItem, models.Outfit, models.WeeklyPlan, models.Occasion, models.StyleHistory):
+        table = model.__table__
+        if not table_exists(connection, table.name):
+            continue
+        existing = {index["name"] for index in inspect(connection).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in names and index.name not in existing:
+                index.create(bind=connection)
+                logger.info(f"Created index {index.name} on {table.name}")
+
+
+def _0007_item_compatibility(connection: Connection):
+    """
+    Creates the persisted item compatibility table. Rows are not backfilled here: each
+    user's missing rows are computed the first time their table is loaded.
+    """
+    from .. import model as models
+
+    if not all(table_exists(connection, table) for table in ("users", "wardrobe_items")):
+        return
+    create_table_if_missing(connection, models.ItemCompatibility.__table__)
+
+
+def _0008_enrichment_retry_backoff(connection: Connection):
+    add_column_if_missing(connection, "enrichment_jobs", Column("not_before", DateTime))
+
+
+def _0009_wear_count_index(connection: Connection):
+    """
+    Replaces the materialized per-item wear counts of the statistics rows with a
+    (user_id, times_worn) index the most/least worn queries read.
+    """
+    from .. import model as models
+
+    drop_column_if_exists(connection, "user_wardrobe_stats", "wear_counts")
+    if not table_exists(connection, "wardrobe_items"):
+        return
+    existing = {index["name"] for index in inspect(connection).get_indexes("wardrobe_items")}
+    for index in models.WardrobeItem.__table__.indexes:
+        if index.name == "ix_wardrobe_items_user_times_worn" and index.name not in existing:
+            index.create(bind=connection)
+            logger.info(f"Created index {index.name} on wardrobe_items")
+
+
+# Ordered list of (migration_id, function). Never reorder or rename applied entries.
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_wardrobe_item_ai_status", _0001_wardrobe_item_ai_status),
+    ("0002_binary_embeddings", _0002_binary_embeddings),
+    ("0003_occasion_text_embedding", _0003_occasion_text_embedding),
+    ("0004_outfit_embedding", _0004_outfit_embedding),
+    ("0005_user_wardrobe_stats", _0005_user_wardrobe_stats),
+    ("0006_keyset_pagination_indexes", _0006_keyset_pagination_indexes),
+    ("0007_item_compatibility", _0007_item_compatibility),
+    ("0008_enrichment_retry_backoff", _0008_enrichment_retry_backoff),
+    ("0009_wear_count_index", _0009_wear_count_index),
+]
+
+
+def run_migrations(engine: Engine = default_engine) -> List[str]:
+    """Applies pending migrations in order. Returns the ids that were applied."""
+    applied_now = []
+    _migration_metadata.create_all(bind=engine)
+
+    with engine.connect() as connection:
+        already_applied = set(connection.execute(select(schema_migrations.c.id)).scalars())
+
+    for migration_id, migration_fn in MIGRATIONS:
+        if migration_id in already_applied:
+            continue
+        logger.info(f"Applying schema migration {migration_id}")
+        with engine.begin() as connection:
+            migration_fn(connection)
+            connection.execute(schema_migrations.insert().values(id=migration_id, applied_at=datetime.utcnow()))
+        applied_now.append(migration_id)
+
+    return applied_now
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    applied = run_migrations()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
@@ -0,0 +1,185 @@
+# Connection pool instrumentation.
+# Engines are created with a QueuePool subclass that times how long each checkout
+# waits for a connection, and instrument_engine() attaches pool/engine event listeners
+# that count connects, checkouts, overflow, timeouts and disconnects. The counters are
+# exposed by get_pool_stats() (GET /metrics/db-pool) to size DB_POOL_SIZE and
+# DB_MAX_OVERFLOW for the actual load.
+#
+# Instead of pinging on every checkout (pool_pre_ping), connections that sat idle for
+# longer than DB_POOL_PING_IDLE_SECONDS are checked with one SELECT 1 when checked
+# out; a failed check discards the connection and the pool hands out a fresh one.
+# Connections that die while in use raise a disconnect error, on which SQLAlchemy
+# invalidates the pool so the stale connections are replaced.
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Number of recent checkout waits kept for the percentiles
+WAIT_SAMPLES = 1024
+
+
+class PoolMetrics:
+    """Counters for one engine's pool. Updated from pool events, possibly from several threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.disconnects = 0
+        self.timeouts = 0
+        self.idle_pings = 0
+        self.failed_pings = 0
+        self.max_checked_out = 0
+        self.max_overflow_used = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record_checkout(self, wait_seconds: Optional[float]):
+        with self._lock:
+            self.checkouts += 1
+            if wait_seconds is not None:
+                self.wait_seconds_total += wait_seconds
+                self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+                self._waits.append(wait_seconds)
+            if self.pool is not None:
+                self.max_checked_out = max(self.max_checked_out, self.pool.checkedout())
+                self.max_overflow_used = max(self.max_overflow_used, self.pool.overflow())
+
+    def increment(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "disconnects": self.disconnects,
+                "timeouts": self.timeouts,
+                "idle_pings": self.idle_pings,
+                "failed_pings": self.failed_pings,
+                "max_checked_out": self.max_checked_out,
+                "max_overflow_used": self.max_overflow_used,
+                "wait_ms_avg": round(1000 * self.wait_seconds_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "wait_ms_max": round(1000 * self.wait_seconds_max, 3),
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(0, pool.overflow()),
+            })
+        return stats
+
+
+class _TimedCheckoutMixin:
+    """Records how long each checkout waited for a connection (including connecting)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            metrics = _metrics_by_pool_name.get(self._orig_logging_name)
+            if metrics is not None:
+                metrics.increment("timeouts")
+            raise
+        record.info["checkout_wait"] = time.perf_counter() - started
+        return record
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_metrics_by_pool_name: Dict[str, PoolMetrics] = {}
+
+
+def _ping(dbapi_connection) -> bool:
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def instrument_engine(engine: Engine, name: str, ping_idle_seconds: Optional[float] = None) -> PoolMetrics:
+    """
+    Attaches metrics (and, with ping_idle_seconds, the idle liveness check) to an engine.
+    The engine's pool should be created with pool_logging_name=name so pool timeouts are
+    attributed to it. Pass engine.sync_engine for async engines.
+    """
+    metrics = PoolMetrics(name)
+    metrics.pool = engine.pool
+    _metrics_by_pool_name[name] = metrics
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.pool = engine.pool # The pool is replaced when the engine is disposed
+        checked_in_at = connection_record.info.pop("checked_in_at", None)
+        if ping_idle_seconds is not None and checked_in_at is not None \
+                and time.monotonic() - checked_in_at > ping_idle_seconds:
+            metrics.increment("idle_pings")
+            if not _ping(dbapi_connection):
+                metrics.increment("failed_pings")
+                logger.info(f"Discarding dead pooled connection ({name}) after {time.monotonic() - checked_in_at:.0f}s idle")
+                # The pool invalidates this connection and retries the checkout
+                raise exc.DisconnectionError()
+        metrics.record_checkout(connection_record.info.pop("checkout_wait", None))
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if context.is_disconnect:
+            metrics.increment("disconnects")
+            logger.warning(f"Database connection lost ({name}): {context.original_exception}")
+
+    return metrics
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Pool metrics of every instrumented engine, by name."""
+    return {name: metrics.snapshot() for name, metrics in _metrics_by_pool_name.items()}
@@ -0,0 +1,106 @@
+# Custom SQLAlchemy column types.
+#
+# EmbeddingBlob stores embedding vectors as a compact binary blob instead of a JSON
+# list of floats:
+#
+#   offset 0  2 bytes  magic b"WE"
+#   offset 2  1 byte   format version (currently 1)
+#   offset 3  1 byte   dtype code (1 = float32, 2 = float16)
+#   offset 4  4 bytes  element count, little-endian uint32
+#   offset 8  ...      little-endian element data
+#
+# Reads return a read-only NumPy array that views the blob's bytes (np.frombuffer),
+# so loading a row costs no JSON parsing and no per-float Python objects. Legacy JSON
+# values (rows written before the migration) are still decoded transparently.
+
+import json
+import os
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+EMBEDDING_MAGIC = b"WE"
+EMBEDDING_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<2sBBI")
+EMBEDDING_HEADER_SIZE = _HEADER.size
+
+_DTYPE_TO_CODE = {"float32": 1, "float16": 2}
+_CODE_TO_DTYPE = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+# float16 halves storage again at ~3 significant digits, plenty for cosine similarity.
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32").lower()
+
+
+def is_encoded_embedding(data: Any) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == EMBEDDING_MAGIC
+
+
+def encode_embedding(values: Any, dtype: str = EMBEDDING_STORAGE_DTYPE) -> bytes:
+    """Packs a 1-D sequence/array of floats into the versioned binary format."""
+    if dtype not in _DTYPE_TO_CODE:
+        raise ValueError(f"Unsupported embedding storage dtype: {dtype}")
+    code = _DTYPE_TO_CODE[dtype]
+    array = np.ascontiguousarray(np.asarray(values, dtype=_CODE_TO_DTYPE[code]).ravel())
+    return _HEADER.pack(EMBEDDING_MAGIC, EMBEDDING_FORMAT_VERSION, code, array.size) + array.tobytes()
+
+
+def decode_embedding(data: Any) -> Optional[np.ndarray]:
+    """
+    Unpacks a stored embedding. Binary blobs are returned as zero-copy views; legacy
+    JSON lists (str or bytes) are parsed into float32 arrays. Returns None for empty
+    or JSON-null values.
+    """
+    if data is None:
+        return None
+    if isinstance(data, np.ndarray):
+        return data
+    if isinstance(data, (list, tuple)):
+        return np.asarray(data, dtype=np.float32)
+
+    if is_encoded_embedding(data):
+        magic, version, code, count = _HEADER.unpack_from(data, 0)
+        if version != EMBEDDING_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding format version: {version}")
+        if code not in _CODE_TO_DTYPE:
+            raise ValueError(f"Unknown embedding dtype code: {code}")
+        return np.frombuffer(data, dtype=_CODE_TO_DTYPE[code], count=count, offset=EMBEDDING_HEADER_SIZE)
+
+    # Legacy JSON representation
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode("utf-8")
+    if isinstance(data, str):
+        if not data.strip():
+            return None
+        data = json.loads(data)
+    if isinstance(data, list) and all(isinstance(v, (int, float)) for v in data):
+        return np.asarray(data, dtype=np.float32) if data else None
+    return None # JSON null or a non-numeric value (e.g. an error message stored by old code)
+
+
+class EmbeddingBlob(TypeDecorator):
+    """Binary float32/float16 embedding column that loads as a NumPy array."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = EMBEDDING_STORAGE_DTYPE, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dtype = dtype
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if is_encoded_embedding(value):
+            return bytes(value)
+        return encode_embedding(value, dtype=self.dtype)
+
+    def process_result_value(self, value, dialect):
+        return decode_embedding(value)
+
+    def compare_values(self, x, y):
+        # The default `x == y` is element-wise (and ambiguous) for arrays.
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(np.asarray(x), np.asarray(y))
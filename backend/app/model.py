@@ -1,10 +1,11 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Table, Text, JSON, Date
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, DateTime, Float, Boolean, ForeignKey, Table, Text, JSON, Date, LargeBinary, Index
 from sqlalchemy.orm import relationship, sessionmaker
 #from sqlalchemy.ext.declarative import declarative_base # Base is imported, declarative_base not directly used
 from datetime import datetime
 #import json # SQLAlchemy's JSON type handles serialization
 import json
 from .db.database import Base # Import Base from the new database.py
+from .db.types import EmbeddingBlob
 
 # Association table for Outfit and WardrobeItem (many-to-many)
 outfit_item_association = Table('outfit_item_association', Base.metadata,
@@ -32,6 +33,11 @@ class User(Base):
 
 class WardrobeItem(Base):
     __tablename__ = "wardrobe_items"
+    # Keyset pagination of list endpoints (services/pagination.py)
+    __table_args__ = (
+        Index("ix_wardrobe_items_user_date_added_id", "user_id", "date_added", "id"),
+        Index("ix_wardrobe_items_user_times_worn", "user_id", "times_worn"), # Most/least worn statistics
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(255), nullable=False, index=True)
@@ -42,8 +48,9 @@ class WardrobeItem(Base):
     material = Column(String(255), nullable=True)
     season = Column(String(50), nullable=True, index=True) # e.g., Summer, Winter, All Seasons
     image_url = Column(String(2048), nullable=True)
-    ai_embedding = Column(JSON, nullable=True)
+    ai_embedding = Column(EmbeddingBlob(), nullable=True) # Binary float vector, loads as a NumPy array
     ai_dominant_colors = Column(JSON, nullable=True)
+    ai_status = Column(String(20), nullable=True) # pending, processing, completed, failed (None when there is no image)
     _tags = Column("tags", Text, nullable=True) # Store as JSON string
     favorite = Column(Boolean, default=False)
     times_worn = Column(Integer, default=0)
@@ -54,6 +61,8 @@ class WardrobeItem(Base):
     owner = relationship("User", back_populates="wardrobe_items")
     outfits_associated = relationship("Outfit", secondary=outfit_item_association, back_populates="items")
     style_history_entries = relationship("StyleHistory", back_populates="item_worn")
+    enrichment_jobs = relationship("EnrichmentJob", back_populates="item", cascade="all, delete-orphan")
+    compatibility = relationship("ItemCompatibility", back_populates="item", uselist=False, cascade="all, delete-orphan")
 
 
     @property
@@ -67,6 +76,7 @@ class WardrobeItem(Base):
 
 class Outfit(Base):
     __tablename__ = "outfits"
+    __table_args__ = (Index("ix_outfits_user_created_at_id", "user_id", "created_at", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(255), nullable=False, index=True)
@@ -74,6 +84,7 @@ class Outfit(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     _tags = Column("tags", Text, nullable=True) # Store as JSON string
     image_url = Column(String(2048), nullable=True) # For a composed image of the outfit
+    outfit_embedding = Column(EmbeddingBlob(), nullable=True) # Mean item embedding, see services/outfit_embeddings.py
 
     owner = relationship("User", back_populates="outfits")
     items = relationship("WardrobeItem", secondary=outfit_item_association, back_populates="outfits_associated")
@@ -97,6 +108,7 @@ class Outfit(Base):
 
 class WeeklyPlan(Base):
     __tablename__ = "weekly_plans"
+    __table_args__ = (Index("ix_weekly_plans_user_start_date_id", "user_id", "start_date", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(255), nullable=False) # e.g., "Work Week Outfits", "Vacation Plan"
@@ -122,12 +134,15 @@ class WeeklyPlanDayOutfit(Base):
 
 class Occasion(Base):
     __tablename__ = "occasions"
+    __table_args__ = (Index("ix_occasions_user_date_id", "user_id", "date", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String(255), nullable=False, index=True) # E.g., "Wedding Guest", "Beach Party"
     date = Column(DateTime, nullable=True)
     outfit_id = Column(Integer, ForeignKey("outfits.id"), nullable=True)
     notes = Column(Text, nullable=True)
+    text_embedding = Column(EmbeddingBlob(), nullable=True) # Sentence embedding of name + notes
+    text_embedding_key = Column(String(64), nullable=True) # services/text_embeddings.py key the embedding was computed for
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -137,6 +152,7 @@ class Occasion(Base):
 
 class StyleHistory(Base):
     __tablename__ = "style_history"
+    __table_args__ = (Index("ix_style_history_user_date_worn_id", "user_id", "date_worn", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     item_id = Column(Integer, ForeignKey("wardrobe_items.id"), nullable=True)
@@ -175,6 +191,59 @@ class Feedback(Base):
 
 
 
+class EnrichmentJob(Base):
+    """Out-of-band AI enrichment (embedding + dominant colors) for an uploaded item image."""
+    __tablename__ = "enrichment_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("wardrobe_items.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    image_url = Column(String(2048), nullable=False) # Image the job was queued for; stale jobs are cancelled
+    status = Column(String(20), nullable=False, default="pending", index=True) # pending, running, completed, failed, cancelled
+    attempts = Column(Integer, nullable=False, default=0)
+    not_before = Column(DateTime, nullable=True) # Retry backoff: not claimed before this time
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    item = relationship("WardrobeItem", back_populates="enrichment_jobs")
+
+
+class ItemCompatibility(Base):
+    """
+    One wardrobe item's pairwise compatibility with the rest of its owner's wardrobe,
+    recomputed whenever the item changes. For a pair of items the newer of their two
+    rows holds the current scores (see services/compatibility_table.py).
+    """
+    __tablename__ = "item_compatibility"
+    item_id = Column(Integer, ForeignKey("wardrobe_items.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    version = Column(BigInteger, nullable=False) # Microsecond timestamp of the computation
+    embedding_dim = Column(Integer, nullable=False, default=0) # 0 when the item had no embedding
+    partner_ids = Column(LargeBinary(length=2**24), nullable=False) # int64 ids of the other items
+    style_similarity = Column(EmbeddingBlob("float32", length=2**24), nullable=False) # Embedding cosine per partner; NaN if not comparable
+    color_harmony = Column(EmbeddingBlob("float32", length=2**24), nullable=False) # Harmony of the pair's combined colors
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    item = relationship("WardrobeItem", back_populates="compatibility")
+
+
+class UserWardrobeStats(Base):
+    """
+    A user's wardrobe counts, kept up to date incrementally as items and outfits change
+    (see services/wardrobe_stats.py).
+    """
+    __tablename__ = "user_wardrobe_stats"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_items = Column(Integer, nullable=False, default=0)
+    total_outfits = Column(Integer, nullable=False, default=0)
+    favorite_items_count = Column(Integer, nullable=False, default=0)
+    items_by_category = Column(JSON, nullable=False) # Dict[str, int]
+    items_by_season = Column(JSON, nullable=False) # Dict[str, int]
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+
 # Example usage for creating tables (typically in main.py or a setup script)
 # if __name__ == "__main__":
 #     from .db.database import engine
@@ -0,0 +1,67 @@
+# Fast JSON responses.
+# NumpyORJSONResponse is the application's default response class: it encodes with
+# orjson, which is several times faster than the standard library encoder and
+# serializes NumPy arrays natively (OPT_SERIALIZE_NUMPY), without turning each
+# element into a Python float first.
+#
+# Schemas declare embedding fields as EmbeddingVector, which keeps the NumPy array the
+# ORM column loads. Routes with large payloads can return model_response(...), which
+# skips FastAPI's JSON-mode re-serialization of the (already validated) models so the
+# arrays reach orjson untouched.
+
+from decimal import Decimal
+from typing import Annotated, Any, Optional
+
+import numpy as np
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, BeforeValidator, PlainSerializer, WithJsonSchema
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value: Any) -> Any:
+    # Called by orjson for types it does not serialize natively
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="python")
+    if isinstance(value, np.ndarray): # Non-contiguous array or a dtype orjson does not support
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class NumpyORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> NumpyORJSONResponse:
+    """Response for validated Pydantic models (or lists/dicts of them), serialized in one orjson pass."""
+    return NumpyORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+
+def _to_vector(value: Any) -> Any:
+    if value is None or isinstance(value, np.ndarray):
+        return value
+    return np.asarray(value, dtype=np.float32)
+
+
+# An embedding held as a NumPy array. JSON-mode dumps (FastAPI's response_model path)
+# produce a list; python-mode dumps keep the array for orjson.
+EmbeddingVector = Annotated[
+    Any,
+    BeforeValidator(_to_vector),
+    PlainSerializer(lambda vector: vector.tolist(), when_used="json-unless-none"),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}}),
+]
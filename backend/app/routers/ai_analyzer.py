@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List # Required for List type hint if not already imported
 
 from ..import tables as schemas, model as models # Assuming models might be needed later
 from ..security import get_current_user
-from ..db.database import get_db
+from ..db.database import get_async_db
 from ..services.ai_services import analyze_outfit_image_service # Import the service
 
 router = APIRouter(
@@ -16,7 +16,7 @@ router = APIRouter(
 @router.post("/analyze-outfit/", response_model=schemas.OutfitAnalysisResponse)
 async def analyze_outfit_image_endpoint(
     file: UploadFile = File(...), # Use File(...) for required file upload
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     if not file.content_type.startswith("image/"):
@@ -42,7 +42,7 @@ from typing import Optional # Ensure Optional is imported
 
 @router.get("/fashion-trends/", response_model=schemas.TrendForecastResponse)
 async def get_fashion_trends_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # Making current_user optional for trends, as they might be general
     # or personalized if user is logged in. Service handles the Optional user.
     current_user: Optional[schemas.User] = Depends(get_current_user) # Allow optional user
@@ -6,10 +6,10 @@ from datetime import datetime, timedelta
 from .. import tables as schemas
 from .. import security
 from ..security import get_current_user # Import get_current_user
-from sqlalchemy.orm import Session
-from ..db.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db.database import get_async_db
 from .. import model as models # Import your SQLAlchemy models
-from sqlalchemy import or_ # Add this import
+from sqlalchemy import or_, select
 
 # oauth2_scheme moved to security.py
 
@@ -22,15 +22,15 @@ router = APIRouter(
 
 
 @router.post("/register", response_model=schemas.Token)  # Changed response_model
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user_by_username = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user_by_username = await db.scalar(select(models.User).where(models.User.username == user.username))
     if db_user_by_username:
         raise HTTPException(status_code=400, detail="Username already registered")
-    db_user_by_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user_by_email = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user_by_email:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = security.get_password_hash(user.password)
+    hashed_password = await security.hash_password_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -39,35 +39,39 @@ async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         updated_at=datetime.utcnow()
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
 
     # Generate token for the new user
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": db_user.username}, expires_delta=access_token_expires
+        data={"sub": db_user.username, **security.user_claims(db_user)}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/login", response_model=schemas.Token)
-async def login(user_credentials: schemas.UserLogin, db: Session = Depends(get_db)): # Changed signature
-    user_in_db = db.query(models.User).filter(
+async def login(user_credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)): # Changed signature
+    user_in_db = await db.scalar(select(models.User).where(
         or_(
             models.User.username == user_credentials.emailOrUsername,
             models.User.email == user_credentials.emailOrUsername
         )
-    ).first()
+    ))
 
     if not user_in_db:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username, email, or password")
 
-    if not security.verify_password(user_credentials.password, user_in_db.hashed_password):
+    valid, new_hash = await security.verify_password_async(user_credentials.password, user_in_db.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect username, email, or password")
+    if new_hash is not None: # BCRYPT_ROUNDS changed since the password was set
+        user_in_db.hashed_password = new_hash
+        await db.commit()
 
     access_token_expires = timedelta(minutes=security.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = security.create_access_token(
-        data={"sub": user_in_db.username}, expires_delta=access_token_expires # Use username for token subject
+        data={"sub": user_in_db.username, **security.user_claims(user_in_db)}, expires_delta=access_token_expires # Use username for token subject
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
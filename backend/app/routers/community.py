@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 
 from .. import tables as schemas  # schemas are in tables.py
 from .. import model as models    # SQLAlchemy models are in model.py
 from ..security import get_current_user
-from ..db.database import get_db
+from ..db.database import get_async_db
 from datetime import datetime
 
 router = APIRouter(
@@ -18,11 +20,11 @@ router = APIRouter(
 async def create_feedback_for_outfit(
     outfit_id: int,
     feedback_data: schemas.FeedbackCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     # Check if outfit exists
-    outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id).first()
+    outfit = await db.get(models.Outfit, outfit_id)
     if not outfit:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outfit not found")
 
@@ -33,8 +35,8 @@ async def create_feedback_for_outfit(
         created_at=datetime.utcnow()
     )
     db.add(new_feedback)
-    db.commit()
-    db.refresh(new_feedback)
+    await db.commit()
+    await db.refresh(new_feedback)
 
     # For the response, populate commenter_username
     # This assumes schemas.Feedback has a 'commenter_username' field
@@ -46,14 +48,16 @@ async def create_feedback_for_outfit(
 @router.get("/outfits/{outfit_id}/feedback", response_model=List[schemas.Feedback])
 async def get_feedback_for_outfit(
     outfit_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Check if outfit exists
-    outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id).first()
+    outfit = await db.get(models.Outfit, outfit_id)
     if not outfit:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outfit not found")
 
-    feedbacks_db = db.query(models.Feedback).filter(models.Feedback.outfit_id == outfit_id).all()
+    feedbacks_db = (await db.scalars(
+        select(models.Feedback).options(selectinload(models.Feedback.commenter)).where(models.Feedback.outfit_id == outfit_id)
+    )).all()
 
     response_feedbacks = []
     for fb_db in feedbacks_db:
@@ -70,10 +74,10 @@ async def get_feedback_for_outfit(
 @router.delete("/feedback/{feedback_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_feedback(
     feedback_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    feedback_to_delete = db.query(models.Feedback).filter(models.Feedback.id == feedback_id).first()
+    feedback_to_delete = await db.get(models.Feedback, feedback_id)
 
     if not feedback_to_delete:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feedback not found")
@@ -83,6 +87,6 @@ async def delete_feedback(
     if feedback_to_delete.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this feedback")
 
-    db.delete(feedback_to_delete)
-    db.commit()
+    await db.delete(feedback_to_delete)
+    await db.commit()
     return
@@ -1,14 +1,17 @@
 # Model Cache Management API Endpoints
 # This module provides API endpoints for managing AI model caching
 
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
 
 from ..security import get_current_user
-from ..db.database import get_db
+from ..db.database import get_async_db
 from .. import tables as schemas
 from ..services.model_manager import get_model_manager
+from ..services.analysis_cache import get_analysis_cache
+from ..services.text_embeddings import get_text_embedding_cache
 
 router = APIRouter(
     prefix="/model-cache",
@@ -18,7 +21,7 @@ router = APIRouter(
 
 @router.get("/info", response_model=Dict[str, Any])
 async def get_cache_info(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Get information about cached AI models"""
@@ -26,31 +29,61 @@ async def get_cache_info(
     cache_info = model_manager.get_cache_info()
     return cache_info
 
+@router.get("/batching", response_model=Dict[str, Any])
+async def get_batching_metrics(
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Get micro-batching metrics (batch fill ratio, queue delay) for model inference"""
+    model_manager = get_model_manager()
+    return {"batchers": model_manager.get_batching_metrics()}
+
+@router.get("/analysis-cache", response_model=Dict[str, Any])
+async def get_analysis_cache_stats(
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Get size and hit rate of the content-hash image analysis cache"""
+    return await asyncio.to_thread(get_analysis_cache().get_stats)
+
+@router.delete("/analysis-cache")
+async def clear_analysis_cache(
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Remove all cached image analysis results"""
+    await asyncio.to_thread(get_analysis_cache().clear)
+    return {"status": "success", "message": "Analysis cache cleared"}
+
+@router.get("/text-embedding-cache", response_model=Dict[str, Any])
+async def get_text_embedding_cache_stats(
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Get hit rates of the occasion text embedding cache"""
+    return get_text_embedding_cache().get_stats()
+
+@router.delete("/text-embedding-cache")
+async def clear_text_embedding_cache(
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Remove all cached text embeddings"""
+    await asyncio.to_thread(get_text_embedding_cache().clear)
+    return {"status": "success", "message": "Text embedding cache cleared"}
+
 @router.post("/preload")
 async def preload_models(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Preload all AI models to cache"""
     model_manager = get_model_manager()
     
-    results = {}
-    for model_name in ["mobilenet_v2", "efficientdet_lite0"]:
-        try:
-            model = model_manager.get_model(model_name)
-            if model is not None:
-                results[model_name] = "loaded"
-            else:
-                results[model_name] = "failed"
-        except Exception as e:
-            results[model_name] = f"error: {str(e)}"
+    # Loading can take tens of seconds; keep it off the event loop
+    results = await asyncio.to_thread(model_manager.warm_up, ["mobilenet_v2", "efficientdet_lite0"])
     
     return {"status": "completed", "results": results}
 
 @router.delete("/clear")
 async def clear_cache(
     model_name: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     """Clear model cache (specific model or all models)"""
@@ -76,6 +109,7 @@ async def get_model_status():
         status[model_name] = {
             "cached": info["cached"],
             "in_memory": info["in_memory"],
+            "load_state": info["load_state"],
             "ready": info["cached"] or info["in_memory"]
         }
     
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from typing import List, Optional
 from datetime import datetime
 import os # Added for file deletion
 import logging # Added for logging
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from .. import tables as schemas, models
+from .. import tables as schemas, model as models
 from ..security import get_current_user # get_current_user returns schemas.User
-from ..db.database import get_db
+from ..db.database import get_async_db
+from ..services.outfit_embeddings import refresh_outfit_embedding
+from ..services.projection import outfit_options
+from ..services.pagination import Keyset, cursor_query, next_cursor_headers
 
 router = APIRouter(
     prefix="/outfits",
@@ -20,13 +25,13 @@ logger = logging.getLogger(__name__) # Added logger
 @router.post("/", response_model=schemas.Outfit, status_code=status.HTTP_201_CREATED)
 async def create_outfit(
     outfit: schemas.OutfitCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_items = db.query(models.WardrobeItem).filter(
+    db_items = (await db.scalars(select(models.WardrobeItem).where(
         models.WardrobeItem.id.in_(outfit.item_ids),
         models.WardrobeItem.user_id == current_user.id
-    ).all()
+    ))).all()
 
     if len(db_items) != len(outfit.item_ids):
         # Identify missing or unauthorized items for a more specific error message if desired
@@ -46,29 +51,38 @@ async def create_outfit(
         db_outfit.tags = outfit.tags
 
     db_outfit.items.extend(db_items)
+    db_outfit.feedbacks = []
 
     db.add(db_outfit)
-    db.commit()
-    db.refresh(db_outfit)
+    refresh_outfit_embedding(db_outfit)
+    await db.commit()
     return db_outfit
 
+OUTFITS_KEYSET = Keyset(models.Outfit.created_at, models.Outfit.id)
+
 @router.get("/", response_model=List[schemas.Outfit])
 async def read_outfits(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = cursor_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    outfits = db.query(models.Outfit).filter(models.Outfit.user_id == current_user.id).offset(skip).limit(limit).all()
+    query = select(models.Outfit).options(*outfit_options()).where(models.Outfit.user_id == current_user.id)
+    outfits, next_cursor = OUTFITS_KEYSET.page((await db.scalars(OUTFITS_KEYSET.paginate(query, cursor, skip, limit))).all(), limit)
+    response.headers.update(next_cursor_headers(next_cursor))
     return outfits
 
 @router.get("/{outfit_id}", response_model=schemas.Outfit)
 async def read_outfit(
     outfit_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id).first()
+    db_outfit = await db.scalar(
+        select(models.Outfit).options(*outfit_options()).where(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id)
+    )
     if db_outfit is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outfit not found")
     return db_outfit
@@ -77,10 +91,14 @@ async def read_outfit(
 async def update_outfit(
     outfit_id: int,
     outfit_update: schemas.OutfitUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id).first()
+    db_outfit = await db.scalar(
+        select(models.Outfit)
+        .options(selectinload(models.Outfit.items), selectinload(models.Outfit.feedbacks))
+        .where(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id)
+    )
 
     if db_outfit is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outfit not found")
@@ -90,10 +108,10 @@ async def update_outfit(
     if "item_ids" in update_data:
         new_item_ids = update_data.pop("item_ids")
         if new_item_ids is not None: # Check if item_ids is actually provided for update
-            db_items = db.query(models.WardrobeItem).filter(
+            db_items = (await db.scalars(select(models.WardrobeItem).where(
                 models.WardrobeItem.id.in_(new_item_ids),
                 models.WardrobeItem.user_id == current_user.id
-            ).all()
+            ))).all()
             if len(db_items) != len(new_item_ids):
                 found_ids = {item.id for item in db_items}
                 missing_ids = [item_id for item_id in new_item_ids if item_id not in found_ids]
@@ -101,22 +119,22 @@ async def update_outfit(
             db_outfit.items = db_items
         else: # item_ids is explicitly set to null or not provided for update
             db_outfit.items = [] # Clear items if item_ids is None
+        refresh_outfit_embedding(db_outfit)
 
     for key, value in update_data.items():
         setattr(db_outfit, key, value)
 
     db_outfit.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_outfit)
+    await db.commit()
     return db_outfit
 
 @router.delete("/{outfit_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_outfit(
     outfit_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id).first()
+    db_outfit = await db.scalar(select(models.Outfit).where(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id))
 
     if db_outfit is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Outfit not found")
@@ -142,6 +160,6 @@ async def delete_outfit(
     # or if the relationship is cleared (e.g., db_outfit.items = []) before deleting db_outfit.
     # However, direct delete of db_outfit should suffice.
 
-    db.delete(db_outfit)
-    db.commit()
+    await db.delete(db_outfit)
+    await db.commit()
     return
@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional # For List type hint & Optional query params
 
 from .. import tables as schemas
 from .. import model as models
 from ..security import get_current_user
-from ..db.database import get_db
+from ..db.database import get_async_db
 from ..services.recommendation_services import get_wardrobe_recommendations_service, recommend_outfits_for_occasion_service
 # EventDetailsInput is available via schemas.EventDetailsInput
 # Outfit is available via schemas.Outfit
@@ -20,7 +20,7 @@ router = APIRouter(
 async def get_personalized_wardrobe_recommendations(
     lat: Optional[float] = None,
     lon: Optional[float] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user) # Ensure type is schemas.User
 ):
     suggestions = await get_wardrobe_recommendations_service(
@@ -39,7 +39,7 @@ async def get_personalized_wardrobe_recommendations(
 @router.post("/event/", response_model=List[schemas.Outfit])
 async def get_recommendations_for_event(
     event_details: schemas.EventDetailsInput,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user) # Ensure this is models.User for service compatibility
 ):
     """
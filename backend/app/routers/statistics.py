@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, desc, distinct
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict
 
 from .. import tables as schemas
 from .. import model as models
 from ..security import get_current_user # get_current_user returns schemas.User
-from ..db.database import get_db
+from ..db.database import get_async_db
+from ..responses import model_response
+from ..services.wardrobe_stats import get_user_stats, least_worn_items_query, most_worn_items_query
+from ..services.projection import ResponseView, view_query, wardrobe_item_options, serialize_wardrobe_items
 
 router = APIRouter(
     prefix="/statistics",
@@ -16,80 +19,93 @@ router = APIRouter(
 
 @router.get("/wardrobe-stats/", response_model=schemas.WardrobeStats)
 async def get_wardrobe_statistics(
-    db: Session = Depends(get_db),
+    view: ResponseView = view_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    user_id = current_user.id
-
-    total_items = db.query(func.count(models.WardrobeItem.id)).filter(models.WardrobeItem.user_id == user_id).scalar()
-    total_outfits = db.query(func.count(models.Outfit.id)).filter(models.Outfit.user_id == user_id).scalar()
-
-    items_by_category_query = db.query(models.WardrobeItem.category, func.count(models.WardrobeItem.id).label("count")).filter(models.WardrobeItem.user_id == user_id).group_by(models.WardrobeItem.category).all()
-    items_by_category = {cat if cat else "Uncategorized": count for cat, count in items_by_category_query}
-
-
-    items_by_season_query = db.query(models.WardrobeItem.season, func.count(models.WardrobeItem.id).label("count")).filter(models.WardrobeItem.user_id == user_id, models.WardrobeItem.season != None, models.WardrobeItem.season != "").group_by(models.WardrobeItem.season).all()
-    items_by_season = {season if season else "Unspecified": count for season, count in items_by_season_query}
-
-
-    most_worn_items_db = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == user_id, models.WardrobeItem.times_worn > 0).order_by(desc(models.WardrobeItem.times_worn)).limit(5).all()
-    # For least worn, include items with times_worn = 0 or NULL
-    least_worn_items_db = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == user_id).order_by(func.coalesce(models.WardrobeItem.times_worn, 0)).limit(5).all()
-
-    favorite_items_count = db.query(func.count(models.WardrobeItem.id)).filter(models.WardrobeItem.user_id == user_id, models.WardrobeItem.favorite == True).scalar()
-
-    return schemas.WardrobeStats(
-        total_items=total_items if total_items is not None else 0,
-        total_outfits=total_outfits if total_outfits is not None else 0,
-        items_by_category=items_by_category,
-        items_by_season=items_by_season,
-        most_worn_items=[schemas.WardrobeItem.model_validate(item) for item in most_worn_items_db],
-        least_worn_items=[schemas.WardrobeItem.model_validate(item) for item in least_worn_items_db],
-        favorite_items_count=favorite_items_count if favorite_items_count is not None else 0
-    )
+    # One primary-key read of the maintained statistics row (see services/wardrobe_stats.py),
+    # and two LIMIT queries on the (user_id, times_worn) index for the most/least worn items
+    stats = await db.run_sync(get_user_stats, current_user.id)
+    options = wardrobe_item_options(view)
+    most_worn = (await db.scalars(most_worn_items_query(current_user.id).options(*options))).all()
+    least_worn = (await db.scalars(least_worn_items_query(current_user.id).options(*options))).all()
+
+    return model_response(schemas.WardrobeStats(
+        total_items=stats.total_items,
+        total_outfits=stats.total_outfits,
+        items_by_category=stats.items_by_category,
+        items_by_season=stats.items_by_season,
+        most_worn_items=serialize_wardrobe_items(most_worn, view),
+        least_worn_items=serialize_wardrobe_items(least_worn, view),
+        favorite_items_count=stats.favorite_items_count
+    ))
 
 @router.get("/item-wear-frequency/", response_model=List[schemas.ItemWearFrequency])
 async def get_item_wear_frequency(
-    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    user_id = current_user.id
-    # Query items and their wear counts, including those never worn (times_worn is 0 or NULL)
-    items_with_wear_count = db.query(models.WardrobeItem)        .filter(models.WardrobeItem.user_id == user_id)        .order_by(desc(func.coalesce(models.WardrobeItem.times_worn, 0)))        .all()
-
-    response = []
-    for item in items_with_wear_count:
-        response.append(schemas.ItemWearFrequency(
-            item=schemas.WardrobeItem.model_validate(item),
-            wear_count=item.times_worn if item.times_worn is not None else 0
-        ))
-    return response
+    """
+    The user's items ranked by wear count (most worn first, then by id), one compact row
+    per item. The number of items is returned in the X-Total-Count header.
+    """
+    # Items never worn have times_worn 0 or NULL
+    wear_count = func.coalesce(models.WardrobeItem.times_worn, 0)
+    # Rank, item count and wear total come from window functions over all of the user's
+    # items, so a page costs a single query that reads only these columns
+    rows = (await db.execute(
+        select(
+            models.WardrobeItem.id.label("item_id"),
+            models.WardrobeItem.name,
+            models.WardrobeItem.category,
+            models.WardrobeItem.image_url,
+            models.WardrobeItem.last_worn,
+            wear_count.label("wear_count"),
+            func.rank().over(order_by=wear_count.desc()).label("rank"),
+            func.count().over().label("total_items"),
+            func.sum(wear_count).over().label("total_wears"),
+        )
+        .where(models.WardrobeItem.user_id == current_user.id)
+        .order_by(wear_count.desc(), models.WardrobeItem.id)
+        .offset(skip).limit(limit)
+    )).all()
+
+    if rows:
+        total_items = rows[0].total_items
+    elif skip:
+        total_items = await db.scalar(select(func.count(models.WardrobeItem.id)).where(models.WardrobeItem.user_id == current_user.id))
+    else:
+        total_items = 0
+
+    return model_response([
+        schemas.ItemWearFrequency(
+            item_id=row.item_id, name=row.name, category=row.category, image_url=row.image_url,
+            last_worn=row.last_worn, wear_count=row.wear_count, rank=row.rank,
+            wear_share=round(row.wear_count * 100.0 / row.total_wears, 2) if row.total_wears else 0.0
+        )
+        for row in rows
+    ], headers={"X-Total-Count": str(total_items)})
 
 @router.get("/category-usage/", response_model=List[schemas.CategoryUsage])
 async def get_category_usage(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    user_id = current_user.id
-
-    total_user_items_count = db.query(func.count(distinct(models.WardrobeItem.id)))        .filter(models.WardrobeItem.user_id == user_id).scalar()
+    stats = await db.run_sync(get_user_stats, current_user.id)
+    total_user_items_count = stats.total_items
 
     # Handle case where total_user_items_count might be 0 to avoid division by zero
-    if not total_user_items_count or total_user_items_count == 0:
+    if not total_user_items_count:
         # If user has no items, return empty list or handle as appropriate
         return []
 
-    category_counts_query = db.query(
-        models.WardrobeItem.category,
-        func.count(models.WardrobeItem.id).label("item_count"),
-        (func.count(models.WardrobeItem.id) * 100.0 / total_user_items_count).label("usage_percentage")
-    ).filter(models.WardrobeItem.user_id == user_id)     .group_by(models.WardrobeItem.category)     .all()
-
     response = []
-    for category_name, item_count, usage_percentage in category_counts_query:
+    for category_name, item_count in sorted(stats.items_by_category.items()):
         response.append(schemas.CategoryUsage(
-            category=category_name if category_name else "Uncategorized",
+            category=category_name,
             item_count=item_count,
-            usage_percentage=round(usage_percentage, 2) if usage_percentage is not None else 0.0
+            usage_percentage=round(item_count * 100.0 / total_user_items_count, 2)
         ))
     return response
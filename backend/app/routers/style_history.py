@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from .. import tables as schemas
 from .. import model as models
 from ..security import get_current_user # get_current_user returns schemas.User
-from ..db.database import get_db
+from ..db.database import get_async_db
+from ..services.pagination import Keyset, cursor_query, next_cursor_headers
 
 router = APIRouter(
     prefix="/style-history",
@@ -17,7 +20,7 @@ router = APIRouter(
 @router.post("/", response_model=schemas.StyleHistory, status_code=status.HTTP_201_CREATED)
 async def log_style_history_entry(
     entry: schemas.StyleHistoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     # Ensure date_worn is set, default to now if not provided by client
@@ -26,7 +29,7 @@ async def log_style_history_entry(
     # For this example, assume date_worn is required in StyleHistoryCreate.
 
     if entry.item_id:
-        item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == entry.item_id, models.WardrobeItem.user_id == current_user.id).first()
+        item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == entry.item_id, models.WardrobeItem.user_id == current_user.id))
         if not item:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Wardrobe Item with ID {entry.item_id} not found or does not belong to user.")
         item.last_worn = entry.date_worn
@@ -34,7 +37,7 @@ async def log_style_history_entry(
         item.updated_at = datetime.utcnow()
 
     if entry.outfit_id:
-        outfit = db.query(models.Outfit).options(joinedload(models.Outfit.items)).filter(models.Outfit.id == entry.outfit_id, models.Outfit.user_id == current_user.id).first()
+        outfit = await db.scalar(select(models.Outfit).options(selectinload(models.Outfit.items)).where(models.Outfit.id == entry.outfit_id, models.Outfit.user_id == current_user.id))
         if not outfit:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Outfit with ID {entry.outfit_id} not found or does not belong to user.")
         # Update last_worn and times_worn for all items in the outfit
@@ -53,28 +56,34 @@ async def log_style_history_entry(
     )
 
     db.add(db_entry)
-    db.commit()
-    db.refresh(db_entry)
+    await db.commit()
+    await db.refresh(db_entry)
     return db_entry
 
 
+HISTORY_KEYSET = Keyset(models.StyleHistory.date_worn, models.StyleHistory.id, descending=True)
+
 @router.get("/", response_model=List[schemas.StyleHistory])
 async def read_style_history_entries(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = cursor_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    entries = db.query(models.StyleHistory).filter(models.StyleHistory.user_id == current_user.id).order_by(models.StyleHistory.date_worn.desc()).offset(skip).limit(limit).all()
+    query = select(models.StyleHistory).where(models.StyleHistory.user_id == current_user.id)
+    entries, next_cursor = HISTORY_KEYSET.page((await db.scalars(HISTORY_KEYSET.paginate(query, cursor, skip, limit))).all(), limit)
+    response.headers.update(next_cursor_headers(next_cursor))
     return entries
 
 @router.get("/{entry_id}", response_model=schemas.StyleHistory)
 async def read_style_history_entry(
     entry_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_entry = db.query(models.StyleHistory).filter(models.StyleHistory.id == entry_id, models.StyleHistory.user_id == current_user.id).first()
+    db_entry = await db.scalar(select(models.StyleHistory).where(models.StyleHistory.id == entry_id, models.StyleHistory.user_id == current_user.id))
     if db_entry is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Style history entry not found")
     return db_entry
@@ -83,28 +92,28 @@ async def read_style_history_entry(
 @router.delete("/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_style_history_entry(
     entry_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_entry = db.query(models.StyleHistory).filter(models.StyleHistory.id == entry_id, models.StyleHistory.user_id == current_user.id).first()
+    db_entry = await db.scalar(select(models.StyleHistory).where(models.StyleHistory.id == entry_id, models.StyleHistory.user_id == current_user.id))
 
     if db_entry is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Style history entry not found")
 
     # Decrement times_worn if applicable
     if db_entry.item_id:
-        item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == db_entry.item_id, models.WardrobeItem.user_id == current_user.id).first()
+        item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == db_entry.item_id, models.WardrobeItem.user_id == current_user.id))
         if item and item.times_worn and item.times_worn > 0:
              item.times_worn -= 1
              item.updated_at = datetime.utcnow()
     elif db_entry.outfit_id:
-        outfit = db.query(models.Outfit).options(joinedload(models.Outfit.items)).filter(models.Outfit.id == db_entry.outfit_id, models.Outfit.user_id == current_user.id).first()
+        outfit = await db.scalar(select(models.Outfit).options(selectinload(models.Outfit.items)).where(models.Outfit.id == db_entry.outfit_id, models.Outfit.user_id == current_user.id))
         if outfit:
             for item_in_outfit in outfit.items:
                  if item_in_outfit.times_worn and item_in_outfit.times_worn > 0:
                     item_in_outfit.times_worn -=1
                     item_in_outfit.updated_at = datetime.utcnow()
 
-    db.delete(db_entry)
-    db.commit()
+    await db.delete(db_entry)
+    await db.commit()
     return
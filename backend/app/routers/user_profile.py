@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import datetime
@@ -6,7 +8,7 @@ from datetime import datetime
 from .. import tables as schemas  # schemas are in tables.py
 from .. import model as models    # SQLAlchemy models are in model.py
 from ..security import get_current_user
-from ..db.database import get_db
+from ..db.database import get_async_db
 from ..services.ai_style_insights_service import (
     get_user_style_profile,
     get_wardrobe_analysis_details,
@@ -23,10 +25,10 @@ router = APIRouter(
 
 @router.get("/me", response_model=schemas.UserProfile)
 async def read_user_profile(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(models.UserProfile).where(models.UserProfile.user_id == current_user.id))
     if profile is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found for current user")
     return profile
@@ -34,10 +36,10 @@ async def read_user_profile(
 @router.post("/me", response_model=schemas.UserProfile, status_code=status.HTTP_201_CREATED)
 async def create_user_profile(
     profile_data: schemas.UserProfileCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    existing_profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == current_user.id).first()
+    existing_profile = await db.scalar(select(models.UserProfile).where(models.UserProfile.user_id == current_user.id))
     if existing_profile:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Profile already exists for this user. Use PUT to update.")
 
@@ -47,17 +49,17 @@ async def create_user_profile(
         updated_at=datetime.utcnow()
     )
     db.add(new_profile)
-    db.commit()
-    db.refresh(new_profile)
+    await db.commit()
+    await db.refresh(new_profile)
     return new_profile
 
 @router.put("/me", response_model=schemas.UserProfile)
 async def update_user_profile(
     profile_update_data: schemas.UserProfileUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    db_profile = db.query(models.UserProfile).filter(models.UserProfile.user_id == current_user.id).first()
+    db_profile = await db.scalar(select(models.UserProfile).where(models.UserProfile.user_id == current_user.id))
 
     if db_profile is None:
         # If profile doesn't exist, create it (idempotent PUT)
@@ -67,8 +69,8 @@ async def update_user_profile(
             updated_at=datetime.utcnow()
         )
         db.add(new_profile)
-        db.commit()
-        db.refresh(new_profile)
+        await db.commit()
+        await db.refresh(new_profile)
         return new_profile
     else:
         # Profile exists, update it
@@ -76,13 +78,13 @@ async def update_user_profile(
         for key, value in update_data.items():
             setattr(db_profile, key, value)
         db_profile.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_profile)
+        await db.commit()
+        await db.refresh(db_profile)
         return db_profile
 
 @router.get("/me/style-insights", response_model=schemas.FullAIStyleInsightsResponse)
 async def get_full_style_insights(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(get_current_user)
 ):
     """
@@ -90,6 +92,11 @@ async def get_full_style_insights(
     This includes their style profile, wardrobe analysis, personalized tips,
     and outfit recommendations.
     """
+    # The insight services query synchronously; run them in the session's sync context
+    return await db.run_sync(_build_style_insights, current_user)
+
+
+def _build_style_insights(db: Session, current_user: schemas.User) -> schemas.FullAIStyleInsightsResponse:
     user_style_profile_response = get_user_style_profile(db=db, user=current_user)
     wardrobe_analysis_response = get_wardrobe_analysis_details(db=db, user=current_user)
 
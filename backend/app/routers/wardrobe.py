@@ -1,18 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query
+from typing import List, Optional, Union
 from datetime import datetime
 import shutil
 import uuid
 import os
 import logging # Added for logging
-from PIL import Image
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from .. import tables as schemas
 from .. import model as models # Import models and schemas
-from ..services import ai_embedding, ai_services # Import AI services
+from ..services.enrichment_queue import enqueue_enrichment, cancel_enrichment, get_enrichment_queue
+from ..services.vector_index import get_vector_index_registry
+from ..services.compatibility_table import refresh_item_compatibility
+from ..responses import model_response
+from ..services.projection import ResponseView, view_query, wardrobe_item_options, serialize_wardrobe_item, serialize_wardrobe_items
+from ..services.outfit_embeddings import outfit_ids_containing, refresh_outfit_embeddings, refresh_outfits_containing
+from ..services.pagination import Keyset, cursor_query, next_cursor_headers
 from ..security import get_current_user # get_current_user returns schemas.User
-from ..db.database import get_db
+from ..db.database import get_async_db
 
 router = APIRouter(
     prefix="/wardrobe",
@@ -37,12 +43,13 @@ ALLOWED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/webp"]
 async def create_wardrobe_item(
     item: schemas.WardrobeItemCreate = Depends(), # Use Depends for form data when file is also expected
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     item_data = item.model_dump() # Get data from the Pydantic model
     item_data['ai_embedding'] = None
     item_data['ai_dominant_colors'] = None
+    queue_enrichment = False
 
     # Handle image upload
     if image and image.filename:
@@ -64,22 +71,8 @@ async def create_wardrobe_item(
             with open(file_path, "wb") as buffer:
                 shutil.copyfileobj(image.file, buffer)
             item_data['image_url'] = f"/{file_path}"  # Store relative path
-
-            # AI processing
-            pil_image = Image.open(file_path)
-            try:
-                embedding = ai_embedding.get_image_embedding(pil_image)
-                item_data['ai_embedding'] = embedding
-            except Exception as e:
-                logger.error(f"Error generating image embedding: {e}")
-                # Store None or handle as per specific requirement for embedding errors
-
-            try:
-                colors = ai_services.extract_colors(pil_image)
-                item_data['ai_dominant_colors'] = colors
-            except Exception as e:
-                logger.error(f"Error extracting dominant colors: {e}")
-
+            # Embedding and color extraction run out of band (see services/enrichment_queue.py)
+            queue_enrichment = True
         except Exception as e:
             logger.error(f"Error saving image: {e}")
             item_data['image_url'] = item.image_url # Fallback to image_url from body if any
@@ -104,57 +97,72 @@ async def create_wardrobe_item(
     # So, if item_data['tags'] is not None, it will be set correctly by **item_data.
 
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    if queue_enrichment:
+        await db.flush() # Assigns db_item.id for the job row
+        await db.run_sync(enqueue_enrichment, db_item)
+    await db.commit()
+    await db.refresh(db_item)
+    # The item has no embedding or colors yet; its compatibility row is written by the
+    # enrichment worker once the image is analyzed (or on the next table load).
+    if queue_enrichment:
+        get_enrichment_queue().notify()
     return db_item
 
-@router.get("/items/", response_model=List[schemas.WardrobeItem])
+ITEMS_KEYSET = Keyset(models.WardrobeItem.date_added, models.WardrobeItem.id)
+
+@router.get("/items/", response_model=Union[List[schemas.WardrobeItem], List[schemas.WardrobeItemSummary]])
 async def read_wardrobe_items(
     category: Optional[str] = None,
     season: Optional[str] = None,
     favorite: Optional[bool] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = cursor_query(),
+    view: ResponseView = view_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    query = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == current_user.id)
+    query = select(models.WardrobeItem).options(*wardrobe_item_options(view))\
+        .where(models.WardrobeItem.user_id == current_user.id)
 
     if category:
-        query = query.filter(models.WardrobeItem.category.ilike(f"%{category}%"))
+        query = query.where(models.WardrobeItem.category.ilike(f"%{category}%"))
     if season:
-        query = query.filter(models.WardrobeItem.season.ilike(f"%{season}%"))
+        query = query.where(models.WardrobeItem.season.ilike(f"%{season}%"))
     if favorite is not None:
-        query = query.filter(models.WardrobeItem.favorite == favorite)
+        query = query.where(models.WardrobeItem.favorite == favorite)
 
-    items = query.offset(skip).limit(limit).all()
-    return items
+    items, next_cursor = ITEMS_KEYSET.page((await db.scalars(ITEMS_KEYSET.paginate(query, cursor, skip, limit))).all(), limit)
+    return model_response(serialize_wardrobe_items(items, view), headers=next_cursor_headers(next_cursor))
 
-@router.get("/items/{item_id}", response_model=schemas.WardrobeItem)
+@router.get("/items/{item_id}", response_model=Union[schemas.WardrobeItem, schemas.WardrobeItemSummary])
 async def read_wardrobe_item(
     item_id: int,
-    db: Session = Depends(get_db),
+    view: ResponseView = view_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id).first()
+    db_item = await db.scalar(select(models.WardrobeItem).options(*wardrobe_item_options(view))
+        .where(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id))
     if db_item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
-    return db_item
+    return model_response(serialize_wardrobe_item(db_item, view))
 
 @router.put("/items/{item_id}", response_model=schemas.WardrobeItem)
 async def update_wardrobe_item(
     item_id: int,
     item_update: schemas.WardrobeItemUpdate = Depends(), # Use Depends for form data
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id).first()
+    db_item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id))
 
     if db_item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
 
     update_data = item_update.model_dump(exclude_unset=True)
+    queue_enrichment = False
 
     if image and image.filename: # A new image is being uploaded
         if image.content_type not in ALLOWED_CONTENT_TYPES:
@@ -184,22 +192,10 @@ async def update_wardrobe_item(
             with open(new_file_path_on_disk, "wb") as buffer:
                 shutil.copyfileobj(image.file, buffer)
             update_data['image_url'] = f"/{new_file_path_on_disk}" # Update path for DB
-
-            # AI processing for the new image
-            pil_image = Image.open(new_file_path_on_disk)
-            try:
-                embedding = ai_embedding.get_image_embedding(pil_image)
-                update_data['ai_embedding'] = embedding
-            except Exception as e:
-                logger.error(f"Error generating image embedding for update: {e}")
-                update_data['ai_embedding'] = None
-
-            try:
-                colors = ai_services.extract_colors(pil_image)
-                update_data['ai_dominant_colors'] = colors
-            except Exception as e:
-                logger.error(f"Error extracting dominant colors for update: {e}")
-                update_data['ai_dominant_colors'] = None
+            # AI fields describe the old image; they are recomputed out of band for the new one
+            update_data['ai_embedding'] = None
+            update_data['ai_dominant_colors'] = None
+            queue_enrichment = True
         except Exception as e:
             logger.error(f"Error saving new image: {e}")
             # If saving new image fails, we might want to revert image_url or handle error
@@ -220,25 +216,90 @@ async def update_wardrobe_item(
         # Ensure AI fields are also cleared if the image is removed
         update_data['ai_embedding'] = None
         update_data['ai_dominant_colors'] = None
+        update_data['ai_status'] = None
+        await db.run_sync(cancel_enrichment, db_item.id)
     # If no new image is uploaded and image_url is not being set to None,
     # then existing image_url, ai_embedding, and ai_dominant_colors on db_item remain unchanged
     # unless explicitly part of item_update (which they are not for these fields).
 
+    # Compatibility rows depend only on the embedding and colors. Refresh the row here
+    # when removing the image cleared them; a new image is scored by the enrichment worker.
+    refresh_compatibility = not queue_enrichment and 'ai_embedding' in update_data \
+        and (db_item.ai_embedding is not None or bool(db_item.ai_dominant_colors))
+
     for key, value in update_data.items():
         setattr(db_item, key, value)
 
     db_item.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_item)
+    if queue_enrichment:
+        await db.run_sync(enqueue_enrichment, db_item)
+    await db.commit()
+    await db.refresh(db_item)
+    get_vector_index_registry().sync_item(db_item)
+    if refresh_compatibility:
+        await db.run_sync(refresh_item_compatibility, db_item)
+    await db.run_sync(refresh_outfits_containing, db_item.id)
+    if queue_enrichment:
+        get_enrichment_queue().notify()
     return db_item
 
+@router.get("/items/{item_id}/similar", response_model=List[schemas.SimilarItem])
+async def read_similar_wardrobe_items(
+    item_id: int,
+    k: int = Query(10, ge=1, le=50),
+    same_category: bool = False,
+    view: ResponseView = view_query(),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """The user's items whose image embeddings are closest to this item's."""
+    db_item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id))
+    if db_item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+    if db_item.ai_embedding is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Item has not been analyzed yet (ai_status={db_item.ai_status})")
+
+    index = await db.run_sync(lambda session: get_vector_index_registry().get(current_user.id, session))
+    filters = {"category": db_item.category} if same_category else None
+    neighbours = index.top_k(db_item.ai_embedding, k=k, filters=filters, exclude_ids=[item_id])
+    if not neighbours:
+        return []
+
+    items_by_id = {
+        item.id: item for item in await db.scalars(select(models.WardrobeItem).options(*wardrobe_item_options(view)).where(
+            models.WardrobeItem.user_id == current_user.id,
+            models.WardrobeItem.id.in_([neighbour_id for neighbour_id, _ in neighbours])
+        ))
+    }
+    return model_response([
+        schemas.SimilarItem(item=serialize_wardrobe_item(items_by_id[neighbour_id], view), similarity=similarity)
+        for neighbour_id, similarity in neighbours if neighbour_id in items_by_id
+    ])
+
+@router.get("/items/{item_id}/enrichment", response_model=schemas.EnrichmentJob)
+async def read_wardrobe_item_enrichment_status(
+    item_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(get_current_user)
+):
+    """Status of the most recent AI enrichment job for an item."""
+    db_item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id))
+    if db_item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
+
+    db_job = await db.scalar(select(models.EnrichmentJob).where(models.EnrichmentJob.item_id == item_id)
+        .order_by(models.EnrichmentJob.id.desc()).limit(1))
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No enrichment job for this item")
+    return db_job
+
 @router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_wardrobe_item(
     item_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_item = db.query(models.WardrobeItem).filter(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id).first()
+    db_item = await db.scalar(select(models.WardrobeItem).where(models.WardrobeItem.id == item_id, models.WardrobeItem.user_id == current_user.id))
 
     if db_item is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not found")
@@ -257,6 +318,9 @@ async def delete_wardrobe_item(
             logger.warning(f"Image path not found, but listed in DB: {image_path_on_disk}")
 
 
-    db.delete(db_item)
-    db.commit()
+    affected_outfit_ids = await db.run_sync(outfit_ids_containing, item_id)
+    await db.delete(db_item)
+    await db.commit()
+    get_vector_index_registry().remove_item(current_user.id, item_id)
+    await db.run_sync(refresh_outfit_embeddings, affected_outfit_ids)
     return
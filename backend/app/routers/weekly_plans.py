@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from typing import List, Optional, Dict
 from datetime import datetime, date
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from .. import model as models
 from .. import tables as schemas
 from ..security import get_current_user # get_current_user returns schemas.User
-from ..db.database import get_db
+from ..db.database import get_async_db
+from ..services.pagination import Keyset, cursor_query, next_cursor_headers
 
 router = APIRouter(
     prefix="/weekly-plans",
@@ -32,7 +35,7 @@ def transform_plan_to_response(db_plan: models.WeeklyPlan) -> schemas.WeeklyPlan
 @router.post("/", response_model=schemas.WeeklyPlan, status_code=status.HTTP_201_CREATED)
 async def create_weekly_plan(
     plan: schemas.WeeklyPlanCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
     db_plan = models.WeeklyPlan(
@@ -45,20 +48,20 @@ async def create_weekly_plan(
     )
     # Must add and commit db_plan first to get its ID for WeeklyPlanDayOutfit entries
     db.add(db_plan)
-    db.commit()
+    await db.commit()
     # db.refresh(db_plan) # Refresh to get ID, though commit usually handles this for auto-increment.
 
     day_outfit_entries = []
     if plan.daily_outfits:
         for day, outfit_id in plan.daily_outfits.items():
             if outfit_id:
-                outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id).first()
+                outfit = await db.scalar(select(models.Outfit.id).where(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id))
                 if not outfit:
                     # Rollback: Delete the plan created if any outfit is invalid
-                    db.delete(db_plan)
+                    await db.delete(db_plan)
                     # Also delete any day_outfit_entries already added if this loop was partially successful
                     # For simplicity, this example deletes the plan and raises. Proper transaction management would be better.
-                    db.commit()
+                    await db.commit()
                     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Outfit with ID {outfit_id} for {day} not found or does not belong to user.")
 
             day_outfit_entry = models.WeeklyPlanDayOutfit(
@@ -69,31 +72,41 @@ async def create_weekly_plan(
             day_outfit_entries.append(day_outfit_entry)
 
         db.add_all(day_outfit_entries)
-        db.commit()
+        await db.commit()
 
-    db.refresh(db_plan) # Refresh to load relationships like daily_outfits
+    await db.refresh(db_plan, ["daily_outfits"]) # Refresh to load relationships like daily_outfits
     return transform_plan_to_response(db_plan)
 
 
+PLANS_KEYSET = Keyset(models.WeeklyPlan.start_date, models.WeeklyPlan.id, descending=True)
+
 @router.get("/", response_model=List[schemas.WeeklyPlan])
 async def read_weekly_plans(
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    cursor: Optional[str] = cursor_query(),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    # Use joinedload to efficiently fetch related daily_outfits
-    db_plans = db.query(models.WeeklyPlan).filter(models.WeeklyPlan.user_id == current_user.id)        .options(joinedload(models.WeeklyPlan.daily_outfits))        .order_by(models.WeeklyPlan.start_date.desc())        .offset(skip).limit(limit).all()
+    # Use selectinload to efficiently fetch related daily_outfits
+    query = select(models.WeeklyPlan).where(models.WeeklyPlan.user_id == current_user.id)\
+        .options(selectinload(models.WeeklyPlan.daily_outfits))
+    db_plans, next_cursor = PLANS_KEYSET.page((await db.scalars(PLANS_KEYSET.paginate(query, cursor, skip, limit))).all(), limit)
+    response.headers.update(next_cursor_headers(next_cursor))
 
     return [transform_plan_to_response(plan) for plan in db_plans]
 
 @router.get("/{plan_id}", response_model=schemas.WeeklyPlan)
 async def read_weekly_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_plan = db.query(models.WeeklyPlan).filter(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id)        .options(joinedload(models.WeeklyPlan.daily_outfits))        .first()
+    db_plan = await db.scalar(
+        select(models.WeeklyPlan).where(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id)
+        .options(selectinload(models.WeeklyPlan.daily_outfits))
+    )
     if db_plan is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
 
@@ -104,10 +117,13 @@ async def read_weekly_plan(
 async def update_weekly_plan(
     plan_id: int,
     plan_update: schemas.WeeklyPlanUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_plan = db.query(models.WeeklyPlan).filter(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id)        .options(joinedload(models.WeeklyPlan.daily_outfits))        .first()
+    db_plan = await db.scalar(
+        select(models.WeeklyPlan).where(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id)
+        .options(selectinload(models.WeeklyPlan.daily_outfits))
+    )
 
     if db_plan is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
@@ -120,14 +136,14 @@ async def update_weekly_plan(
         # Simple approach: Delete existing and add new ones
         # More sophisticated: Compare and update, add, delete individual entries
         for existing_day_outfit in db_plan.daily_outfits: # db_plan.daily_outfits is a list of WeeklyPlanDayOutfit objects
-            db.delete(existing_day_outfit)
+            await db.delete(existing_day_outfit)
         # db.commit() # Commit deletions or do it once at the end
 
         if new_daily_outfits_dict: # If new daily_outfits are provided
             new_day_entries = []
             for day, outfit_id in new_daily_outfits_dict.items():
                 if outfit_id:
-                    outfit = db.query(models.Outfit).filter(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id).first()
+                    outfit = await db.scalar(select(models.Outfit.id).where(models.Outfit.id == outfit_id, models.Outfit.user_id == current_user.id))
                     if not outfit:
                         # Consider rollback strategy for atomicity if any outfit is invalid
                         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Outfit with ID {outfit_id} for {day} not found or does not belong to user.")
@@ -138,20 +154,18 @@ async def update_weekly_plan(
         setattr(db_plan, key, value)
 
     db_plan.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(db_plan) # Refresh to get the updated state, including new/modified daily_outfits
-
-    # Re-query to ensure all relationships are correctly loaded for the response after modifications
-    updated_db_plan = db.query(models.WeeklyPlan).filter(models.WeeklyPlan.id == plan_id)        .options(joinedload(models.WeeklyPlan.daily_outfits)).first()
-    return transform_plan_to_response(updated_db_plan)
+    await db.commit()
+    # Reload daily_outfits so the response reflects the new/modified entries
+    await db.refresh(db_plan, ["daily_outfits"])
+    return transform_plan_to_response(db_plan)
 
 @router.delete("/{plan_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_weekly_plan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: schemas.User = Depends(get_current_user)
 ):
-    db_plan = db.query(models.WeeklyPlan).filter(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id).first()
+    db_plan = await db.scalar(select(models.WeeklyPlan).where(models.WeeklyPlan.id == plan_id, models.WeeklyPlan.user_id == current_user.id))
 
     if db_plan is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Weekly plan not found")
@@ -159,6 +173,6 @@ async def delete_weekly_plan(
     # Associated WeeklyPlanDayOutfit entries will be deleted due to cascade="all, delete-orphan"
     # set on the WeeklyPlan.daily_outfits relationship in models.py.
 
-    db.delete(db_plan)
-    db.commit()
+    await db.delete(db_plan)
+    await db.commit()
     return
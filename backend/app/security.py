@@ -1,21 +1,23 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ValidationError
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from . import tables as schemas
-from .db.database import SessionLocal, get_db # Import SessionLocal and get_db
+from .db.database import get_async_db
+from .services.user_cache import get_user_cache
+from .services.password_hashing import get_password_hasher
 from . import model as models # Import your SQLAlchemy models
-from sqlalchemy.orm import Session # Import Session for type hinting
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv # For SECRET_KEY
 import os # For SECRET_KEY
 
 load_dotenv()
 
-# Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password Hashing (cost: BCRYPT_ROUNDS, see services/password_hashing.py)
+pwd_context = get_password_hasher().context
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +25,14 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Async handlers use these, which run bcrypt on the hashing pool instead of the event loop
+async def hash_password_async(password: str) -> str:
+    return await get_password_hasher().hash_async(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is the password re-hashed with the current cost, if it changed."""
+    return await get_password_hasher().verify_and_update_async(plain_password, hashed_password)
+
 # JWT Token
 SECRET_KEY = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -32,16 +42,47 @@ if not SECRET_KEY:
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Embed the user's id/email/timestamps in access tokens, so requests carrying such a
+# token authenticate without a database lookup (unless the user changed since issue)
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "true").lower() == "true"
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    issued_at: Optional[int] = None
+    user: Optional[schemas.User] = None # From embedded claims, if present
+
+
+def user_claims(user) -> dict:
+    """Claims for create_access_token that let get_current_user skip the user lookup."""
+    if not AUTH_TOKEN_CLAIMS:
+        return {}
+    return {
+        "uid": user.id,
+        "email": user.email,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "updated_at": user.updated_at.isoformat() if user.updated_at else None,
+    }
+
+
+async def _lookup_user(db: AsyncSession, username: str) -> Optional[schemas.User]:
+    user_cache = get_user_cache()
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    db_user = await db.scalar(select(models.User).where(models.User.username == username))
+    if db_user is None:
+        return None
+    # User is now a SQLAlchemy model instance. Convert to User schema.
+    user = schemas.User.model_validate(db_user) # Use model_validate for Pydantic v2
+    user_cache.put(user)
+    return user
 
 
 # Imports needed for get_current_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login") # tokenUrl is relative to the app root
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)): # Add db session
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)): # Add db session
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -51,14 +92,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     if token_data is None or token_data.username is None:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    # Trust the token's claims unless the user changed after it was issued
+    if AUTH_TOKEN_CLAIMS and token_data.user is not None and token_data.issued_at is not None \
+            and not get_user_cache().changed_since(token_data.username, token_data.issued_at):
+        return token_data.user
 
+    user = await _lookup_user(db, token_data.username)
     if user is None:
         raise credentials_exception
-    # User is now a SQLAlchemy model instance. Convert to User schema.
-    # Ensure your schemas.User can be created from the SQLAlchemy model instance.
-    # This might require adding `from_orm = True` in your Pydantic schema's Config class.
-    return schemas.User.model_validate(user) # Use model_validate for Pydantic v2
+    return user
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -67,7 +109,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -77,6 +119,18 @@ def decode_access_token(token: str):
         username: str = payload.get("sub")
         if username is None:
             return None # Or raise exception
-        return TokenData(username=username)
+        return TokenData(username=username, issued_at=payload.get("iat"), user=_claims_user(payload))
     except JWTError:
         return None # Or raise exception
+
+def _claims_user(payload: dict) -> Optional[schemas.User]:
+    """The user embedded in the token's claims; None for tokens without (valid) claims."""
+    if "uid" not in payload:
+        return None
+    try:
+        return schemas.User(
+            id=payload["uid"], username=payload["sub"], email=payload.get("email"),
+            created_at=payload.get("created_at"), updated_at=payload.get("updated_at")
+        )
+    except ValidationError:
+        return None
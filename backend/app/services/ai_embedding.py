@@ -1,19 +1,41 @@
 # This module provides functions for extracting image embeddings using lightweight models.
 # It uses MobileNetV2 from TensorFlow Hub for efficient embedding generation.
 # Enhanced with persistent caching to prevent re-downloading models.
+# Inference goes through the ModelManager's micro-batcher, so concurrent callers
+# share a single forward pass.
 
-import tensorflow as tf
+import os
 from PIL import Image
 import numpy as np
 from typing import List, Optional, Union
 import logging
 from .model_manager import get_model_manager
+from .inference_server import is_remote_inference, get_inference_client
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on queueing + inference for one embedding request
+EMBEDDING_TIMEOUT_SECONDS = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30"))
+
+def preprocess_image(image: Image.Image) -> np.ndarray:
+    """Converts a PIL image into MobileNetV2's (224, 224, 3) float32 input in [0, 1]."""
+    image = image.convert("RGB")
+    image_resized = image.resize((224, 224))
+    return (np.asarray(image_resized, dtype=np.float32) / 255.0)
+
+def embed_preprocessed_image(image_array: np.ndarray, timeout: float = EMBEDDING_TIMEOUT_SECONDS) -> np.ndarray:
+    """Runs one preprocessed (224, 224, 3) image through MobileNetV2 in this process."""
+    model_manager = get_model_manager()
+    if model_manager.get_model("mobilenet_v2") is None:
+        raise RuntimeError("Image embedding model (MobileNetV2) could not be loaded")
+    # The batcher adds the batch dimension when it stacks this request together
+    # with any concurrent ones, and returns this request's row of the output.
+    return np.asarray(model_manager.get_batcher("mobilenet_v2").infer(image_array, timeout=timeout))
+
 def get_image_embedding(image: Image.Image) -> Union[List[float], str]:
     """
     Extracts image embedding using MobileNetV2 with persistent caching.
+    With AI_INFERENCE_MODE=remote the model runs in the shared inference process.
 
     Args:
         image: A PIL Image object.
@@ -21,31 +43,18 @@ def get_image_embedding(image: Image.Image) -> Union[List[float], str]:
     Returns:
         A list of floats representing the image embedding, or a string with an error message.
     """
-    model_manager = get_model_manager()
-    
-    # Get the model (from cache or download)
-    model = model_manager.get_model("mobilenet_v2")
-    
-    if model is None:
-        return "Error: Image embedding model (MobileNetV2) could not be loaded. Cannot extract embedding."
-
     try:
-        # Preprocess the image
-        # 1. Convert to RGB if it's not
-        image = image.convert("RGB")
-        # 2. Resize to MobileNetV2's expected input size (224x224)
-        image_resized = image.resize((224, 224))
-        # 3. Convert to numpy array and normalize pixel values to [0, 1]
-        image_array = np.array(image_resized) / 255.0
-        # 4. Add a batch dimension (model expects batch_size, height, width, channels)
-        image_batch = np.expand_dims(image_array, axis=0).astype(np.float32)
-
-        # Generate embedding
-        embedding_tensor = model(image_batch)
+        if is_remote_inference():
+            pixels = np.asarray(image.convert("RGB").resize((224, 224)), dtype=np.uint8)
+            embedding_row = get_inference_client().embed_image(pixels, timeout=EMBEDDING_TIMEOUT_SECONDS)
+        else:
+            # Get the model (from cache or download)
+            if get_model_manager().get_model("mobilenet_v2") is None:
+                return "Error: Image embedding model (MobileNetV2) could not be loaded. Cannot extract embedding."
+            embedding_row = embed_preprocessed_image(preprocess_image(image))
 
-        # The output of hub.KerasLayer is already a tensor, often (1, num_features)
         # We convert it to a list of floats
-        embedding = embedding_tensor.numpy().flatten().tolist()
+        embedding = np.asarray(embedding_row).flatten().tolist()
 
         return embedding
     except Exception as e:
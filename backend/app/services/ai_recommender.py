@@ -2,13 +2,14 @@
 # and for generating basic recommendations.
 # It uses EfficientDet-Lite0 from TensorFlow Hub for object detection.
 # Enhanced with persistent caching to prevent re-downloading models.
+# TensorFlow is imported inside run_item_detector so importing this module stays cheap.
 
-import tensorflow as tf
 from PIL import Image, ImageDraw # Pillow for image manipulation
 import numpy as np
 from typing import List, Dict, Union, Any
 import logging
 from .model_manager import get_model_manager
+from .inference_server import is_remote_inference, get_inference_client
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +42,29 @@ FASHION_ITEMS_LABELS = ["person", "backpack", "umbrella", "handbag", "tie", "sui
                         "sports ball", "bottle", "wine glass", "cup", "hat", "shoe", "sunglasses", # Some models might have these
                         "watch", "scarf", "belt"]
 
+def run_item_detector(image_np: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Runs EfficientDet-Lite0 in this process on one RGB uint8 image array.
+    Returns the scores, class ids and normalized boxes for that image.
+    """
+    model = get_model_manager().get_model("efficientdet_lite0")
+    if model is None:
+        raise RuntimeError("Item identification model (EfficientDet-Lite0) could not be loaded")
+
+    import tensorflow as tf # Already loaded by the model manager at this point
+    # Add a batch dimension and ensure dtype is uint8 as expected by some TF Hub models
+    # The model expects a tensor of shape [1, height, width, 3]
+    image_tensor = tf.convert_to_tensor(image_np, dtype=tf.uint8)[tf.newaxis, ...]
+
+    # The model returns a dictionary of tensors.
+    # These keys are standard for TF Object Detection API models on TF Hub
+    detector_outputs = model(image_tensor)
+    return {
+        "detection_scores": detector_outputs['detection_scores'][0].numpy(), # Scores for the first (and only) image
+        "detection_classes": detector_outputs['detection_classes'][0].numpy().astype(np.int32), # Class IDs
+        "detection_boxes": detector_outputs['detection_boxes'][0].numpy(), # Bounding boxes [ymin, xmin, ymax, xmax]
+    }
+
 def identify_items(image: Image.Image, confidence_threshold=0.3) -> Union[List[Dict[str, Any]], str]:
     """
     Identifies items in an image using EfficientDet-Lite0 with persistent caching.
@@ -54,33 +78,24 @@ def identify_items(image: Image.Image, confidence_threshold=0.3) -> Union[List[D
         and 'box' for a detected item, or a string with an error message.
         Returns an empty list if no relevant items are found.
     """
-    model_manager = get_model_manager()
-    
-    # Get the model (from cache or download)
-    model = model_manager.get_model("efficientdet_lite0")
-    
-    if model is None:
-        return "Error: Item identification model (EfficientDet-Lite0) could not be loaded."
-
     try:
         # Preprocess the image
         # 1. Convert to RGB
         image_rgb = image.convert("RGB")
         # 2. Convert PIL Image to NumPy array
         image_np = np.array(image_rgb)
-        # 3. Add a batch dimension and ensure dtype is uint8 as expected by some TF Hub models
-        # The model expects a tensor of shape [1, height, width, 3]
-        image_tensor = tf.convert_to_tensor(image_np, dtype=tf.uint8)[tf.newaxis, ...]
-
-        # Perform detection
-        # The model returns a dictionary of tensors.
-        detector_outputs = model(image_tensor)
-
-        # Process results
-        # These keys are standard for TF Object Detection API models on TF Hub
-        detection_scores = detector_outputs['detection_scores'][0].numpy() # Get scores for the first (and only) image
-        detection_classes = detector_outputs['detection_classes'][0].numpy().astype(np.int32) # Class IDs
-        detection_boxes = detector_outputs['detection_boxes'][0].numpy() # Bounding boxes [ymin, xmin, ymax, xmax]
+
+        # Perform detection, in this process or in the shared inference process
+        if is_remote_inference():
+            detections = get_inference_client().detect_items(image_np)
+        else:
+            if get_model_manager().get_model("efficientdet_lite0") is None:
+                return "Error: Item identification model (EfficientDet-Lite0) could not be loaded."
+            detections = run_item_detector(image_np)
+
+        detection_scores = detections["detection_scores"]
+        detection_classes = detections["detection_classes"]
+        detection_boxes = detections["detection_boxes"]
 
         identified_items_list = []
 
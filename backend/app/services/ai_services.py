@@ -3,13 +3,14 @@
 # and item identification, or can operate in a demo mode with static data.
 
 import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, UploadFile
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from PIL import Image
 import io
 import numpy as np
-from typing import List, Optional, Union, Any # Added Union, Any
-from sklearn.cluster import KMeans
+from typing import Callable, Dict, List, Optional, Union, Any, Tuple # Added Union, Any
 import logging # Added for logging
 
 from .. import tables as schemas # models import removed as it wasn't used directly here
@@ -17,6 +18,8 @@ from .. import tables as schemas # models import removed as it wasn't used direc
 from .ai_embedding import get_image_embedding
 from .ai_style import detect_style as lw_detect_style # Alias to avoid conflict if needed
 from .ai_recommender import identify_items as lw_identify_items, get_basic_recommendations
+from .color_quantizer import extract_palette
+from .analysis_cache import get_analysis_cache
 
 # --- Global Configuration ---
 # DEMO_MODE can be triggered by an environment variable for easier configuration
@@ -27,54 +30,79 @@ logger = logging.getLogger(__name__) # Added logger
 if DEMO_MODE:
     logger.info("AI Services are running in DEMO MODE.")
 
+# The analysis stages (embedding, colors, style, item detection) are independent, so they
+# run concurrently on a bounded pool and latency is the slowest stage, not the sum.
+# A stage that exceeds its timeout (or crashes) yields a placeholder for its fields and
+# is listed in the response's degradedStages instead of failing the request.
+ANALYSIS_STAGE_WORKERS = int(os.getenv("ANALYSIS_STAGE_WORKERS", "4"))
+ANALYSIS_STAGE_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_STAGE_TIMEOUT_SECONDS", "20"))
+
+def _parse_stage_timeouts(value: str) -> Dict[str, float]:
+    """Per-stage overrides such as "items=30,colors=5"."""
+    timeouts = {}
+    for part in value.split(","):
+        if "=" in part:
+            stage, seconds = part.split("=", 1)
+            timeouts[stage.strip()] = float(seconds)
+    return timeouts
+
+ANALYSIS_STAGE_TIMEOUTS = _parse_stage_timeouts(os.getenv("ANALYSIS_STAGE_TIMEOUTS", ""))
+
+_stage_executor = ThreadPoolExecutor(max_workers=max(1, ANALYSIS_STAGE_WORKERS), thread_name_prefix="analysis-stage")
+
 # --- AI Functions ---
 
-# extract_colors remains the same as it uses scikit-learn (considered lightweight enough)
-def extract_colors(image: Image.Image, num_colors=5) -> List[str]:
+DEFAULT_PALETTE = ["#EAEAEA", "#B0B0B0", "#505050", "#202020", "#F0F0F0"] # Returned when extraction fails
+
+def extract_color_palette(image: Image.Image, num_colors=5) -> List[Tuple[str, float]]:
     """
-    Extracts dominant colors from an image using KMeans clustering.
+    Extracts dominant colors with the percentage of pixels each covers,
+    using 3D histogram quantization (see color_quantizer.py).
     """
     try:
-        image_work = image.copy() # Work on a copy
-        image_work.thumbnail((100, 100))
-        image_arr = np.array(image_work)
-
-        if image_arr.ndim == 2:
-            image_arr = np.stack((image_arr,)*3, axis=-1)
-        elif image_arr.shape[2] == 4:
-            image_arr = image_arr[:, :, :3]
-
-        if image_arr.shape[0] == 0 or image_arr.shape[1] == 0 : # Check for empty image after thumbnail
-             raise ValueError("Image became empty after thumbnailing, check input image.")
-
-        pixels = image_arr.reshape(-1, 3)
-        if pixels.shape[0] < num_colors: # Not enough pixels for desired clusters
-            # Fallback: return fewer colors or a default palette
-            # For simplicity, returning a default if too few pixels
-            logger.warning(f"Not enough pixels to extract {num_colors} colors. Returning default.")
-            return ["#FFFFFF", "#000000", "#CCCCCC"]
-
-
-        kmeans = KMeans(n_clusters=num_colors, random_state=0, n_init='auto').fit(pixels)
-        dominant_colors = kmeans.cluster_centers_.astype(int)
-        hex_colors = [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in dominant_colors]
-        return hex_colors
+        palette = extract_palette(image, num_colors=num_colors)
+        if not palette:
+            raise ValueError("Image has no visible pixels, check input image.")
+        return palette
     except Exception as e:
         logger.error(f"Error during color extraction: {e}")
-        return ["#EAEAEA", "#B0B0B0", "#505050", "#202020", "#F0F0F0"] # Default palette on error
+        return [(c, 0.0) for c in DEFAULT_PALETTE] # Default palette on error
+
+def extract_colors(image: Image.Image, num_colors=5) -> List[str]:
+    """
+    Extracts dominant colors from an image as hex strings, most common first.
+    """
+    return [color for color, _ in extract_color_palette(image, num_colors=num_colors)]
+
+async def _run_stage(stage: str, fn: Callable[[Image.Image], Any], image: Image.Image, fallback: Any) -> Tuple[Any, bool]:
+    """
+    Runs one analysis stage on the stage pool. Returns (result, degraded); on timeout or an
+    unexpected error the result is the fallback. A timed-out stage keeps its worker until
+    it finishes (threads cannot be interrupted), which the pool size bounds.
+    """
+    timeout = ANALYSIS_STAGE_TIMEOUTS.get(stage, ANALYSIS_STAGE_TIMEOUT_SECONDS)
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(_stage_executor, fn, image), timeout=timeout), False
+    except asyncio.TimeoutError:
+        logger.warning(f"Analysis stage '{stage}' timed out after {timeout}s")
+    except Exception as e:
+        logger.error(f"Analysis stage '{stage}' failed: {e}")
+    return fallback, True
 
 # --- Main Service Function ---
 
 async def analyze_outfit_image_service(
     file: UploadFile,
-    db: Session, # db and user are kept for potential future use (e.g., saving analysis)
+    db: AsyncSession, # db and user are kept for potential future use (e.g., saving analysis)
     user: schemas.User
 ) -> schemas.OutfitAnalysisResponse:
     try:
         image_bytes = await file.read()
         if not image_bytes:
             raise HTTPException(status_code=400, detail="No image data received.")
-        image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+        # Decoding a large photo takes tens of milliseconds; keep it off the event loop
+        image = await asyncio.to_thread(lambda: Image.open(io.BytesIO(image_bytes)).convert("RGB"))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid image file: {str(e)}")
 
@@ -114,25 +142,60 @@ async def analyze_outfit_image_service(
         )
 
     # --- REGULAR (Lightweight Models) MODE ---
+    # 0. Look up earlier results for the exact same image bytes (re-uploads, or a photo
+    # already added to the wardrobe). A full hit skips every model below.
+    analysis_cache = get_analysis_cache()
+    cache_key = await asyncio.to_thread(analysis_cache.key_for, image_bytes)
+    cached_results = await asyncio.to_thread(analysis_cache.get, cache_key) or {}
+    if "analysis" in cached_results:
+        logger.info(f"Lightweight AI: Serving cached analysis for {file.filename}")
+        return schemas.OutfitAnalysisResponse(
+            fileName=file.filename,
+            contentType=file.content_type,
+            debug_info="Analyzed with lightweight models. Served from the analysis cache.",
+            **cached_results["analysis"]
+        )
+
     logger.info(f"Lightweight AI: Analyzing {file.filename}")
+    # Stages 1-4 run concurrently. They only read the decoded image, so they share it
+    # instead of each taking a copy.
+    stages: Dict[str, Any] = {}
     # 1. Extract Image Embedding (returns List[float] or error string)
     # Not directly in OutfitAnalysisResponse, but could be logged or stored.
-    image_embedding_result = get_image_embedding(image.copy())
+    if cached_results.get("embedding") is None:
+        stages["embedding"] = _run_stage("embedding", get_image_embedding, image,
+                                         "Error: Image embedding timed out or failed.")
+    # 2. Extract Colors (already lightweight)
+    if not cached_results.get("palette"):
+        stages["colors"] = _run_stage("colors", extract_color_palette, image,
+                                      [(c, 0.0) for c in DEFAULT_PALETTE])
+    # 3. Detect Style (lightweight placeholder)
+    # lw_detect_style returns a string (style description or error/placeholder message)
+    stages["style"] = _run_stage("style", lw_detect_style, image, "Style analysis unavailable (error or timeout)")
+    # 4. Identify Items (lightweight EfficientDet-Lite0)
+    # lw_identify_items returns List[Dict] or error string
+    stages["items"] = _run_stage("items", lw_identify_items, image, "Error: Item identification timed out or failed.")
+
+    stage_results = dict(zip(stages, await asyncio.gather(*stages.values())))
+    degraded_stages = [stage for stage, (_, degraded) in stage_results.items() if degraded]
+
+    if "embedding" in stage_results:
+        image_embedding_result = stage_results["embedding"][0]
+    else:
+        image_embedding_result = cached_results["embedding"]
     embedding_status_message = "Embedding extracted."
     if isinstance(image_embedding_result, str): # Error occurred
         embedding_status_message = image_embedding_result # Record the error/message
         # No critical failure for the response, just noting embedding failed.
 
-    # 2. Extract Colors (already lightweight)
-    extracted_colors = extract_colors(image.copy())
+    if "colors" in stage_results:
+        extracted_palette = stage_results["colors"][0]
+    else:
+        extracted_palette = [(color, percentage) for color, percentage in cached_results["palette"]]
+    extracted_colors = [color for color, _ in extracted_palette]
 
-    # 3. Detect Style (lightweight placeholder)
-    # lw_detect_style returns a string (style description or error/placeholder message)
-    detected_style_result = lw_detect_style(image.copy())
-
-    # 4. Identify Items (lightweight EfficientDet-Lite0)
-    # lw_identify_items returns List[Dict] or error string
-    identified_items_result = lw_identify_items(image.copy())
+    detected_style_result = stage_results["style"][0]
+    identified_items_result = stage_results["items"][0]
 
     # Prepare identified_items_for_response: List[str] as likely expected by original schema
     # And identified_items_for_recommendations: List[Dict] for our get_basic_recommendations
@@ -183,9 +246,8 @@ async def analyze_outfit_image_service(
             num_valid_colors = len(extracted_colors)
             if num_valid_colors > 0:
                 color_palette_resp = [
-                    {"color": c, "name": "Dominant Color",
-                      "percentage": round(100.0 / num_valid_colors, 1)}
-                    for c in extracted_colors
+                    {"color": c, "name": "Dominant Color", "percentage": percentage}
+                    for c, percentage in extracted_palette
                 ]
             else: # Handle case where extracted_colors might be empty or contain errors
                 color_palette_resp = [{"color": "#FFFFFF", "name": "Default", "percentage": 100.0}]
@@ -203,7 +265,7 @@ async def analyze_outfit_image_service(
         style_insights_resp = [{"category": "Overall Style", "score": 0, "description": detected_style_result}]
 
 
-    return schemas.OutfitAnalysisResponse(
+    response = schemas.OutfitAnalysisResponse(
         fileName=file.filename,
         contentType=file.content_type,
         style=str(detected_style_result), # Ensure it's a string
@@ -214,11 +276,25 @@ async def analyze_outfit_image_service(
         recommendations=recommendations,
         colorPalette=color_palette_resp,
         styleInsights=style_insights_resp,
+        degradedStages=degraded_stages or None,
         debug_info=f"Analyzed with lightweight models. Embedding status: {embedding_status_message}"
     )
 
+    # Cache only what succeeded, so a model that failed to load is retried next time.
+    results_to_cache: Dict[str, Any] = {}
+    if not isinstance(image_embedding_result, str):
+        results_to_cache["embedding"] = image_embedding_result
+    if any(percentage > 0 for _, percentage in extracted_palette): # Not the fallback palette
+        results_to_cache["palette"] = extracted_palette
+    identification_failed = isinstance(identified_items_result, str) and identified_items_result.startswith("Error")
+    if "embedding" in results_to_cache and "palette" in results_to_cache and not identification_failed and not degraded_stages:
+        results_to_cache["analysis"] = response.model_dump(exclude={"fileName", "contentType", "debug_info"})
+    await asyncio.to_thread(analysis_cache.put, cache_key, **results_to_cache)
+
+    return response
+
 # --- get_fashion_trends_service remains unchanged (already mocked) ---
-async def get_fashion_trends_service(db: Session, user: Optional[schemas.User] = None) -> schemas.TrendForecastResponse:
+async def get_fashion_trends_service(db: AsyncSession, user: Optional[schemas.User] = None) -> schemas.TrendForecastResponse:
     # Mock implementation for now... (content is the same as before)
     mock_trends_data = [
         schemas.TrendDataItem(
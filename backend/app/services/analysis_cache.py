@@ -0,0 +1,276 @@
+# Content-addressed cache for image analysis results.
+# Entries are keyed by a SHA-256 of the raw image bytes together with a fingerprint
+# of everything that determines the result (model URLs/versions from
+# ModelManager.model_configs and the color engine version), so bumping a model
+# version invalidates old entries without an explicit flush.
+#
+# Each entry is a small JSON file holding whichever results are known for the image:
+# "embedding", "palette" and the full outfit "analysis". Both the analyze endpoint
+# and the wardrobe enrichment worker read and fill the same entries, so analysing a
+# photo and then uploading it to the wardrobe (or the reverse) runs the models once.
+# Files are evicted least-recently-used (by mtime, refreshed on every hit) once the
+# cache exceeds ANALYSIS_CACHE_MAX_MB or ANALYSIS_CACHE_MAX_ENTRIES.
+
+import os
+import json
+import base64
+import hashlib
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..db.types import decode_embedding, encode_embedding
+from .color_quantizer import COLOR_ENGINE_VERSION
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", "/tmp/wardrobe_analysis_cache")
+ANALYSIS_CACHE_MAX_MB = float(os.getenv("ANALYSIS_CACHE_MAX_MB", "256"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "20000"))
+
+# Bump when the analysis pipeline changes in a way the model/color versions do not capture.
+ANALYSIS_PIPELINE_VERSION = "1"
+# After an eviction pass the cache is trimmed to this fraction of its limits.
+_EVICTION_LOW_WATER = 0.9
+
+
+def pipeline_fingerprint() -> str:
+    """Versions of every component whose output is cached."""
+    from .model_manager import get_model_manager
+
+    parts = [f"pipeline:{ANALYSIS_PIPELINE_VERSION}", f"colors:{COLOR_ENGINE_VERSION}"]
+    for name, config in sorted(get_model_manager().model_configs.items()):
+        parts.append(f"{name}:{config['version']}:{config['url']}")
+    return "|".join(parts)
+
+
+def _encode_embedding_field(embedding: Any) -> str:
+    return base64.b64encode(encode_embedding(embedding, dtype="float32")).decode("ascii")
+
+
+def _decode_embedding_field(value: str) -> Optional[List[float]]:
+    array = decode_embedding(base64.b64decode(value))
+    return None if array is None else array.tolist()
+
+
+class AnalysisCache:
+    """
+    Disk-backed LRU cache of per-image analysis results, safe to share between
+    threads and between processes using the same directory (writes are atomic renames).
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = ANALYSIS_CACHE_DIR,
+        max_bytes: int = int(ANALYSIS_CACHE_MAX_MB * 1024 * 1024),
+        max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+        enabled: bool = ANALYSIS_CACHE_ENABLED,
+        fingerprint: Optional[str] = None
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._fingerprint = fingerprint
+
+        self._lock = threading.Lock()
+        self._scanned = False
+        self._total_bytes = 0
+        self._total_entries = 0
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+    # --- Keys and paths ---
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            self._fingerprint = pipeline_fingerprint()
+        return self._fingerprint
+
+    def key_for(self, image_bytes: bytes) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.fingerprint.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _entry_files(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk."""
+        files = []
+        if not self.cache_dir.exists():
+            return files
+        for shard in self.cache_dir.iterdir():
+            if not shard.is_dir():
+                continue
+            for path in shard.glob("*.json"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError: # Evicted by another process meanwhile
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _ensure_scanned(self):
+        # Caller holds self._lock
+        if self._scanned:
+            return
+        files = self._entry_files()
+        self._total_entries = len(files)
+        self._total_bytes = sum(size for _, size, _ in files)
+        self._scanned = True
+
+    # --- Reads and writes ---
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable analysis cache entry {path.name}: {e}")
+            self._unlink(path)
+            return None
+        if "embedding" in data:
+            data["embedding"] = _decode_embedding_field(data["embedding"])
+        return data
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the cached results for an image key, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        entry = self._read(path)
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        try:
+            os.utime(path) # Mark as recently used
+        except OSError:
+            pass
+        return entry
+
+    def put(self, key: str, **results: Any):
+        """
+        Stores results for an image key, merged into any existing entry.
+        Supported fields: embedding (list of floats), palette ([hex, percentage] pairs)
+        and analysis (a JSON-serializable dict).
+        """
+        if not self.enabled or not results:
+            return
+        path = self._path(key)
+        entry = self._read(path) or {}
+        entry.update(results)
+        if entry.get("embedding") is not None:
+            entry["embedding"] = _encode_embedding_field(entry["embedding"])
+        else:
+            entry.pop("embedding", None)
+
+        try:
+            payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            previous_size = path.stat().st_size if path.exists() else None
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write analysis cache entry: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            if not self._scanned:
+                self._ensure_scanned() # The scan already sees the file just written
+            elif previous_size is None:
+                self._total_entries += 1
+                self._total_bytes += len(payload)
+            else:
+                self._total_bytes += len(payload) - previous_size
+            over_limit = self._total_bytes > self.max_bytes or self._total_entries > self.max_entries
+        if over_limit:
+            self.evict()
+
+    def _unlink(self, path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Could not remove analysis cache entry {path.name}: {e}")
+            return False
+
+    # --- Eviction ---
+
+    def evict(self) -> int:
+        """Removes least recently used entries until the cache is back under its limits."""
+        with self._lock:
+            # Rescan rather than trust the running totals: other processes share the directory.
+            files = sorted(self._entry_files())
+            total_bytes = sum(size for _, size, _ in files)
+            total_entries = len(files)
+            target_bytes = self.max_bytes * _EVICTION_LOW_WATER
+            target_entries = self.max_entries * _EVICTION_LOW_WATER
+
+            removed = 0
+            for _, size, path in files:
+                if total_bytes <= target_bytes and total_entries <= target_entries:
+                    break
+                if self._unlink(path):
+                    removed += 1
+                total_bytes -= size
+                total_entries -= 1
+
+            self._total_bytes = total_bytes
+            self._total_entries = total_entries
+            self._scanned = True
+            self._evictions += removed
+        if removed:
+            logger.info(f"Evicted {removed} analysis cache entr{'y' if removed == 1 else 'ies'}")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entry_files():
+                self._unlink(path)
+            self._total_bytes = 0
+            self._total_entries = 0
+            self._scanned = True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_scanned()
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "cache_dir": str(self.cache_dir),
+                "entries": self._total_entries,
+                "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else None,
+                "writes": self._writes,
+                "evictions": self._evictions,
+            }
+
+
+# Global cache instance
+analysis_cache = AnalysisCache()
+
+def get_analysis_cache() -> AnalysisCache:
+    """Get the global analysis cache instance"""
+    return analysis_cache
@@ -0,0 +1,95 @@
+# Dominant-color extraction by 3D histogram quantization.
+# Replaces fitting a fresh KMeans per image: pixels of a downsampled copy are binned
+# into a fixed RGB grid with np.bincount (one pass, fully vectorized), the most
+# populated bins seed the palette (skipping bins too close to an already chosen
+# color), and every occupied bin is then assigned to its nearest palette color to
+# get pixel-weighted mean colors and coverage percentages.
+
+import logging
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Bump when the algorithm or its defaults change; cached analysis results are keyed on it.
+COLOR_ENGINE_VERSION = "hist3d-1"
+
+BINS_PER_CHANNEL = 16 # 16^3 = 4096 bins, 16 levels per channel
+MAX_SIDE = 100 # Same downsampling as the previous KMeans path
+# Minimum RGB distance between two palette seeds; closer bins are folded into one color.
+MERGE_DISTANCE = 40.0
+
+# (hex color, percentage of pixels) pairs, most common first
+Palette = List[Tuple[str, float]]
+
+
+def _to_pixels(image: Image.Image, max_side: int) -> np.ndarray:
+    """Downsampled (N, 3) uint8 RGB pixels; fully transparent pixels are dropped."""
+    image_work = image.copy() # Work on a copy
+    image_work.thumbnail((max_side, max_side))
+    if image_work.mode in ("RGBA", "LA") or (image_work.mode == "P" and "transparency" in image_work.info):
+        rgba = np.asarray(image_work.convert("RGBA")).reshape(-1, 4)
+        return rgba[rgba[:, 3] > 0, :3]
+    return np.asarray(image_work.convert("RGB")).reshape(-1, 3)
+
+
+def _to_hex(color: np.ndarray) -> str:
+    r, g, b = np.clip(np.rint(color), 0, 255).astype(int)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def quantize_pixels(
+    pixels: np.ndarray,
+    num_colors: int = 5,
+    bins_per_channel: int = BINS_PER_CHANNEL,
+    merge_distance: float = MERGE_DISTANCE
+) -> Palette:
+    """Builds a palette of at most num_colors from (N, 3) uint8 RGB pixels."""
+    if pixels.size == 0 or num_colors <= 0:
+        return []
+
+    shift = 8 - int(np.log2(bins_per_channel))
+    quantized = (pixels >> shift).astype(np.intp)
+    bin_index = (quantized[:, 0] * bins_per_channel + quantized[:, 1]) * bins_per_channel + quantized[:, 2]
+
+    n_bins = bins_per_channel ** 3
+    counts = np.bincount(bin_index, minlength=n_bins)
+    occupied = np.flatnonzero(counts)
+    occupied_counts = counts[occupied].astype(np.float64)
+    # Mean color of the pixels in each occupied bin (more accurate than the bin center)
+    means = np.stack([
+        np.bincount(bin_index, weights=pixels[:, channel], minlength=n_bins)[occupied] / occupied_counts
+        for channel in range(3)
+    ], axis=1)
+
+    # Seed the palette from the most populated bins, skipping near-duplicates. Images with
+    # fewer distinct colors than num_colors get a shorter palette rather than split shades.
+    order = np.argsort(-occupied_counts, kind="stable")
+    seeds: List[int] = []
+    for candidate in order:
+        if len(seeds) >= num_colors:
+            break
+        if seeds and np.min(np.linalg.norm(means[seeds] - means[candidate], axis=1)) < merge_distance:
+            continue
+        seeds.append(candidate)
+
+    # Assign every occupied bin to its nearest seed and take pixel-weighted means.
+    seed_colors = means[seeds]
+    distances = ((means[:, None, :] - seed_colors[None, :, :]) ** 2).sum(axis=2)
+    assignment = np.argmin(distances, axis=1)
+    palette_counts = np.bincount(assignment, weights=occupied_counts, minlength=len(seeds))
+    palette_colors = np.stack([
+        np.bincount(assignment, weights=means[:, channel] * occupied_counts, minlength=len(seeds))
+        for channel in range(3)
+    ], axis=1) / palette_counts[:, None]
+
+    total = palette_counts.sum()
+    ranked = np.argsort(-palette_counts, kind="stable")
+    return [(_to_hex(palette_colors[i]), round(float(palette_counts[i] / total * 100.0), 1)) for i in ranked]
+
+
+def extract_palette(image: Image.Image, num_colors: int = 5, max_side: int = MAX_SIDE) -> Palette:
+    """Dominant colors of an image with the share of pixels each one covers."""
+    return quantize_pixels(_to_pixels(image, max_side), num_colors=num_colors)
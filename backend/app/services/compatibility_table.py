@@ -0,0 +1,303 @@
+# This module maintains a persisted pairwise compatibility table for each user's wardrobe.
+# Recommenders score outfits from two pairwise quantities: the cosine similarity of the
+# items' image embeddings (style cohesion) and the color harmony of their combined
+# dominant colors. Instead of recomputing them on every request, every wardrobe item has
+# one ItemCompatibility row holding its scores against all other items of its owner.
+#
+# Maintenance is incremental: when an item is added, edited or enriched only its own row
+# is recomputed (O(n) work). The other items' rows still hold the pair's old value, so
+# when a user's table is assembled the newer of the two rows of a pair wins. Deleted
+# items drop out because their rows are deleted with them and their ids no longer match
+# any current item.
+#
+# Rebuild all rows with `python -m app.services.compatibility_table [--user-id ID]`.
+
+import os
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from .. import model as models
+from ..db.database import SessionLocal
+from .outfit_matching_service import COLOR_WEIGHT, STYLE_WEIGHT, _cached_color_harmony
+
+logger = logging.getLogger(__name__)
+
+COMPATIBILITY_TABLE_MAX_USERS = int(os.getenv("COMPATIBILITY_TABLE_MAX_USERS", "200"))
+
+
+def _pack_ids(ids: np.ndarray) -> bytes:
+    return np.asarray(ids, dtype="<i8").tobytes()
+
+
+def _unpack_ids(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<i8")
+
+
+class _WardrobeSnapshot:
+    """Ids, colors and normalized embeddings of one user's items, for computing rows."""
+
+    def __init__(self, rows: Sequence):
+        self.ids = np.array([row.id for row in rows], dtype=np.int64)
+        self.colors = [frozenset(row.ai_dominant_colors or ()) for row in rows]
+        embeddings = [getattr(row, "ai_embedding", None) for row in rows]
+        self.dims = np.array([0 if e is None else np.asarray(e).size for e in embeddings], dtype=np.int64)
+        # One normalized matrix per embedding size; rows of other sizes stay zero
+        self._matrices: Dict[int, np.ndarray] = {}
+        for dim in set(self.dims.tolist()) - {0}:
+            matrix = np.zeros((len(rows), dim), dtype=np.float32)
+            for position in np.flatnonzero(self.dims == dim):
+                matrix[position] = np.asarray(embeddings[position], dtype=np.float32).ravel()
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._matrices[dim] = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        self.position = {int(item_id): position for position, item_id in enumerate(self.ids)}
+
+    def row_for(self, position: int, harmony_memo: Dict[Tuple[int, int], float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(partner ids, style similarity, color harmony) of one item against all others."""
+        others = np.flatnonzero(np.arange(len(self.ids)) != position)
+        similarity = np.full(others.size, np.nan, dtype=np.float32)
+        dim = int(self.dims[position])
+        if dim:
+            comparable = others[self.dims[others] == dim]
+            matrix = self._matrices[dim]
+            similarity[self.dims[others] == dim] = matrix[comparable] @ matrix[position]
+
+        harmony = np.empty(others.size, dtype=np.float32)
+        own_colors = self.colors[position]
+        for slot, other in enumerate(others):
+            key = (min(position, other), max(position, other))
+            value = harmony_memo.get(key)
+            if value is None:
+                value = harmony_memo[key] = _cached_color_harmony(own_colors | self.colors[other])
+            harmony[slot] = value
+        return self.ids[others], similarity, harmony
+
+
+def refresh_items(db: Session, user_id: int, item_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recomputes the compatibility rows of the given items (all of the user's items if
+    None) against the user's current wardrobe and commits. Returns the number of rows written.
+    """
+    query = db.query(models.WardrobeItem.id, models.WardrobeItem.ai_dominant_colors, models.WardrobeItem.ai_embedding)
+    rows = query.filter(models.WardrobeItem.user_id == user_id).order_by(models.WardrobeItem.id).all()
+    snapshot = _WardrobeSnapshot(rows)
+    targets = snapshot.ids.tolist() if item_ids is None else [i for i in item_ids if i in snapshot.position]
+    if not targets:
+        return 0
+
+    existing = {
+        row.item_id: row for row in
+        db.query(models.ItemCompatibility).filter(models.ItemCompatibility.item_id.in_(targets)).all()
+    }
+    version = time.time_ns() // 1000
+    harmony_memo: Dict[Tuple[int, int], float] = {}
+    for item_id in targets:
+        partner_ids, similarity, harmony = snapshot.row_for(snapshot.position[item_id], harmony_memo)
+        row = existing.get(item_id)
+        if row is None:
+            row = models.ItemCompatibility(item_id=item_id, user_id=user_id)
+            db.add(row)
+        row.version = version
+        row.embedding_dim = int(snapshot.dims[snapshot.position[item_id]])
+        row.partner_ids = _pack_ids(partner_ids)
+        row.style_similarity = similarity
+        row.color_harmony = harmony
+    db.commit()
+    get_compatibility_registry().invalidate(user_id)
+    return len(targets)
+
+
+def refresh_item_compatibility(db: Session, db_item: models.WardrobeItem):
+    """Recomputes one item's row after it was created, edited or enriched. Never raises."""
+    try:
+        refresh_items(db, db_item.user_id, [db_item.id])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not refresh compatibility row for item {db_item.id}: {e}")
+
+
+class CompatibilityTable:
+    """
+    Assembled pairwise scores for one user's current items. `similarity` holds embedding
+    cosine similarities (NaN where the items are not comparable) and `color_harmony`
+    the harmony of each pair's combined colors, both indexed like `item_ids`.
+    """
+
+    def __init__(self, item_ids: np.ndarray, embedding_dims: np.ndarray, similarity: np.ndarray, color_harmony: np.ndarray):
+        self.item_ids = item_ids
+        self.embedding_dims = embedding_dims
+        self.similarity = similarity
+        self.color_harmony = color_harmony
+        self.position = {int(item_id): position for position, item_id in enumerate(item_ids)}
+
+    def __len__(self) -> int:
+        return len(self.item_ids)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self.position
+
+    def positions(self, item_ids: Sequence[int]) -> np.ndarray:
+        return np.array([self.position[i] for i in item_ids], dtype=np.intp)
+
+    def style_similarity(self, item_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (similarity matrix, has_embedding) for a pool of items, in the form
+        CompatibilityMatrix expects: items whose embedding size differs from the pool's
+        most common size count as having no embedding.
+        """
+        rows = self.positions(item_ids)
+        dims = self.embedding_dims[rows]
+        counts = Counter(d for d in dims.tolist() if d)
+        pool_dim = counts.most_common(1)[0][0] if counts else 0
+        has_embedding = (dims == pool_dim) & (dims > 0)
+        similarity = np.nan_to_num(self.similarity[np.ix_(rows, rows)], nan=0.0)
+        return similarity, has_embedding
+
+    def pair_scores(self, item_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """
+        Overall compatibility of every pair, weighted like a two-item outfit in
+        OutfitMatchingService (items without comparable embeddings get a neutral style score).
+        """
+        rows = np.arange(len(self.item_ids)) if item_ids is None else self.positions(item_ids)
+        similarity = self.similarity[np.ix_(rows, rows)]
+        style = np.where(np.isnan(similarity), 0.5, (similarity + 1) / 2)
+        scores = style * STYLE_WEIGHT + self.color_harmony[np.ix_(rows, rows)] * COLOR_WEIGHT
+        return np.clip(scores, 0, 1)
+
+
+def _assemble(item_ids: np.ndarray, rows: Sequence) -> Tuple[CompatibilityTable, np.ndarray]:
+    """Builds the table from stored rows, newest row winning per pair. Also returns a mask of unfilled pairs."""
+    position = {int(item_id): p for p, item_id in enumerate(item_ids)}
+    n = len(item_ids)
+    similarity = np.full((n, n), np.nan, dtype=np.float32)
+    color_harmony = np.full((n, n), np.nan, dtype=np.float32)
+    embedding_dims = np.zeros(n, dtype=np.int64)
+    filled = np.eye(n, dtype=bool)
+
+    for row in sorted(rows, key=lambda r: (r.version, r.item_id)):
+        own = position.get(row.item_id)
+        if own is None:
+            continue
+        embedding_dims[own] = row.embedding_dim
+        partner_ids = _unpack_ids(row.partner_ids)
+        partner_similarity = row.style_similarity if row.style_similarity is not None else np.empty(0, dtype=np.float32)
+        partner_harmony = row.color_harmony if row.color_harmony is not None else np.empty(0, dtype=np.float32)
+        slots = [(slot, position[int(pid)]) for slot, pid in enumerate(partner_ids.tolist()) if int(pid) in position]
+        if not slots:
+            continue
+        source, target = (np.array(v, dtype=np.intp) for v in zip(*slots))
+        similarity[own, target] = similarity[target, own] = partner_similarity[source]
+        color_harmony[own, target] = color_harmony[target, own] = partner_harmony[source]
+        filled[own, target] = filled[target, own] = True
+
+    return CompatibilityTable(item_ids, embedding_dims, similarity, color_harmony), ~filled
+
+
+def build_compatibility_table(db: Session, user_id: int) -> CompatibilityTable:
+    """
+    Assembles the user's table from the stored rows. Items without a row (created before
+    the table existed, or by a path that skipped the refresh) and pairs that neither row
+    covers (two items created concurrently) are computed on the spot and persisted.
+    """
+    item_ids = np.array([row.id for row in db.query(models.WardrobeItem.id)
+                         .filter(models.WardrobeItem.user_id == user_id).order_by(models.WardrobeItem.id)], dtype=np.int64)
+    rows = db.query(models.ItemCompatibility).filter(models.ItemCompatibility.user_id == user_id).all()
+    table, unfilled = _assemble(item_ids, rows)
+
+    stale = {int(item_ids[p]) for p in np.flatnonzero(unfilled.any(axis=1))}
+    if stale:
+        logger.info(f"Computing {len(stale)} missing compatibility row(s) for user {user_id}")
+        refresh_items(db, user_id, sorted(stale))
+        rows = db.query(models.ItemCompatibility).filter(models.ItemCompatibility.user_id == user_id).all()
+        table, _ = _assemble(item_ids, rows)
+    return table
+
+
+class CompatibilityTableRegistry:
+    """
+    LRU of assembled tables. A cached table is reused while the user's item count, row
+    count and newest row version are unchanged, which one aggregate query checks.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_users: int = COMPATIBILITY_TABLE_MAX_USERS):
+        self.session_factory = session_factory
+        self.max_users = max(1, max_users)
+        self._tables: "OrderedDict[int, Tuple[tuple, CompatibilityTable]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _state(db: Session, user_id: int) -> tuple:
+        item_count = db.query(func.count(models.WardrobeItem.id)).filter(models.WardrobeItem.user_id == user_id).scalar()
+        row_count, newest = db.query(
+            func.count(models.ItemCompatibility.item_id), func.max(models.ItemCompatibility.version)
+        ).filter(models.ItemCompatibility.user_id == user_id).one()
+        return item_count, row_count, newest
+
+    def get(self, user_id: int, db: Optional[Session] = None) -> CompatibilityTable:
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            state = self._state(db, user_id)
+            with self._lock:
+                cached = self._tables.get(user_id)
+                if cached is not None and cached[0] == state:
+                    self._tables.move_to_end(user_id)
+                    return cached[1]
+            table = build_compatibility_table(db, user_id)
+            state = self._state(db, user_id) # Rows may have been filled in while building
+        finally:
+            if own_session:
+                db.close()
+
+        with self._lock:
+            self._tables[user_id] = (state, table)
+            self._tables.move_to_end(user_id)
+            while len(self._tables) > self.max_users:
+                self._tables.popitem(last=False)
+        return table
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(user_id, None)
+
+
+# Global registry instance
+compatibility_registry = CompatibilityTableRegistry()
+
+def get_compatibility_registry() -> CompatibilityTableRegistry:
+    """Get the global compatibility table registry instance"""
+    return compatibility_registry
+
+
+def rebuild_all(db: Session, user_id: Optional[int] = None) -> int:
+    """Recomputes every row (for one user, or for all users). Returns the number of rows written."""
+    if user_id is not None:
+        return refresh_items(db, user_id)
+    user_ids = [row.user_id for row in db.query(models.WardrobeItem.user_id).distinct()]
+    return sum(refresh_items(db, uid) for uid in user_ids)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Rebuild the persisted item compatibility table")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rows")
+    args = parser.parse_args()
+
+    from ..db.database import Base, engine
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        logger.info(f"Rebuilt {rebuild_all(session, args.user_id)} compatibility row(s)")
+    finally:
+        session.close()
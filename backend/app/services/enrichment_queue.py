@@ -0,0 +1,342 @@
+# This module runs AI enrichment (image embedding + dominant colors) for wardrobe
+# uploads out of band. Upload handlers only persist the item and an EnrichmentJob
+# row; a small worker pool picks pending jobs from the database, runs the models
+# and writes the results back onto the item.
+# Because jobs live in the database they survive restarts, and claiming a job is a
+# conditional UPDATE, so several API processes can share the same table safely.
+
+import io
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Set, Tuple
+
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from .. import model as models
+from ..db.database import SessionLocal
+from .vector_index import get_vector_index_registry
+from .compatibility_table import refresh_item_compatibility
+from .outfit_embeddings import refresh_outfits_containing
+from .analysis_cache import get_analysis_cache
+
+logger = logging.getLogger(__name__)
+
+# Item-level AI status (WardrobeItem.ai_status)
+AI_STATUS_PENDING = "pending"
+AI_STATUS_PROCESSING = "processing"
+AI_STATUS_COMPLETED = "completed"
+AI_STATUS_FAILED = "failed"
+
+# Job-level status (EnrichmentJob.status)
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ENRICHMENT_ENABLED = os.getenv("ENRICHMENT_ENABLED", "true").lower() == "true"
+ENRICHMENT_WORKERS = int(os.getenv("ENRICHMENT_WORKERS", "2"))
+ENRICHMENT_POLL_INTERVAL_SECONDS = float(os.getenv("ENRICHMENT_POLL_INTERVAL_SECONDS", "5"))
+ENRICHMENT_MAX_ATTEMPTS = int(os.getenv("ENRICHMENT_MAX_ATTEMPTS", "3"))
+# A failed attempt is retried after this delay, doubled for every further attempt.
+ENRICHMENT_RETRY_BACKOFF_SECONDS = float(os.getenv("ENRICHMENT_RETRY_BACKOFF_SECONDS", "30"))
+# A job left in "running" longer than this is assumed to belong to a dead process.
+ENRICHMENT_STALE_AFTER_SECONDS = int(os.getenv("ENRICHMENT_STALE_AFTER_SECONDS", "600"))
+
+# (embedding, colors) for an image
+EnrichmentResult = Tuple[Optional[List[float]], Optional[List[str]]]
+
+
+def image_url_to_path(image_url: str) -> str:
+    """Image URLs are stored as '/static/...'; files live relative to the working directory."""
+    return image_url.lstrip("/")
+
+
+def enrich_image(image_path: str) -> EnrichmentResult:
+    """
+    Default processor: runs the embedding model and color extraction on a stored image.
+    Results are shared with the analyze endpoint through the content-hash analysis cache.
+    """
+    from . import ai_embedding, ai_services
+
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    analysis_cache = get_analysis_cache()
+    cache_key = analysis_cache.key_for(image_bytes)
+    cached_results = analysis_cache.get(cache_key) or {}
+    embedding = cached_results.get("embedding")
+    palette = cached_results.get("palette")
+    if embedding is not None and palette:
+        return embedding, [color for color, _ in palette]
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.load()
+        if embedding is None:
+            embedding = ai_embedding.get_image_embedding(image)
+            if isinstance(embedding, str): # get_image_embedding reports failures as a message
+                raise RuntimeError(embedding)
+        if not palette:
+            palette = ai_services.extract_color_palette(image)
+    if any(percentage > 0 for _, percentage in palette): # Not the fallback palette
+        analysis_cache.put(cache_key, embedding=embedding, palette=palette)
+    else:
+        analysis_cache.put(cache_key, embedding=embedding)
+    return embedding, [color for color, _ in palette]
+
+
+def enqueue_enrichment(db: Session, db_item: models.WardrobeItem) -> models.EnrichmentJob:
+    """
+    Queues enrichment for the item's current image and marks the item as pending.
+    Older jobs for the same item are cancelled. The caller commits the session and
+    should then call `get_enrichment_queue().notify()`.
+    """
+    db.query(models.EnrichmentJob).filter(
+        models.EnrichmentJob.item_id == db_item.id,
+        models.EnrichmentJob.status.in_([JOB_PENDING, JOB_RUNNING])
+    ).update({models.EnrichmentJob.status: JOB_CANCELLED, models.EnrichmentJob.finished_at: datetime.utcnow()},
+             synchronize_session=False)
+
+    db_item.ai_status = AI_STATUS_PENDING
+    job = models.EnrichmentJob(
+        item_id=db_item.id,
+        user_id=db_item.user_id,
+        image_url=db_item.image_url,
+        status=JOB_PENDING,
+        attempts=0,
+        created_at=datetime.utcnow()
+    )
+    db.add(job)
+    return job
+
+
+def cancel_enrichment(db: Session, item_id: int):
+    """Cancels outstanding jobs for an item whose image was removed."""
+    db.query(models.EnrichmentJob).filter(
+        models.EnrichmentJob.item_id == item_id,
+        models.EnrichmentJob.status.in_([JOB_PENDING, JOB_RUNNING])
+    ).update({models.EnrichmentJob.status: JOB_CANCELLED, models.EnrichmentJob.finished_at: datetime.utcnow()},
+             synchronize_session=False)
+
+
+def _due(now: datetime):
+    """Jobs that are not waiting out a retry backoff."""
+    return (models.EnrichmentJob.not_before.is_(None)) | (models.EnrichmentJob.not_before <= now)
+
+
+class EnrichmentQueue:
+    """
+    Database-backed job queue with a bounded worker pool.
+    A dispatcher thread polls for pending jobs (and is woken early by `notify()`),
+    hands them to the pool, and workers claim each job atomically before running it.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = ENRICHMENT_WORKERS,
+        poll_interval: float = ENRICHMENT_POLL_INTERVAL_SECONDS,
+        max_attempts: int = ENRICHMENT_MAX_ATTEMPTS,
+        retry_backoff: float = ENRICHMENT_RETRY_BACKOFF_SECONDS,
+        processor: Callable[[str], EnrichmentResult] = enrich_image
+    ):
+        self.session_factory = session_factory
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.max_attempts = max(1, max_attempts)
+        self.retry_backoff = max(0.0, retry_backoff)
+        self.processor = processor
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._in_flight: Set[int] = set()
+        self._lock = threading.Lock()
+
+    # --- Lifecycle ---
+
+    def start(self):
+        if self._dispatcher is not None and self._dispatcher.is_alive():
+            return
+        self._stop.clear()
+        self.requeue_stale_jobs()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrichment")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="enrichment-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Enrichment queue started with {self.workers} worker(s)")
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join(timeout=self.poll_interval + 1)
+            self._dispatcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        logger.info("Enrichment queue stopped")
+
+    def notify(self):
+        """Wakes the dispatcher so freshly committed jobs start without waiting for the next poll."""
+        self._wake.set()
+
+    # --- Dispatching ---
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            try:
+                self._dispatch_pending()
+            except Exception as e:
+                logger.error(f"Enrichment dispatcher error: {e}")
+            self._wake.wait(timeout=self.poll_interval)
+            self._wake.clear()
+
+    def _dispatch_pending(self):
+        with self._lock:
+            free_slots = self.workers - len(self._in_flight)
+            in_flight = set(self._in_flight)
+        if free_slots <= 0:
+            return
+
+        db = self.session_factory()
+        try:
+            query = db.query(models.EnrichmentJob.id).filter(models.EnrichmentJob.status == JOB_PENDING, _due(datetime.utcnow()))
+            if in_flight:
+                query = query.filter(models.EnrichmentJob.id.notin_(in_flight))
+            job_ids = [row.id for row in query.order_by(models.EnrichmentJob.id).limit(free_slots).all()]
+        finally:
+            db.close()
+
+        for job_id in job_ids:
+            with self._lock:
+                self._in_flight.add(job_id)
+            self._executor.submit(self._run_job, job_id)
+
+    def _run_job(self, job_id: int):
+        try:
+            self.process_job(job_id)
+        except Exception as e:
+            logger.error(f"Unexpected error processing enrichment job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(job_id)
+            # A slot just freed up; look for more work right away.
+            self._wake.set()
+
+    # --- Job processing ---
+
+    def _claim(self, db: Session, job_id: int) -> bool:
+        claimed = db.query(models.EnrichmentJob).filter(
+            models.EnrichmentJob.id == job_id,
+            models.EnrichmentJob.status == JOB_PENDING,
+            _due(datetime.utcnow())
+        ).update({
+            models.EnrichmentJob.status: JOB_RUNNING,
+            models.EnrichmentJob.started_at: datetime.utcnow(),
+            models.EnrichmentJob.attempts: models.EnrichmentJob.attempts + 1
+        }, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def process_job(self, job_id: int) -> Optional[str]:
+        """Claims and runs a single job. Returns the job's final status, or None if it was not claimable."""
+        db = self.session_factory()
+        try:
+            if not self._claim(db, job_id):
+                return None
+
+            job = db.get(models.EnrichmentJob, job_id)
+            db_item = db.get(models.WardrobeItem, job.item_id)
+            if db_item is None or db_item.image_url != job.image_url:
+                # Item deleted or its image replaced since the job was queued.
+                job.status = JOB_CANCELLED
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                return job.status
+
+            db_item.ai_status = AI_STATUS_PROCESSING
+            db.commit()
+
+            try:
+                embedding, colors = self.processor(image_url_to_path(job.image_url))
+            except Exception as e:
+                logger.error(f"Enrichment failed for item {db_item.id} (attempt {job.attempts}): {e}")
+                job.error = str(e)[:2000]
+                if job.attempts >= self.max_attempts:
+                    job.status = JOB_FAILED
+                    job.finished_at = datetime.utcnow()
+                    db_item.ai_status = AI_STATUS_FAILED
+                else:
+                    job.status = JOB_PENDING # Retried on a dispatch after the backoff
+                    job.not_before = datetime.utcnow() + timedelta(seconds=self.retry_backoff * 2 ** (job.attempts - 1))
+                    db_item.ai_status = AI_STATUS_PENDING
+                db.commit()
+                return job.status
+
+            # Re-check under the same transaction that writes the results.
+            db.refresh(db_item)
+            db.refresh(job)
+            if job.status != JOB_RUNNING or db_item.image_url != job.image_url:
+                if job.status == JOB_RUNNING:
+                    job.status = JOB_CANCELLED
+                    job.finished_at = datetime.utcnow()
+                    db.commit()
+                return job.status
+
+            db_item.ai_embedding = embedding
+            db_item.ai_dominant_colors = colors
+            db_item.ai_status = AI_STATUS_COMPLETED
+            job.status = JOB_COMPLETED
+            job.error = None
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            get_vector_index_registry().sync_item(db_item)
+            refresh_item_compatibility(db, db_item)
+            refresh_outfits_containing(db, db_item.id)
+            return job.status
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def requeue_stale_jobs(self) -> int:
+        """Returns jobs stuck in 'running' (e.g. the process died mid-job) to the pending state."""
+        cutoff = datetime.utcnow() - timedelta(seconds=ENRICHMENT_STALE_AFTER_SECONDS)
+        db = self.session_factory()
+        try:
+            count = db.query(models.EnrichmentJob).filter(
+                models.EnrichmentJob.status == JOB_RUNNING,
+                models.EnrichmentJob.started_at < cutoff
+            ).update({models.EnrichmentJob.status: JOB_PENDING}, synchronize_session=False)
+            db.commit()
+            if count:
+                logger.info(f"Re-queued {count} stale enrichment job(s)")
+            return count
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error re-queuing stale enrichment jobs: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return {
+            "running": self._dispatcher is not None and self._dispatcher.is_alive(),
+            "workers": self.workers,
+            "in_flight": in_flight,
+        }
+
+
+# Global queue instance
+enrichment_queue = EnrichmentQueue()
+
+def get_enrichment_queue() -> EnrichmentQueue:
+    """Get the global enrichment queue instance"""
+    return enrichment_queue
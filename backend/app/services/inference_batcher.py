@@ -0,0 +1,163 @@
+# Micro-batching front-end for model inference.
+# Concurrent callers submit single inputs; a background thread coalesces whatever
+# arrives within a short window (or until the batch is full) into one stacked
+# array, runs the model once and fans the per-row results back out via futures.
+# This amortises the fixed per-call dispatch overhead of TensorFlow models across
+# concurrent requests.
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingRequest:
+    inputs: np.ndarray
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Coalesces single-input inference requests into batches.
+
+    `batch_fn` receives an array of shape (N, *input_shape) and must return an
+    array (or sequence) with N rows, row i being the result for input i.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[np.ndarray], Any],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        name: str = "batcher"
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+
+    def _reset_metrics(self):
+        self._batches = 0
+        self._items = 0
+        self._failed_batches = 0
+        self._total_queue_delay = 0.0
+        self._max_queue_delay = 0.0
+        self._total_inference_time = 0.0
+
+    # --- Public API ---
+
+    def submit(self, inputs: np.ndarray) -> Future:
+        """Queues one input (without a batch dimension) and returns a future for its result row."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put(_PendingRequest(inputs=inputs, future=future))
+        return future
+
+    def infer(self, inputs: np.ndarray, timeout: Optional[float] = None):
+        """Blocking convenience wrapper around submit()."""
+        return self.submit(inputs).result(timeout=timeout)
+
+    def stop(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_seconds * 1000.0,
+                "batches": batches,
+                "items": items,
+                "failed_batches": self._failed_batches,
+                "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+                # How full batches are on average relative to max_batch_size (1.0 = always full)
+                "avg_batch_fill_ratio": round(items / (batches * self.max_batch_size), 3) if batches else 0.0,
+                # Time a request waits in the queue before its batch starts running
+                "avg_queue_delay_ms": round(self._total_queue_delay / items * 1000.0, 3) if items else 0.0,
+                "max_queue_delay_ms": round(self._max_queue_delay * 1000.0, 3),
+                "avg_inference_ms": round(self._total_inference_time / batches * 1000.0, 3) if batches else 0.0,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    # --- Worker ---
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_loop, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect_batch(self, first: _PendingRequest) -> List[_PendingRequest]:
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                # Drain anything already queued even once the window has closed.
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                self._queue.put(_STOP) # Finish this batch, then stop
+                break
+            batch.append(request)
+        return batch
+
+    def _run_loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect_batch(first)
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[_PendingRequest]):
+        started_at = time.perf_counter()
+        try:
+            outputs = self.batch_fn(np.stack([request.inputs for request in batch]))
+            if len(outputs) != len(batch):
+                raise ValueError(f"{self.name}: batch_fn returned {len(outputs)} rows for {len(batch)} inputs")
+        except Exception as e:
+            logger.error(f"{self.name}: batched inference failed for {len(batch)} request(s): {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            with self._metrics_lock:
+                self._failed_batches += 1
+            return
+        finished_at = time.perf_counter()
+
+        for request, output in zip(batch, outputs):
+            request.future.set_result(output)
+
+        with self._metrics_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._total_inference_time += finished_at - started_at
+            for request in batch:
+                delay = started_at - request.enqueued_at
+                self._total_queue_delay += delay
+                self._max_queue_delay = max(self._max_queue_delay, delay)
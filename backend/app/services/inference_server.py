@@ -0,0 +1,283 @@
+# Shared model inference process.
+# With AI_INFERENCE_MODE=remote, API workers do not load any models themselves;
+# they send inference requests over a local Unix socket (multiprocessing.connection,
+# authenticated with AI_INFERENCE_AUTHKEY) to one inference process that holds the
+# only copy of MobileNetV2, EfficientDet and the MiniLM sentence model. HTTP workers
+# can then be scaled across cores without multiplying model memory, and the
+# server's micro-batcher coalesces embedding requests coming from all workers.
+#
+# Run the server with `python -m app.services.inference_server`, or let
+# `python main.py` spawn it when AI_INFERENCE_MODE=remote.
+#
+# multiprocessing.connection unpickles whatever an authenticated peer sends, so the
+# authkey is a real secret: it has no default, remote mode refuses to start without
+# it, and the socket is bound inside a private (0700) directory owned by this user.
+
+import os
+import stat
+import queue
+import logging
+import threading
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# local  - each process loads and runs its own models (default)
+# remote - models live in the shared inference process
+AI_INFERENCE_MODE = os.getenv("AI_INFERENCE_MODE", "local").lower()
+AI_INFERENCE_SOCKET = os.getenv("AI_INFERENCE_SOCKET", "/tmp/wardrobe_inference/inference.sock") # Its directory is made private
+AI_INFERENCE_AUTHKEY = os.getenv("AI_INFERENCE_AUTHKEY", "").encode() # Required in remote mode
+# Upper bound on one round trip, including queueing behind other requests in the server
+AI_INFERENCE_TIMEOUT_SECONDS = float(os.getenv("AI_INFERENCE_TIMEOUT_SECONDS", "60"))
+AI_INFERENCE_CLIENT_CONNECTIONS = int(os.getenv("AI_INFERENCE_CLIENT_CONNECTIONS", "4"))
+
+
+def is_remote_inference() -> bool:
+    return AI_INFERENCE_MODE == "remote"
+
+
+class InferenceError(RuntimeError):
+    """Raised by the client when the inference process reports a failure or cannot be reached."""
+
+
+def check_inference_config():
+    """Raises if remote inference is enabled without an explicit AI_INFERENCE_AUTHKEY. Call at startup."""
+    if is_remote_inference() and not AI_INFERENCE_AUTHKEY:
+        raise RuntimeError("AI_INFERENCE_AUTHKEY must be set when AI_INFERENCE_MODE=remote")
+
+
+# --- Server ---
+
+def _op_embed_image(image_array: np.ndarray) -> np.ndarray:
+    from .ai_embedding import embed_preprocessed_image
+    if image_array.dtype == np.uint8: # Clients send uint8 pixels (4x smaller than float32)
+        image_array = image_array.astype(np.float32) / 255.0
+    return embed_preprocessed_image(image_array)
+
+def _op_detect_items(image_array: np.ndarray) -> Dict[str, np.ndarray]:
+    from .ai_recommender import run_item_detector
+    return run_item_detector(image_array)
+
+def _op_encode_text(text: str) -> np.ndarray:
+    from .model_manager import encode_text
+    return encode_text(text)
+
+def _op_model_states(_: Any = None) -> Dict[str, Dict[str, Any]]:
+    from .model_manager import get_model_manager
+    return get_model_manager().get_model_states()
+
+def _op_warm_up(model_names: List[str]) -> Dict[str, str]:
+    from .model_manager import get_model_manager
+    return get_model_manager().warm_up(model_names)
+
+def _op_ping(_: Any = None) -> str:
+    return "pong"
+
+
+OPERATIONS: Dict[str, Callable[[Any], Any]] = {
+    "embed_image": _op_embed_image,
+    "detect_items": _op_detect_items,
+    "encode_text": _op_encode_text,
+    "model_states": _op_model_states,
+    "warm_up": _op_warm_up,
+    "ping": _op_ping,
+}
+
+
+class InferenceServer:
+    """
+    Accepts connections on a Unix socket and serves (operation, payload) requests.
+    Each connection gets its own thread, so requests from different API workers run
+    concurrently (and embedding requests batch together in the model manager).
+    """
+
+    def __init__(self, socket_path: str = AI_INFERENCE_SOCKET, authkey: bytes = AI_INFERENCE_AUTHKEY):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self._listener: Optional[Listener] = None
+        self._stop = threading.Event()
+
+    def _make_socket_dir_private(self):
+        """Creates the socket's directory as 0700, or tightens it if this user already owns it."""
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        info = os.lstat(directory)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.geteuid():
+            raise RuntimeError(f"Inference socket directory {directory} must be a directory owned by this user")
+        if info.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        try:
+            Client(self.socket_path, family="AF_UNIX", authkey=self.authkey).close()
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(self.socket_path) # Left behind by a server that exited
+            return
+        raise RuntimeError(f"Another inference server is already listening on {self.socket_path}")
+
+    def serve_forever(self):
+        if not self.authkey:
+            raise RuntimeError("The inference server needs an authkey (AI_INFERENCE_AUTHKEY)")
+        self._make_socket_dir_private()
+        self._remove_stale_socket()
+        self._listener = Listener(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        logger.info(f"Inference server listening on {self.socket_path}")
+        try:
+            while not self._stop.is_set():
+                try:
+                    connection = self._listener.accept()
+                except Exception as e: # Failed authentication, or the listener was closed by stop()
+                    if self._stop.is_set():
+                        break
+                    logger.warning(f"Rejected inference connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def _serve_connection(self, connection: Connection):
+        with connection:
+            while not self._stop.is_set():
+                try:
+                    operation, payload = connection.recv()
+                except (EOFError, OSError):
+                    return # Client went away
+                handler = OPERATIONS.get(operation)
+                try:
+                    if handler is None:
+                        raise ValueError(f"Unknown inference operation: {operation}")
+                    reply = ("ok", handler(payload))
+                except Exception as e:
+                    logger.error(f"Inference operation {operation} failed: {e}")
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    connection.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def stop(self):
+        self._stop.set()
+        if self._listener is not None:
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+            self._listener = None
+
+
+def run_inference_server(socket_path: str = AI_INFERENCE_SOCKET):
+    """Process entry point: warms up models per AI_MODEL_LOADING, then serves requests."""
+    from .model_manager import get_model_manager, AI_MODEL_LOADING, AI_WARMUP_MODELS
+
+    check_inference_config()
+    model_manager = get_model_manager()
+    if AI_MODEL_LOADING == "eager":
+        logger.info(f"Inference server preloading models: {model_manager.warm_up(AI_WARMUP_MODELS)}")
+    elif AI_MODEL_LOADING == "background":
+        threading.Thread(target=model_manager.warm_up, args=(AI_WARMUP_MODELS,), name="model-warmup", daemon=True).start()
+
+    InferenceServer(socket_path=socket_path).serve_forever()
+
+
+# --- Client ---
+
+class InferenceClient:
+    """
+    Thread-safe client for the inference server. Connections are not shareable
+    between threads, so the client keeps a small pool and each call borrows one.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = AI_INFERENCE_SOCKET,
+        authkey: bytes = AI_INFERENCE_AUTHKEY,
+        timeout: float = AI_INFERENCE_TIMEOUT_SECONDS,
+        max_idle_connections: int = AI_INFERENCE_CLIENT_CONNECTIONS
+    ):
+        self.socket_path = socket_path
+        self.authkey = authkey
+        self.timeout = timeout
+        self._idle: "queue.Queue[Connection]" = queue.Queue(maxsize=max(1, max_idle_connections))
+
+    def _connect(self) -> Connection:
+        if not self.authkey:
+            raise InferenceError("AI_INFERENCE_AUTHKEY is not set")
+        try:
+            return Client(self.socket_path, family="AF_UNIX", authkey=self.authkey)
+        except (OSError, EOFError) as e:
+            raise InferenceError(f"Inference server unavailable at {self.socket_path}: {e}") from e
+
+    def _borrow(self) -> Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, connection: Connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def call(self, operation: str, payload: Any = None, timeout: Optional[float] = None) -> Any:
+        timeout = self.timeout if timeout is None else timeout
+        # A pooled connection may have been closed by a server restart; retry once on a fresh one.
+        for attempt in range(2):
+            connection = self._borrow() if attempt == 0 else self._connect()
+            try:
+                connection.send((operation, payload))
+                if not connection.poll(timeout):
+                    connection.close() # A late reply would desynchronize this connection
+                    raise InferenceError(f"Inference operation {operation} timed out after {timeout}s")
+                status, result = connection.recv()
+            except (EOFError, OSError, BrokenPipeError):
+                connection.close()
+                if attempt == 0:
+                    continue
+                raise InferenceError(f"Lost connection to inference server during {operation}")
+            self._release(connection)
+            if status != "ok":
+                raise InferenceError(result)
+            return result
+
+    # Typed helpers
+
+    def embed_image(self, image_array: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        return self.call("embed_image", image_array, timeout=timeout)
+
+    def detect_items(self, image_array: np.ndarray) -> Dict[str, np.ndarray]:
+        return self.call("detect_items", image_array)
+
+    def encode_text(self, text: str) -> np.ndarray:
+        return self.call("encode_text", text)
+
+    def get_model_states(self) -> Dict[str, Dict[str, Any]]:
+        return self.call("model_states", timeout=5)
+
+    def warm_up(self, model_names: List[str]) -> Dict[str, str]:
+        return self.call("warm_up", list(model_names))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# Global client instance (used only when AI_INFERENCE_MODE=remote)
+inference_client = InferenceClient()
+
+def get_inference_client() -> InferenceClient:
+    """Get the global inference client instance"""
+    return inference_client
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    run_inference_server()
@@ -1,18 +1,53 @@
 # Enhanced AI Model Manager with Persistent Caching
 # This module manages AI model loading, caching, and persistence to prevent re-downloading
+# TensorFlow, TensorFlow Hub and sentence-transformers are imported on first model load,
+# not at import time, so the API can start serving before any ML framework is loaded.
 
 import os
 import json
+import time
 import hashlib
 import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
-import tensorflow as tf
-import tensorflow_hub as hub
+from typing import Dict, Any, Iterable, List, Optional, Union
+import threading
+import numpy as np
 from datetime import datetime, timedelta
 
+from .inference_batcher import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
+# Micro-batching for embedding inference: concurrent requests are coalesced into one
+# (N, 224, 224, 3) forward pass of at most EMBEDDING_BATCH_MAX_SIZE images, waiting at
+# most EMBEDDING_BATCH_MAX_WAIT_MS after the first request for others to arrive.
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "16"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+# How AI models are loaded at startup:
+#   eager      - load before the app starts serving (slow boot, no first-request penalty)
+#   background - start serving immediately and load the models in a background task
+#   lazy       - load each model on the first request that needs it
+AI_MODEL_LOADING = os.getenv("AI_MODEL_LOADING", "background").lower()
+AI_WARMUP_MODELS = [name.strip() for name in os.getenv("AI_WARMUP_MODELS", "mobilenet_v2,efficientdet_lite0").split(",") if name.strip()]
+
+# Per-model load state (see ModelManager.get_model_states)
+MODEL_NOT_LOADED = "not_loaded"
+MODEL_LOADING = "loading"
+MODEL_LOADED = "loaded"
+MODEL_FAILED = "failed"
+MODEL_UNAVAILABLE = "unavailable" # Framework not installed
+
+SENTENCE_MODEL_NAME = "all_minilm_l6_v2"
+
+def _import_tensorflow():
+    import tensorflow as tf
+    return tf
+
+def _import_tensorflow_hub():
+    import tensorflow_hub as hub
+    return hub
+
 class ModelManager:
     """
     Centralized model management with persistent caching and version control
@@ -22,6 +57,11 @@ class ModelManager:
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.models_cache = {}
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self._batchers_lock = threading.Lock()
+        self.model_states: Dict[str, Dict[str, Any]] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._state_lock = threading.Lock()
         self.model_metadata_file = self.cache_dir / "model_metadata.json"
         self.load_metadata()
         
@@ -38,8 +78,19 @@ class ModelManager:
                 "input_shape": None,  # Variable input size
                 "cache_key": "efficientdet_lite0_detection",
                 "version": "1.0"
+            },
+            SENTENCE_MODEL_NAME: {
+                # Text embeddings for occasion matching; cached by sentence-transformers itself
+                "url": "https://huggingface.co/sentence-transformers/all-MiniLM-L6-v2",
+                "hf_name": "sentence-transformers/all-MiniLM-L6-v2",
+                "framework": "sentence_transformers",
+                "cache_key": "all_minilm_l6_v2_text",
+                "version": "1.0"
             }
         }
+        for model_name in self.model_configs:
+            self.model_states[model_name] = {"status": MODEL_NOT_LOADED}
+            self._load_locks[model_name] = threading.Lock()
     
     def load_metadata(self):
         """Load model metadata from cache"""
@@ -67,6 +118,8 @@ class ModelManager:
     
     def is_model_cached(self, model_name: str) -> bool:
         """Check if model is already cached and valid"""
+        if self.model_configs[model_name].get("framework") == "sentence_transformers":
+            return any(self.get_model_cache_path(model_name).glob("*"))
         cache_path = self.get_model_cache_path(model_name)
         if not cache_path.exists():
             return False
@@ -94,6 +147,7 @@ class ModelManager:
             cache_path = self.get_model_cache_path(model_name)
             
             # Save the model
+            tf = _import_tensorflow()
             tf.saved_model.save(model, str(cache_path))
             
             # Update metadata
@@ -114,6 +168,7 @@ class ModelManager:
         """Load a model from cache"""
         try:
             cache_path = self.get_model_cache_path(model_name)
+            tf = _import_tensorflow()
             model = tf.saved_model.load(str(cache_path))
             logger.info(f"Model {model_name} loaded from cache")
             return model
@@ -121,42 +176,131 @@ class ModelManager:
             logger.error(f"Error loading cached model {model_name}: {e}")
             return None
     
+    def _set_state(self, model_name: str, status: str, **details):
+        with self._state_lock:
+            self.model_states[model_name] = {"status": status, **details}
+
     def get_model(self, model_name: str):
         """Get a model, loading from cache or downloading if necessary"""
         # Check if model is already in memory
         if model_name in self.models_cache:
             return self.models_cache[model_name]
-        
+        if model_name not in self.model_configs:
+            logger.error(f"Unknown model {model_name}")
+            return None
+
+        # One loader per model; concurrent callers (e.g. warm-up and a request) wait for it
+        with self._load_locks[model_name]:
+            if model_name in self.models_cache:
+                return self.models_cache[model_name]
+            if self.model_states[model_name]["status"] == MODEL_UNAVAILABLE:
+                return None
+
+            started = time.perf_counter()
+            self._set_state(model_name, MODEL_LOADING, started_at=datetime.now().isoformat())
+            try:
+                model = self._load_model(model_name)
+            except ImportError as e:
+                logger.warning(f"Model {model_name} unavailable: {e}")
+                self._set_state(model_name, MODEL_UNAVAILABLE, error=str(e))
+                return None
+
+            if model is None:
+                self._set_state(model_name, MODEL_FAILED, error="Model could not be loaded")
+                return None
+            self.models_cache[model_name] = model
+            self._set_state(model_name, MODEL_LOADED, loaded_at=datetime.now().isoformat(),
+                            load_seconds=round(time.perf_counter() - started, 3))
+            return model
+
+    def _load_model(self, model_name: str):
+        """Loads a model from the disk cache or its source. Raises ImportError if its framework is missing."""
+        config = self.model_configs[model_name]
+
+        if config.get("framework") == "sentence_transformers":
+            from sentence_transformers import SentenceTransformer
+            try:
+                return SentenceTransformer(config["hf_name"], cache_folder=str(self.get_model_cache_path(model_name)))
+            except Exception as e:
+                logger.error(f"Error loading model {model_name}: {e}")
+                return None
+
+        # Fail fast (as ImportError) if TensorFlow is not installed
+        _import_tensorflow()
+
         # Check if model is cached on disk
         if self.is_model_cached(model_name):
             model = self.load_cached_model(model_name)
             if model is not None:
-                self.models_cache[model_name] = model
                 return model
-        
+
         # Download and cache the model
         logger.info(f"Downloading model {model_name}...")
         try:
-            config = self.model_configs[model_name]
-            
+            hub = _import_tensorflow_hub()
+
             if model_name == "mobilenet_v2":
                 model = hub.KerasLayer(config["url"], input_shape=config["input_shape"])
             else:
                 model = hub.load(config["url"])
-            
+
             # Cache the model
             self.cache_model(model_name, model)
-            
-            # Store in memory cache
-            self.models_cache[model_name] = model
-            
+
             logger.info(f"Model {model_name} downloaded and cached successfully")
             return model
-            
+
+        except ImportError:
+            raise
         except Exception as e:
             logger.error(f"Error downloading model {model_name}: {e}")
             return None
-    
+
+    def warm_up(self, model_names: Iterable[str]) -> Dict[str, str]:
+        """Loads the given models (skipping ones already in memory) and returns their final status."""
+        results = {}
+        for model_name in model_names:
+            try:
+                self.get_model(model_name)
+            except Exception as e:
+                logger.error(f"Error warming up model {model_name}: {e}")
+                self._set_state(model_name, MODEL_FAILED, error=str(e))
+            results[model_name] = self.model_states.get(model_name, {}).get("status", MODEL_FAILED)
+        return results
+
+    def get_model_states(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model load state: not_loaded, loading, loaded, failed or unavailable"""
+        with self._state_lock:
+            return {name: dict(state) for name, state in self.model_states.items()}
+
+    def get_batcher(self, model_name: str) -> MicroBatcher:
+        """Get the micro-batching inference front-end for a model (created on first use)"""
+        batcher = self.batchers.get(model_name)
+        if batcher is not None:
+            return batcher
+
+        with self._batchers_lock:
+            if model_name not in self.batchers:
+                self.batchers[model_name] = MicroBatcher(
+                    batch_fn=lambda batch: self._run_batch(model_name, batch),
+                    max_batch_size=EMBEDDING_BATCH_MAX_SIZE,
+                    max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS,
+                    name=model_name
+                )
+            return self.batchers[model_name]
+
+    def _run_batch(self, model_name: str, batch: np.ndarray) -> np.ndarray:
+        """Run one forward pass over a stacked batch of preprocessed inputs"""
+        model = self.get_model(model_name)
+        if model is None:
+            raise RuntimeError(f"Model {model_name} could not be loaded")
+        outputs = model(batch)
+        return outputs.numpy() if hasattr(outputs, "numpy") else np.asarray(outputs)
+
+    def get_batching_metrics(self) -> Dict[str, Any]:
+        """Get batch fill ratio / queue delay metrics for every active batcher"""
+        return {name: batcher.get_metrics() for name, batcher in self.batchers.items()}
+
     def clear_cache(self, model_name: Optional[str] = None):
         """Clear model cache"""
         if model_name:
@@ -171,6 +315,8 @@ class ModelManager:
             
             if model_name in self.models_cache:
                 del self.models_cache[model_name]
+            if model_name in self.model_states:
+                self._set_state(model_name, MODEL_NOT_LOADED)
                 
             logger.info(f"Cache cleared for model {model_name}")
         else:
@@ -182,6 +328,8 @@ class ModelManager:
             
             self.metadata = {}
             self.models_cache = {}
+            for name in self.model_configs:
+                self._set_state(name, MODEL_NOT_LOADED)
             
             logger.info("All model caches cleared")
         
@@ -199,6 +347,7 @@ class ModelManager:
                 "configured": True,
                 "cached": self.is_model_cached(model_name),
                 "in_memory": model_name in self.models_cache,
+                "load_state": self.model_states[model_name]["status"],
                 "url": config["url"],
                 "version": config["version"]
             }
@@ -220,3 +369,13 @@ def get_model_manager() -> ModelManager:
     """Get the global model manager instance"""
     return model_manager
 
+def get_sentence_model():
+    """Sentence-transformers text model (loaded on first use), or None if unavailable"""
+    return model_manager.get_model(SENTENCE_MODEL_NAME)
+
+def encode_text(text: str) -> np.ndarray:
+    """Encodes text with the sentence model in this process. Raises if the model is unavailable."""
+    sentence_model = get_sentence_model()
+    if sentence_model is None:
+        raise RuntimeError("Sentence transformer model not available")
+    return np.asarray(sentence_model.encode(text))
@@ -0,0 +1,60 @@
+# Outfit-level embeddings: the mean of an outfit's item image embeddings, stored on the
+# Outfit row so occasion matching can rank all of a user's outfits with one matrix scan
+# instead of loading every item.
+#
+# The stored value must be refreshed whenever it could change: when an outfit's items
+# change (outfits router) and when an item's embedding changes or the item is deleted
+# (wardrobe router and the enrichment worker).
+
+import logging
+from collections import Counter
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import model as models
+
+logger = logging.getLogger(__name__)
+
+
+def compute_outfit_embedding(item_embeddings: Iterable) -> Optional[np.ndarray]:
+    """
+    Mean of the given item embeddings. Items without an embedding are skipped, and so
+    are embeddings whose size differs from the most common one (e.g. a different model).
+    """
+    vectors = [np.asarray(e, dtype=np.float32).ravel() for e in item_embeddings if e is not None]
+    sizes = Counter(v.size for v in vectors if v.size)
+    if not sizes:
+        return None
+    size = sizes.most_common(1)[0][0]
+    return np.mean([v for v in vectors if v.size == size], axis=0).astype(np.float32)
+
+
+def refresh_outfit_embedding(db_outfit: models.Outfit):
+    """Recomputes the outfit's embedding from its current items. The caller commits."""
+    db_outfit.outfit_embedding = compute_outfit_embedding(item.ai_embedding for item in db_outfit.items)
+
+
+def outfit_ids_containing(db: Session, item_id: int) -> List[int]:
+    association = models.outfit_item_association
+    return [row.outfit_id for row in db.query(association.c.outfit_id).filter(association.c.wardrobe_item_id == item_id)]
+
+
+def refresh_outfit_embeddings(db: Session, outfit_ids: Iterable[int]):
+    """Recomputes and commits the embeddings of the given outfits. Never raises."""
+    outfit_ids = list(outfit_ids)
+    if not outfit_ids:
+        return
+    try:
+        for db_outfit in db.query(models.Outfit).filter(models.Outfit.id.in_(outfit_ids)).all():
+            refresh_outfit_embedding(db_outfit)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not refresh embeddings of outfits {outfit_ids}: {e}")
+
+
+def refresh_outfits_containing(db: Session, item_id: int):
+    """Recomputes the embeddings of every outfit an item belongs to, after the item's embedding changed."""
+    refresh_outfit_embeddings(db, outfit_ids_containing(db, item_id))
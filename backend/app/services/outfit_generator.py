@@ -0,0 +1,161 @@
+# Deterministic outfit idea generation for the wardrobe recommendations endpoint.
+#
+# Every outfit structure (e.g. Tops + Bottoms + Shoes) is a product of category buckets.
+# Each item gets a ranking score (its mean pair compatibility with the items of the other
+# categories in the structure) and every bucket is sorted by it. Combinations are then
+# enumerated lazily in descending total ranking score with the classic heap-based k-best
+# enumeration over sorted lists: start at the first item of every bucket and push the
+# successors that advance one bucket by one position. All structures share one heap, so
+# the stream is a single descending sequence.
+#
+# The first `max_candidates` outfits of the stream are scored exactly and the final
+# selection uses maximal marginal relevance (MMR): each pick maximizes
+# `lambda * score - (1 - lambda) * overlap`, where overlap is the largest Jaccard
+# similarity of the candidate's items with an already selected outfit. The work is
+# bounded by `max_candidates` regardless of wardrobe size, and ties are broken by item
+# order, so the same wardrobe always yields the same ideas.
+
+import os
+import heapq
+import logging
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .outfit_matching_service import CompatibilityMatrix
+
+logger = logging.getLogger(__name__)
+
+OUTFIT_GENERATOR_MAX_CANDIDATES = int(os.getenv("OUTFIT_GENERATOR_MAX_CANDIDATES", "200"))
+OUTFIT_DIVERSITY_LAMBDA = float(os.getenv("OUTFIT_DIVERSITY_LAMBDA", "0.7"))
+# Items per category bucket the wardrobe recommendations generate from (see recommendation_services)
+OUTFIT_GENERATOR_ITEMS_PER_CATEGORY = int(os.getenv("OUTFIT_GENERATOR_ITEMS_PER_CATEGORY", "25"))
+
+# Typical outfit structures, in order of preference for ties
+DEFAULT_OUTFIT_STRUCTURES: List[List[str]] = [
+    ["Tops", "Bottoms"],
+    ["Tops", "Bottoms", "Shoes"],
+    ["Tops", "Bottoms", "Outerwear"],
+]
+
+
+class OutfitGenerator:
+    """
+    Lazily enumerates outfits (tuples of row indices into an item pool) in descending
+    ranking score. `categories` holds each row's category and `pair_scores` the pool's
+    pairwise compatibility matrix.
+    """
+
+    def __init__(
+        self,
+        categories: Sequence[str],
+        pair_scores: np.ndarray,
+        structures: Sequence[Sequence[str]] = DEFAULT_OUTFIT_STRUCTURES
+    ):
+        rows_by_category: Dict[str, List[int]] = {}
+        for row, category in enumerate(categories):
+            rows_by_category.setdefault(category, []).append(row)
+
+        # Per structure: one bucket of rows per category, sorted by ranking score
+        self._buckets: List[List[np.ndarray]] = []
+        self._rank: List[List[np.ndarray]] = []
+        for structure in structures:
+            if len(set(structure)) != len(structure) or not all(rows_by_category.get(c) for c in structure):
+                continue # Duplicate categories could repeat an item; missing ones make the structure impossible
+            buckets, ranks = [], []
+            for category in structure:
+                rows = np.array(rows_by_category[category], dtype=np.intp)
+                partners = np.concatenate([rows_by_category[c] for c in structure if c != category]).astype(np.intp)
+                rank = pair_scores[np.ix_(rows, partners)].mean(axis=1)
+                order = np.lexsort((rows, -rank)) # Descending rank, then pool order
+                buckets.append(rows[order])
+                ranks.append(rank[order])
+            self._buckets.append(buckets)
+            self._rank.append(ranks)
+
+    def _priority(self, structure: int, position: Tuple[int, ...]) -> float:
+        ranks = self._rank[structure]
+        return float(sum(ranks[slot][p] for slot, p in enumerate(position))) / len(position)
+
+    def __iter__(self) -> Iterator[Tuple[int, ...]]:
+        heap: List[Tuple[float, int, Tuple[int, ...]]] = []
+        seen = set()
+        for structure, buckets in enumerate(self._buckets):
+            start = (0,) * len(buckets)
+            heapq.heappush(heap, (-self._priority(structure, start), structure, start))
+            seen.add((structure, start))
+
+        while heap:
+            _, structure, position = heapq.heappop(heap)
+            buckets = self._buckets[structure]
+            yield tuple(int(buckets[slot][p]) for slot, p in enumerate(position))
+            for slot in range(len(position)):
+                if position[slot] + 1 < len(buckets[slot]):
+                    successor = position[:slot] + (position[slot] + 1,) + position[slot + 1:]
+                    if (structure, successor) not in seen:
+                        seen.add((structure, successor))
+                        heapq.heappush(heap, (-self._priority(structure, successor), structure, successor))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b)
+
+
+def select_diverse(
+    candidates: List[Tuple[Tuple[int, ...], Dict[str, Any]]],
+    k: int,
+    diversity_lambda: float = OUTFIT_DIVERSITY_LAMBDA
+) -> List[Tuple[Tuple[int, ...], Dict[str, Any]]]:
+    """Greedy maximal-marginal-relevance selection of k outfits; earlier candidates win ties."""
+    remaining = list(candidates)
+    selected: List[Tuple[Tuple[int, ...], Dict[str, Any]]] = []
+    selected_sets: List[frozenset] = []
+    while remaining and len(selected) < k:
+        best_value, best_position = None, 0
+        for position, (rows, details) in enumerate(remaining):
+            rows_set = frozenset(rows)
+            overlap = max((_jaccard(rows_set, chosen) for chosen in selected_sets), default=0.0)
+            value = diversity_lambda * details["score"] - (1 - diversity_lambda) * overlap
+            if best_value is None or value > best_value:
+                best_value, best_position = value, position
+        rows, details = remaining.pop(best_position)
+        selected.append((rows, details))
+        selected_sets.append(frozenset(rows))
+    return selected
+
+
+def generate_outfits(
+    compatibility: CompatibilityMatrix,
+    categories: Sequence[str],
+    k: int,
+    pair_scores: Optional[np.ndarray] = None,
+    min_score: float = 0.0,
+    structures: Sequence[Sequence[str]] = DEFAULT_OUTFIT_STRUCTURES,
+    max_candidates: int = OUTFIT_GENERATOR_MAX_CANDIDATES,
+    diversity_lambda: float = OUTFIT_DIVERSITY_LAMBDA
+) -> List[Tuple[Tuple[int, ...], Dict[str, Any]]]:
+    """
+    Returns up to k diverse outfits as (row indices, score details) pairs, best first.
+    Only outfits scoring above min_score are kept. pair_scores defaults to the matrix's own.
+    """
+    if k <= 0 or len(categories) < 2:
+        return []
+    if pair_scores is None:
+        pair_scores = compatibility.pair_scores()
+
+    outfits: List[Tuple[int, ...]] = []
+    seen_sets = set()
+    for rows in OutfitGenerator(categories, pair_scores, structures):
+        if len(outfits) >= max_candidates:
+            break
+        if frozenset(rows) not in seen_sets:
+            seen_sets.add(frozenset(rows))
+            outfits.append(rows)
+
+    candidates = [
+        (rows, details) for rows, details in zip(outfits, compatibility.score_many(outfits))
+        if details["score"] > min_score
+    ]
+    # Candidates arrive in ranking order; MMR needs them by exact score
+    candidates.sort(key=lambda candidate: -candidate[1]["score"])
+    return select_diverse(candidates, k, diversity_lambda)
@@ -9,6 +9,8 @@ from enum import Enum
 import colorsys
 import re
 
+from .outfit_search import OutfitSearch
+
 logger = logging.getLogger(__name__)
 
 class OccasionType(Enum):
@@ -233,6 +235,21 @@ class OutfitMatcher:
                              weather: WeatherType, 
                              preferred_style: Optional[str] = None) -> OutfitRecommendation:
         """Create a complete outfit recommendation"""
+        outfits = self.create_top_outfits(wardrobe, occasion, season, weather, preferred_style, k=1)
+        return outfits[0] if outfits else self._create_fallback_recommendation(occasion, season, weather)
+    
+    def create_top_outfits(self, wardrobe: List[ClothingItem], 
+                           occasion: OccasionType, season: SeasonType, 
+                           weather: WeatherType, 
+                           preferred_style: Optional[str] = None,
+                           k: int = 5) -> List[OutfitRecommendation]:
+        """
+        Create the k best outfit recommendations, best first.
+        Each outfit is a top, bottom and shoes, plus the best outerwear when the weather
+        calls for it and the best of the first two accessories, scored with
+        _calculate_outfit_score. The search (see outfit_search.py) uses precomputed pair
+        scores and branch-and-bound instead of scoring every combination.
+        """
         
         # Filter items suitable for the context
         suitable_items = [
@@ -243,7 +260,7 @@ class OutfitMatcher:
         ]
         
         if not suitable_items:
-            return self._create_fallback_recommendation(occasion, season, weather)
+            return []
         
         # Group items by category
         categories = {}
@@ -252,45 +269,14 @@ class OutfitMatcher:
                 categories[item.category] = []
             categories[item.category].append(item)
         
-        # Try to build outfit with required categories
-        required_categories = ["top", "bottom", "shoes"]
-        optional_categories = ["outerwear", "accessory"]
-        
-        best_outfit = None
-        best_score = 0
-        
-        # Generate outfit combinations
-        for top in categories.get("top", []):
-            for bottom in categories.get("bottom", []):
-                for shoes in categories.get("shoes", []):
-                    outfit_items = [top, bottom, shoes]
-                    
-                    # Add outerwear if weather requires it
-                    if weather in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY]:
-                        outerwear_options = categories.get("outerwear", [])
-                        if outerwear_options:
-                            best_outerwear = max(outerwear_options, 
-                                               key=lambda x: self._calculate_outfit_score(outfit_items + [x]))
-                            outfit_items.append(best_outerwear)
-                    
-                    # Add accessories
-                    accessory_options = categories.get("accessory", [])
-                    if accessory_options:
-                        best_accessory = max(accessory_options[:2],  # Limit to 2 accessories
-                                           key=lambda x: self._calculate_outfit_score(outfit_items + [x]))
-                        outfit_items.append(best_accessory)
-                    
-                    # Calculate outfit score
-                    score = self._calculate_outfit_score(outfit_items)
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_outfit = outfit_items
-        
-        if best_outfit:
-            return self._create_outfit_recommendation(best_outfit, occasion, season, weather, best_score)
-        else:
-            return self._create_fallback_recommendation(occasion, season, weather)
+        # Add outerwear if weather requires it
+        include_outerwear = weather in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY]
+        search = OutfitSearch(categories, include_outerwear, self.style_matcher, self.color_matcher)
+        
+        return [
+            self._create_outfit_recommendation(search.items_for(indices), occasion, season, weather, score)
+            for indices, score in search.search(k)
+        ]
     
     def _calculate_outfit_score(self, items: List[ClothingItem]) -> float:
         """Calculate overall score for an outfit"""
@@ -1,7 +1,8 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Sequence, Iterable, FrozenSet
+from collections import Counter
+from functools import lru_cache
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from itertools import combinations
+from itertools import combinations, combinations_with_replacement
 
 # Placeholder for more sophisticated color harmony logic
 # For now, we'll use a simplified approach.
@@ -163,6 +164,157 @@ def check_color_harmony(colors_hex: List[str]) -> float:
     
     return min(1.0, max(0.0, base_score))
 
+@lru_cache(maxsize=4096)
+def _cached_color_harmony(colors: FrozenSet[str]) -> float:
+    # check_color_harmony only depends on the set of colors, not their order
+    return check_color_harmony(sorted(colors))
+
+
+def color_harmony_matrix(colors: Sequence[FrozenSet[str]]) -> np.ndarray:
+    """
+    Harmony of the combined colors of every pair of color sets. The harmony rules classify
+    a whole set of colors, so they run once per pair of distinct palettes and the result is
+    gathered for all item pairs with one fancy-indexing lookup.
+    """
+    palette_index: Dict[FrozenSet[str], int] = {}
+    rows = np.array([palette_index.setdefault(c, len(palette_index)) for c in colors], dtype=np.intp)
+    palettes = list(palette_index)
+    harmony = np.empty((len(palettes), len(palettes)), dtype=np.float64)
+    for a, b in combinations_with_replacement(range(len(palettes)), 2):
+        harmony[a, b] = harmony[b, a] = _cached_color_harmony(palettes[a] | palettes[b])
+    return harmony[np.ix_(rows, rows)]
+
+
+# Weights for combining the two sub-scores
+STYLE_WEIGHT = 0.7
+COLOR_WEIGHT = 0.3
+
+
+def _combine_scores(style_cohesion_score: float, color_harmony_score: float) -> Dict[str, Any]:
+    overall_score = (style_cohesion_score * STYLE_WEIGHT) + (color_harmony_score * COLOR_WEIGHT)
+    overall_score = max(0, min(1, overall_score)) # Ensure score is between 0 and 1
+    return {
+        "score": round(float(overall_score), 3),
+        "style_cohesion_score": round(float(style_cohesion_score), 3),
+        "color_harmony_score": round(float(color_harmony_score), 3),
+        "message": "Compatibility calculated."
+    }
+
+
+_NOT_ENOUGH_ITEMS = {
+    "score": 0.0,
+    "message": "Not enough items to compare.",
+    "style_cohesion_score": 0.0,
+    "color_harmony_score": 0.0
+}
+
+
+class CompatibilityMatrix:
+    """
+    Pairwise style similarities for a fixed pool of items (e.g. a whole wardrobe),
+    computed once as a normalized Gram matrix with a single matmul. Candidate outfits
+    are then scored by row indices into the pool, which is a table lookup.
+
+    Embeddings whose dimension differs from the pool's most common dimension (e.g. a
+    mock vector from a different model) are treated as missing.
+
+    A precomputed `similarity` matrix and `has_embedding` mask (e.g. from the persisted
+    compatibility table) skip the Gram matrix; the embeddings are then not needed.
+    """
+
+    def __init__(
+        self,
+        item_features: List[Dict[str, Any]],
+        similarity: Optional[np.ndarray] = None,
+        has_embedding: Optional[np.ndarray] = None
+    ):
+        self.item_features = item_features
+        self.colors = [frozenset(item.get("colors") or ()) for item in item_features]
+
+        if similarity is not None:
+            self.similarity = similarity
+            self.has_embedding = np.asarray(has_embedding, dtype=bool)
+            return
+
+        vectors = [
+            np.asarray(item["embedding"], dtype=np.float32).ravel() if item.get("embedding") is not None else None
+            for item in item_features
+        ]
+        dims = Counter(v.size for v in vectors if v is not None)
+        self.dim = dims.most_common(1)[0][0] if dims else 0
+        self.has_embedding = np.array([v is not None and v.size == self.dim for v in vectors], dtype=bool)
+
+        matrix = np.zeros((len(item_features), self.dim), dtype=np.float32)
+        for row, vector in enumerate(vectors):
+            if self.has_embedding[row]:
+                matrix[row] = vector
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0) # Zero vectors stay zero, like sklearn
+        self.similarity = matrix @ matrix.T
+
+    def __len__(self) -> int:
+        return len(self.item_features)
+
+    def _style_cohesion(self, indices: Sequence[int]) -> float:
+        embedded = [i for i in indices if self.has_embedding[i]]
+        if len(embedded) < 2:
+            return 0.5 # Neutral score
+        rows, cols = zip(*combinations(embedded, 2))
+        mean_similarity = float(self.similarity[list(rows), list(cols)].mean())
+        # Normalize to 0-1 range (cosine similarity is -1 to 1)
+        return (mean_similarity + 1) / 2
+
+    def _color_harmony(self, indices: Sequence[int]) -> float:
+        colors = frozenset().union(*(self.colors[i] for i in indices))
+        return _cached_color_harmony(colors)
+
+    def score(self, indices: Sequence[int]) -> Dict[str, Any]:
+        """Scores one candidate outfit given as row indices into the item pool."""
+        if len(indices) < 2:
+            return dict(_NOT_ENOUGH_ITEMS)
+        return _combine_scores(self._style_cohesion(indices), self._color_harmony(indices))
+
+    def pair_scores(self) -> np.ndarray:
+        """
+        Overall compatibility of every pair of items in the pool, as if each pair were a
+        two-item outfit. Prefer CompatibilityTable.pair_scores, which reads stored values.
+        """
+        both = np.outer(self.has_embedding, self.has_embedding)
+        style = np.where(both, (self.similarity + 1) / 2, 0.5)
+        return np.clip(style * STYLE_WEIGHT + color_harmony_matrix(self.colors) * COLOR_WEIGHT, 0, 1)
+
+    def score_many(self, candidates: Iterable[Sequence[int]]) -> List[Dict[str, Any]]:
+        """
+        Scores many candidate outfits. Candidates of the same size whose items all have
+        embeddings get their style cohesion in one vectorized lookup per item pair slot.
+        """
+        candidates = [list(c) for c in candidates]
+        style_scores: Dict[int, float] = {}
+
+        by_size: Dict[int, List[int]] = {}
+        for position, indices in enumerate(candidates):
+            if len(indices) >= 2 and self.has_embedding[indices].all():
+                by_size.setdefault(len(indices), []).append(position)
+        for size, positions in by_size.items():
+            table = np.array([candidates[p] for p in positions], dtype=np.intp)
+            pair_slots = list(combinations(range(size), 2))
+            total = np.zeros(len(positions), dtype=np.float64)
+            for a, b in pair_slots:
+                total += self.similarity[table[:, a], table[:, b]]
+            for p, mean_similarity in zip(positions, total / len(pair_slots)):
+                style_scores[p] = (float(mean_similarity) + 1) / 2
+
+        results = []
+        for position, indices in enumerate(candidates):
+            if len(indices) < 2:
+                results.append(dict(_NOT_ENOUGH_ITEMS))
+                continue
+            style = style_scores.get(position)
+            if style is None:
+                style = self._style_cohesion(indices)
+            results.append(_combine_scores(style, self._color_harmony(indices)))
+        return results
+
 
 class OutfitMatchingService:
     def __init__(self):
@@ -183,56 +335,30 @@ class OutfitMatchingService:
         }
         """
         if not item_features or len(item_features) < 2:
-            return {
-                "score": 0.0,
-                "message": "Not enough items to compare.",
-                "style_cohesion_score": 0.0,
-                "color_harmony_score": 0.0
-            }
-
-        embeddings = [np.array(item["embedding"]) for item in item_features if item.get("embedding")]
-
-        # 1. Style Cohesion (using embeddings)
-        style_cohesion_score = 0.0
-        if len(embeddings) >= 2:
-            pairwise_similarities = []
-            for emb1, emb2 in combinations(embeddings, 2):
-                similarity = cosine_similarity(emb1.reshape(1, -1), emb2.reshape(1, -1))[0][0]
-                pairwise_similarities.append(similarity)
-
-            if pairwise_similarities:
-                style_cohesion_score = np.mean(pairwise_similarities)
-                # Normalize to 0-1 range (cosine similarity is -1 to 1, but embeddings usually non-negative relations)
-                style_cohesion_score = (style_cohesion_score + 1) / 2
-        else: # Not enough embeddings to compare
-             style_cohesion_score = 0.5 # Neutral score
-
-        # 2. Color Harmony
-        # Collect all dominant colors from all items in the outfit
-        all_dominant_colors_hex = []
-        for item in item_features:
-            if item.get("colors"):
-                all_dominant_colors_hex.extend(item["colors"])
-
-        # Use unique colors for harmony check to avoid penalizing multiple items of same color
-        unique_colors_hex = list(set(all_dominant_colors_hex))
-        color_harmony_score = check_color_harmony(unique_colors_hex)
-
-        # 3. Combine scores (simple weighted average for now)
-        # Weights can be tuned
-        style_weight = 0.7
-        color_weight = 0.3
-        overall_score = (style_cohesion_score * style_weight) + (color_harmony_score * color_weight)
-
-        # Ensure score is between 0 and 1
-        overall_score = max(0, min(1, overall_score))
-
-        return {
-            "score": round(overall_score, 3),
-            "style_cohesion_score": round(style_cohesion_score, 3),
-            "color_harmony_score": round(color_harmony_score, 3),
-            "message": "Compatibility calculated."
-        }
+            return dict(_NOT_ENOUGH_ITEMS)
+        return CompatibilityMatrix(item_features).score(range(len(item_features)))
+
+    def build_compatibility_matrix(self, item_features: List[Dict[str, Any]], table=None) -> CompatibilityMatrix:
+        """
+        Precomputes pairwise similarities for a pool of items (same dict shape as above).
+        With a CompatibilityTable covering every item id, the similarities are read from it.
+        """
+        if table is not None and all(item.get("id") in table for item in item_features):
+            similarity, has_embedding = table.style_similarity([item["id"] for item in item_features])
+            return CompatibilityMatrix(item_features, similarity, has_embedding)
+        return CompatibilityMatrix(item_features)
+
+    def score_outfits(
+        self,
+        item_features: List[Dict[str, Any]],
+        candidates: Iterable[Sequence[int]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Scores many candidate outfits drawn from one pool of items. Each candidate is a
+        list of indices into item_features; results are in candidate order and have the
+        same fields as calculate_compatibility_score.
+        """
+        return self.build_compatibility_matrix(item_features).score_many(candidates)
 
 # Example usage (for testing or if used directly):
 # if __name__ == "__main__":
@@ -0,0 +1,255 @@
+# Top-K outfit search for OutfitMatcher.
+# The original create_complete_outfit enumerated every top x bottom x shoes triple and,
+# for each one, re-scored every outerwear/accessory candidate with the O(k^2) pairwise
+# _calculate_outfit_score. This engine keeps the exact same scoring (same pair scores,
+# same summation order, same greedy choice of outerwear and accessory, same tie-breaking
+# by enumeration order) but:
+#   - computes all cross-category pair scores once, vectorized, as directional matrices
+#     (style compatibility is not symmetric, so the matrix for (a, b) follows the order
+#     in which the items appear in the outfit list);
+#   - explores tops and (top, bottom) pairs best-bound-first and prunes any branch whose
+#     admissible upper bound cannot reach the current K-th best score;
+#   - scores all shoes of a surviving (top, bottom) branch at once with NumPy.
+
+import heapq
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Slack added to upper bounds: they are summed in a different order than the exact
+# scores, so they can be off by a few ULPs.
+_BOUND_EPSILON = 1e-9
+
+# Order of the categories in an outfit's item list (and therefore in its pair sums)
+OUTFIT_CATEGORY_ORDER = ("top", "bottom", "shoes", "outerwear", "accessory")
+
+# (item indices per category in OUTFIT_CATEGORY_ORDER, score); absent categories are None
+SearchResult = Tuple[Tuple[Optional[int], ...], float]
+
+
+def pairwise_compatibility(items_a: Sequence, items_b: Sequence, style_matcher, color_matcher) -> np.ndarray:
+    """
+    Matrix of OutfitMatcher._calculate_item_compatibility(items_a[i], items_b[j]).
+    Evaluates the same expressions in the same order on float64 arrays, so every
+    entry is bit-identical to the scalar method.
+    """
+    if not items_a or not items_b:
+        return np.zeros((len(items_a), len(items_b)))
+
+    hsv_cache: Dict[str, Tuple[float, float, float]] = {}
+    def hsv(items):
+        values = []
+        for item in items:
+            if item.color not in hsv_cache:
+                hsv_cache[item.color] = color_matcher.hex_to_hsv(item.color)
+            values.append(hsv_cache[item.color])
+        return np.array(values, dtype=np.float64).T
+
+    h1, s1, v1 = (channel[:, None] for channel in hsv(items_a))
+    h2, s2, v2 = (channel[None, :] for channel in hsv(items_b))
+
+    # ColorMatcher.calculate_color_harmony
+    hue_abs = np.abs(h1 - h2)
+    hue_diff = np.minimum(hue_abs, 1 - hue_abs)
+    sat_diff = np.abs(s1 - s2)
+    val_diff = np.abs(v1 - v2)
+    color_score = np.select(
+        [
+            hue_diff < 0.05,
+            (0.45 < hue_diff) & (hue_diff < 0.55),
+            (0.08 < hue_diff) & (hue_diff < 0.12),
+            ((0.3 < hue_diff) & (hue_diff < 0.37)) | ((0.63 < hue_diff) & (hue_diff < 0.7)),
+        ],
+        [
+            0.9 - (sat_diff + val_diff) * 0.5,
+            0.8 - (sat_diff + val_diff) * 0.3,
+            0.85 - (sat_diff + val_diff) * 0.4,
+            0.75 - (sat_diff + val_diff) * 0.3,
+        ],
+        default=0.5 - (sat_diff + val_diff) * 0.5
+    )
+    color_score = np.maximum(0, np.minimum(1, color_score))
+
+    # StyleMatcher.calculate_style_compatibility, evaluated once per distinct style pair
+    styles_a = sorted({item.style for item in items_a})
+    styles_b = sorted({item.style for item in items_b})
+    style_table = np.array([[style_matcher.calculate_style_compatibility(x, y) for y in styles_b] for x in styles_a])
+    style_index_a = np.array([styles_a.index(item.style) for item in items_a])[:, None]
+    style_index_b = np.array([styles_b.index(item.style) for item in items_b])[None, :]
+    style_score = style_table[style_index_a, style_index_b]
+
+    formality_a = np.array([item.formality_level for item in items_a])[:, None]
+    formality_b = np.array([item.formality_level for item in items_b])[None, :]
+    formality_score = np.maximum(0, 1 - np.abs(formality_a - formality_b) / 10)
+
+    category_a = np.array([item.category for item in items_a], dtype=object)[:, None]
+    category_b = np.array([item.category for item in items_b], dtype=object)[None, :]
+    category_score = np.where((category_a == category_b) & (category_a != "accessory"), 0.0, 1.0)
+
+    return (
+        color_score * 0.3 +
+        style_score * 0.3 +
+        formality_score * 0.2 +
+        category_score * 0.2
+    )
+
+
+class OutfitSearch:
+    """
+    Finds the K best outfits built the way OutfitMatcher.create_complete_outfit builds
+    them: one top, bottom and shoes, plus the best outerwear (when include_outerwear)
+    and the best of the first two accessories. Outfits score the mean of their pairwise
+    item compatibilities; only outfits scoring above 0 are returned.
+    """
+
+    def __init__(self, categories: Dict[str, list], include_outerwear: bool, style_matcher, color_matcher):
+        self.tops = categories.get("top", [])
+        self.bottoms = categories.get("bottom", [])
+        self.shoes = categories.get("shoes", [])
+        self.outerwear = categories.get("outerwear", []) if include_outerwear else []
+        self.accessories = categories.get("accessory", [])[:2] # Only the first two are considered
+
+        def matrix(a, b):
+            return pairwise_compatibility(a, b, style_matcher, color_matcher)
+
+        self.tb = matrix(self.tops, self.bottoms)
+        self.ts = matrix(self.tops, self.shoes)
+        self.bs = matrix(self.bottoms, self.shoes)
+        self.to = matrix(self.tops, self.outerwear)
+        self.bo = matrix(self.bottoms, self.outerwear)
+        self.so = matrix(self.shoes, self.outerwear)
+        self.ta = matrix(self.tops, self.accessories)
+        self.ba = matrix(self.bottoms, self.accessories)
+        self.sa = matrix(self.shoes, self.accessories)
+        self.oa = matrix(self.outerwear, self.accessories)
+
+        self.has_outerwear = bool(self.outerwear)
+        self.has_accessory = bool(self.accessories)
+        n_items = 3 + self.has_outerwear + self.has_accessory
+        self.n_pairs = n_items * (n_items - 1) // 2
+
+        # Per-item upper bounds on the outerwear and accessory pair terms
+        self.to_max, self.bo_max, self.so_max = self._row_max(self.to), self._row_max(self.bo), self._row_max(self.so)
+        self.ta_max, self.ba_max, self.sa_max = self._row_max(self.ta), self._row_max(self.ba), self._row_max(self.sa)
+        self.oa_max = float(self.oa.max()) if self.oa.size else 0.0
+
+    @staticmethod
+    def _row_max(matrix: np.ndarray) -> np.ndarray:
+        if matrix.shape[1] == 0:
+            return np.zeros(matrix.shape[0])
+        return matrix.max(axis=1)
+
+    def search(self, k: int = 1) -> List[SearchResult]:
+        """Top-k outfits, best first; ties keep the original enumeration order."""
+        n_tops, n_bottoms, n_shoes = len(self.tops), len(self.bottoms), len(self.shoes)
+        if k <= 0 or not (n_tops and n_bottoms and n_shoes):
+            return []
+
+        to_max, bo_max, so_max = self.to_max, self.bo_max, self.so_max
+        ta_max, ba_max, sa_max = self.ta_max, self.ba_max, self.sa_max
+        oa_max = self.oa_max
+
+        # Shoe-side terms that do not depend on the top or bottom
+        shoe_extra = so_max + sa_max
+        bs_plus_shoe_extra = self.bs + shoe_extra[None, :] # (bottoms, shoes)
+
+        # Bound for each top: best (bottom, shoes) completion, each term maximized on its own
+        bottom_best = (bo_max + ba_max)[:, None] + bs_plus_shoe_extra # Top-independent (bottoms, shoes)
+        top_bounds = (
+            self.tb.max(axis=1)
+            + self.ts.max(axis=1)
+            + float(bottom_best.max())
+            + to_max + ta_max + oa_max
+        ) / self.n_pairs
+
+        heap: List[Tuple[float, int, Tuple[Optional[int], ...]]] = [] # (score, -order, indices); worst first
+        def threshold() -> float:
+            return heap[0][0] if len(heap) >= k else 0.0
+
+        for t in np.argsort(-top_bounds, kind="stable"):
+            if top_bounds[t] + _BOUND_EPSILON < threshold():
+                break # Tops are sorted by bound, so no remaining top can do better
+            # Bound for each (top, bottom): exact top/bottom terms, best shoes for this pair
+            pair_bounds = (
+                self.tb[t]
+                + (self.ts[t][None, :] + bs_plus_shoe_extra).max(axis=1)
+                + to_max[t] + bo_max + ta_max[t] + ba_max + oa_max
+            ) / self.n_pairs
+            for b in np.argsort(-pair_bounds, kind="stable"):
+                if pair_bounds[b] + _BOUND_EPSILON < threshold():
+                    break
+                self._score_shoes(int(t), int(b), k, heap, threshold)
+
+        ranked = sorted(heap, key=lambda entry: (-entry[0], -entry[1]))
+        return [(indices, score) for score, _, indices in ranked]
+
+    def _score_shoes(self, t: int, b: int, k: int, heap: list, threshold) -> None:
+        """Exact scores of (t, b, every shoe) with the greedy outerwear/accessory choice."""
+        # Bound per shoe first, to skip the outerwear/accessory work for hopeless ones
+        shoe_bounds = (
+            self.tb[t, b] + self.ts[t] + self.bs[b]
+            + self.to_max[t] + self.bo_max[b] + self.so_max
+            + self.ta_max[t] + self.ba_max[b] + self.sa_max
+            + self.oa_max
+        ) / self.n_pairs
+        shoes = np.flatnonzero(shoe_bounds + _BOUND_EPSILON >= threshold())
+        if shoes.size == 0:
+            return
+
+        # Pair sums in the order _calculate_outfit_score visits them for
+        # [top, bottom, shoes, outerwear, accessory]:
+        # (t,b) (t,s) (t,o) (t,a) (b,s) (b,o) (b,a) (s,o) (s,a) (o,a)
+        tb = self.tb[t, b]
+        ts = self.ts[t, shoes]
+        bs = self.bs[b, shoes]
+
+        outer = None
+        if self.has_outerwear:
+            # max(outerwear, key=score of [t, b, s, o]); argmax keeps the first maximum like max()
+            keys = (((((0 + tb) + ts[:, None]) + self.to[t][None, :]) + bs[:, None]) + self.bo[b][None, :]) + self.so[shoes]
+            outer = np.argmax(keys / 6, axis=1)
+
+        if self.has_accessory:
+            if self.has_outerwear:
+                to = self.to[t, outer][:, None]
+                bo = self.bo[b, outer][:, None]
+                so = self.so[shoes, outer][:, None]
+                oa = self.oa[outer]
+                keys = (((((((((0 + tb) + ts[:, None]) + to) + self.ta[t][None, :]) + bs[:, None]) + bo)
+                         + self.ba[b][None, :]) + so) + self.sa[shoes]) + oa
+                keys = keys / 10
+            else:
+                keys = (((((0 + tb) + ts[:, None]) + self.ta[t][None, :]) + bs[:, None]) + self.ba[b][None, :]) + self.sa[shoes]
+                keys = keys / 6
+            accessory = np.argmax(keys, axis=1)
+            scores = keys[np.arange(shoes.size), accessory]
+        elif self.has_outerwear:
+            to, bo, so = self.to[t, outer], self.bo[b, outer], self.so[shoes, outer]
+            scores = (((((0 + tb) + ts) + to) + bs) + bo + so) / 6
+        else:
+            scores = ((0 + tb) + ts + bs) / 3
+
+        n_bottoms, n_shoes = len(self.bottoms), len(self.shoes)
+        for position, s in enumerate(shoes):
+            score = float(scores[position])
+            if score <= 0: # create_complete_outfit only accepts scores above its initial best of 0
+                continue
+            order = (t * n_bottoms + b) * n_shoes + int(s)
+            entry = (
+                score, -order,
+                (t, b, int(s),
+                 int(outer[position]) if outer is not None else None,
+                 int(accessory[position]) if self.has_accessory else None)
+            )
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+    def items_for(self, indices: Tuple[Optional[int], ...]) -> list:
+        """The outfit's items in OUTFIT_CATEGORY_ORDER, skipping absent categories."""
+        pools = (self.tops, self.bottoms, self.shoes, self.outerwear, self.accessories)
+        return [pool[index] for pool, index in zip(pools, indices) if index is not None]
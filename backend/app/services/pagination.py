@@ -0,0 +1,86 @@
+# Keyset (cursor) pagination for list endpoints.
+# Offset paging makes the database walk and discard every skipped row, so deep pages
+# get linearly slower, and without a unique sort key rows can repeat or go missing
+# between pages. List endpoints therefore order by (date column, id) and return an
+# opaque cursor for the last row of a full page in the X-Next-Cursor header; passing it
+# back as `cursor` continues right after that row, using the composite
+# (user_id, date, id) indexes. Without a cursor, `skip` still pages by offset.
+#
+# NULL dates sort as the smallest value, as in MySQL and SQLite (first ascending, last
+# descending); nullable date columns get the matching IS NULL branches.
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import Date, and_, or_
+from sqlalchemy.sql import Select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def cursor_query():
+    """Query parameter declaration for endpoints that support cursor pagination."""
+    return Query(None, description=f"Continue after the last row of the previous page (its {NEXT_CURSOR_HEADER} header); takes precedence over skip")
+
+
+class Keyset:
+    """The (date, id) ordering of a list endpoint, and cursors into it."""
+
+    def __init__(self, date_column, id_column, descending: bool = False):
+        self.date_column = date_column
+        self.id_column = id_column
+        self.descending = descending
+        self._is_date = isinstance(date_column.type, Date)
+
+    def encode(self, row: Any) -> str:
+        value = getattr(row, self.date_column.key)
+        payload = json.dumps([value.isoformat() if value is not None else None, getattr(row, self.id_column.key)])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple[Optional[Any], int]:
+        try:
+            value, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if value is not None:
+                value = date.fromisoformat(value) if self._is_date else datetime.fromisoformat(value)
+            return value, int(row_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    def _after(self, value, row_id: int):
+        """Condition selecting the rows that follow (value, row_id) in this ordering."""
+        column, id_column = self.date_column, self.id_column
+        nullable = column.expression.nullable
+        if self.descending:
+            if value is None: # In the trailing NULL block
+                return and_(column.is_(None), id_column < row_id)
+            after = or_(column < value, and_(column == value, id_column < row_id))
+            return or_(after, column.is_(None)) if nullable else after
+        if value is None: # In the leading NULL block
+            return or_(and_(column.is_(None), id_column > row_id), column.isnot(None))
+        return or_(column > value, and_(column == value, id_column > row_id))
+
+    def paginate(self, query: Select, cursor: Optional[str], skip: int, limit: int) -> Select:
+        """Orders the query and selects one page plus one row (to tell whether there is a next page)."""
+        if self.descending:
+            query = query.order_by(self.date_column.desc(), self.id_column.desc())
+        else:
+            query = query.order_by(self.date_column, self.id_column)
+        if cursor:
+            query = query.where(self._after(*self.decode(cursor)))
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit + 1)
+
+    def page(self, rows: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+        """(the page's rows, cursor of the next page or None) for rows fetched with paginate()."""
+        rows = list(rows)
+        if len(rows) <= limit or limit <= 0:
+            return rows[:max(limit, 0)], None
+        return rows[:limit], self.encode(rows[limit - 1])
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
@@ -0,0 +1,117 @@
+# Password hashing off the event loop.
+# bcrypt costs ~250ms of CPU per hash/verify at the default cost, and the auth handlers
+# are async, so calling it inline stalls every other request on the worker for that long.
+# Hashing and verification run on a dedicated thread pool instead (bcrypt releases the
+# GIL), sized by PASSWORD_HASH_WORKERS so a login burst can only occupy that many cores.
+# At most PASSWORD_HASH_MAX_PENDING calls may be running or queued; beyond that, requests
+# are rejected with 503 + Retry-After rather than piling up behind the pool.
+#
+# BCRYPT_ROUNDS sets the cost of new hashes. Hashes made with a different cost still
+# verify, and are re-hashed with the current cost on the user's next successful login.
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+class PasswordHasher:
+    """bcrypt hashing and verification on a bounded thread pool."""
+
+    def __init__(
+        self,
+        rounds: int = BCRYPT_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING
+    ):
+        self.rounds = rounds
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        # needs_update() flags hashes whose cost differs from bcrypt__rounds
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.hashes = 0
+        self.verifications = 0
+        self.rehashes = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    def hash(self, password: str) -> str:
+        started = time.perf_counter()
+        hashed = self.context.hash(password)
+        self._record("hashes", time.perf_counter() - started)
+        return hashed
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); new_hash is set when the password is valid but its hash uses another cost."""
+        started = time.perf_counter()
+        valid, new_hash = self.context.verify_and_update(password, hashed_password)
+        self._record("verifications", time.perf_counter() - started)
+        if new_hash is not None:
+            self._record("rehashes", 0.0)
+        return valid, new_hash
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.verify_and_update, password, hashed_password)
+
+    async def _run(self, fn: Callable[..., Any], *args) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                logger.warning(f"Password hashing saturated ({self._pending} pending), rejecting request")
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many sign-in attempts in progress, please retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, counter: str, seconds: float):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.busy_seconds += seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = self.hashes + self.verifications
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "hashes": self.hashes,
+                "verifications": self.verifications,
+                "rehashes": self.rehashes,
+                "rejected": self.rejected,
+                "avg_ms": round(1000 * self.busy_seconds / operations, 3) if operations else 0.0,
+            }
+
+
+# Global hasher instance
+password_hasher = PasswordHasher()
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the global password hasher instance"""
+    return password_hasher
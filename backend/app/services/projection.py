@@ -0,0 +1,54 @@
+# Response projections for wardrobe data.
+# Wardrobe items carry an image embedding (1280 floats for MobileNetV2) that clients
+# rarely need. Read endpoints take `view=summary|full`: the summary view defers the
+# embedding column in the query, so it is never read from the database, and
+# serializes items with schemas.WardrobeItemSummary, which has no embedding field.
+
+from typing import Any, Iterable, List, Literal
+
+from fastapi import Query
+from sqlalchemy.orm import defer, selectinload
+
+from .. import model as models, tables as schemas
+
+ResponseView = Literal["summary", "full"]
+VIEW_SUMMARY = "summary"
+VIEW_FULL = "full"
+
+
+def view_query(default: str = VIEW_SUMMARY):
+    """Query parameter declaration for endpoints that support projections."""
+    return Query(default, description="'summary' omits heavy AI fields such as ai_embedding; 'full' includes them")
+
+
+def wardrobe_item_options(view: str) -> List[Any]:
+    """Loader options excluding the columns the view does not serialize."""
+    if view == VIEW_FULL:
+        return []
+    return [defer(models.WardrobeItem.ai_embedding)]
+
+
+def wardrobe_item_schema(view: str):
+    return schemas.WardrobeItem if view == VIEW_FULL else schemas.WardrobeItemSummary
+
+
+def serialize_wardrobe_item(item: models.WardrobeItem, view: str):
+    return wardrobe_item_schema(view).model_validate(item)
+
+
+def serialize_wardrobe_items(items: Iterable[models.WardrobeItem], view: str) -> list:
+    schema = wardrobe_item_schema(view)
+    return [schema.model_validate(item) for item in items]
+
+
+def outfit_options() -> List[Any]:
+    """
+    Loader options for outfit responses. schemas.Outfit only exposes item ids, so the
+    outfit embedding and every item column but the id stay in the database. Every
+    relationship the schema reads is loaded up front, as async sessions cannot lazy load.
+    """
+    return [
+        defer(models.Outfit.outfit_embedding),
+        selectinload(models.Outfit.items).load_only(models.WardrobeItem.id),
+        selectinload(models.Outfit.feedbacks),
+    ]
@@ -1,29 +1,26 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from .. import model as models, tables as schemas
 from sqlalchemy import func, or_
 
 # Added imports for AI-powered recommendations
-import numpy as np # For random embeddings if needed
-import random
-from itertools import combinations
+import numpy as np
 from sqlalchemy.orm import joinedload # For eager loading of outfit items
 
 from ..services.outfit_matching_service import OutfitMatchingService
+from ..services.compatibility_table import CompatibilityTable, get_compatibility_registry
+from ..services.outfit_generator import DEFAULT_OUTFIT_STRUCTURES, OUTFIT_GENERATOR_ITEMS_PER_CATEGORY, generate_outfits
+from ..services.vector_index import UserVectorIndex, get_vector_index_registry
 # from ..services.ai_services import get_fashion_trends_service # Keep commented if not fully implementing trend integration yet
 # from ..services.ai_services import analyze_outfit_image_service # Not directly used if AI features are mocked/pre-stored
 
-# For sentence embeddings for occasion matching
-try:
-    from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
-    sentence_model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-except ImportError:
-    import logging # Import here if not at top level already
-    logger = logging.getLogger(__name__)
-    logger.warning("sentence_transformers not available. Occasion matching will use fallback logic.")
-    sentence_model = None
-    cosine_similarity = None
+# For sentence embeddings for occasion matching. The model is loaded on first use
+# through the model manager rather than at import time, and embeddings are cached.
+import logging
+from .text_embeddings import encode_text_cached, text_embedding_key
+
+logger = logging.getLogger(__name__)
 
 
 # --- Load Models ---
@@ -32,9 +29,55 @@ except ImportError:
 # Instantiate services needed
 outfit_matcher = OutfitMatchingService()
 
+
+def _compatibility_table(db: Session, user_id: int) -> Optional[CompatibilityTable]:
+    """
+    The user's persisted compatibility table, or None if it cannot be read (e.g. the
+    table is missing); scoring then falls back to the items' embeddings.
+    """
+    try:
+        return get_compatibility_registry().get(user_id, db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not load compatibility table for user {user_id}, scoring from embeddings: {e}")
+        return None
+
 from .weather_service import get_weather_data # For weather-based recommendations
 import asyncio # For running async weather_service call if needed, or make the main function async
 
+def occasion_text(occasion) -> str:
+    """Text the occasion's embedding is computed from (name and notes)."""
+    return f"{occasion.name} {occasion.notes if occasion.notes else ''}".strip()
+
+
+def refresh_occasion_embedding(db_occasion: models.Occasion) -> None:
+    """
+    Stores the embedding of the occasion's name/notes on it (the caller commits). It is
+    re-encoded (through the text embedding cache) only when the name/notes or the text
+    model changed since it was stored.
+    """
+    text = occasion_text(db_occasion)
+    key = text_embedding_key(text) if text else None
+    if key is not None and db_occasion.text_embedding_key == key and db_occasion.text_embedding is not None:
+        return
+    embedding = encode_text_cached(text) if text else None
+    db_occasion.text_embedding = embedding
+    db_occasion.text_embedding_key = key if embedding is not None else None
+
+
+def get_occasion_embedding(db_occasion: models.Occasion) -> Optional[np.ndarray]:
+    """
+    The occasion's stored text embedding, or (if it is missing or stale) the cached encoding
+    of its current text. Never writes: embeddings are stored on create/update.
+    """
+    text = occasion_text(db_occasion)
+    if not text:
+        return None
+    if db_occasion.text_embedding_key == text_embedding_key(text) and db_occasion.text_embedding is not None:
+        return db_occasion.text_embedding
+    return encode_text_cached(text)
+
+
 # Helper function to find matching outfits based on simple criteria (OLD - to be replaced)
 # New AI-driven helper function for occasion matching
 def find_ai_matched_outfits_for_occasion(
@@ -42,128 +85,149 @@ def find_ai_matched_outfits_for_occasion(
     user_id: int,
     occasion_text: str, # Combined occasion name and notes
     num_recommendations: int = 3,
-    min_coherence_score: float = 0.4 # Minimum internal coherence for an outfit to be considered
+    min_coherence_score: float = 0.4, # Minimum internal coherence for an outfit to be considered
+    occasion_embedding: Optional[np.ndarray] = None # Precomputed embedding of occasion_text
 ) -> List[models.Outfit]:
-    logger = logging.getLogger(__name__) # Ensure logger is available
-
-    if not sentence_model:
-        logger.warning("Sentence transformer model not loaded. Cannot perform AI matching.")
-        return []
-
-    try:
-        occasion_embedding = sentence_model.encode(occasion_text)
-    except Exception as e:
-        logger.error(f"Error encoding occasion text: {e}")
-        return []
-
-    # Fetch user's outfits with their items eagerly loaded
-    # Assuming 'items_association' is the relationship from Outfit to OutfitItem (association object)
-    # and 'item' is the relationship from OutfitItem to WardrobeItem.
-    user_outfits = db.query(models.Outfit)\
+    if occasion_embedding is None:
+        occasion_embedding = encode_text_cached(occasion_text)
+        if occasion_embedding is None:
+            logger.warning("Sentence transformer model not available. Cannot perform AI matching.")
+            return []
+    occasion_embedding = np.asarray(occasion_embedding)
+
+    # Rank by the stored outfit embeddings first: one matrix scan, no items loaded
+    outfit_rows = db.query(models.Outfit.id, models.Outfit.outfit_embedding)\
         .filter(models.Outfit.user_id == user_id)\
-        .options(joinedload(models.Outfit.items_association).joinedload(models.OutfitItem.item))\
+        .order_by(models.Outfit.id)\
         .all()
-
-    if not user_outfits:
+    if not outfit_rows:
         return []
 
+    outfit_ids = np.array([row.id for row in outfit_rows], dtype=np.int64)
+    # Image embeddings (MobileNetV2) and text embeddings (MiniLM) live in different spaces;
+    # outfits whose embedding is missing or of another size get a neutral score.
+    similarity_to_occasion_normalized = np.full(len(outfit_rows), 0.5)
+    query = occasion_embedding.ravel().astype(np.float32)
+    comparable = [i for i, row in enumerate(outfit_rows) if row.outfit_embedding is not None and row.outfit_embedding.size == query.size]
+    if comparable and np.linalg.norm(query) > 0:
+        matrix = np.stack([outfit_rows[i].outfit_embedding for i in comparable]).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        cosine = np.divide(matrix @ query, norms, out=np.zeros(len(comparable), dtype=np.float32), where=norms > 0)
+        # Normalize cosine similarity from [-1, 1] to [0, 1] for scoring
+        similarity_to_occasion_normalized[comparable] = (cosine + 1) / 2
+
+    # Weighted score
+    occasion_similarity_weight = 0.7
+    coherence_weight = 0.3
+    # Coherence is at most 1, so this bounds each outfit's final score. Outfits are
+    # examined best bound first and the scan stops once no bound can enter the top results.
+    upper_bounds = occasion_similarity_weight * similarity_to_occasion_normalized + coherence_weight
+    order = np.argsort(-upper_bounds, kind="stable")
+
+    # Pairwise item similarities come from the user's persisted compatibility table
+    compatibility_table = _compatibility_table(db, user_id)
     scored_outfits = []
-
-    for outfit in user_outfits:
-        if not outfit.items_association: # Skip outfits with no items
-            continue
-
-        outfit_item_features_for_matcher: List[Dict[str, Any]] = []
-        item_embeddings_for_outfit_avg: List[np.ndarray] = []
-
-        for assoc_obj in outfit.items_association:
-            item = assoc_obj.item # This is the WardrobeItem model
-            if not item: continue
-
-            # Use actual AI embedding if available, otherwise mock (embedding dim for all-MiniLM-L6-v2 is 384)
-            item_emb_list = item.ai_embedding
-            if item_emb_list is None:
-                item_emb_list = np.random.rand(384).tolist()
-
-            # Use actual AI dominant colors if available, otherwise mock
-            item_colors = item.ai_dominant_colors
-            if item_colors is None:
-                item_colors = random.sample(["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF"], k=min(2, len(["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF"])))
-
-
-            item_category = getattr(item, "category", None)
-            if item_category is None:
-                item_category = random.choice(["Tops", "Bottoms", "Shoes", "Accessories"])
-
-            outfit_item_features_for_matcher.append({
-                "id": item.id,
-                "name": item.name,
-                "embedding": item_emb_list, # Used by outfit_matcher
-                "colors": item_colors,    # Used by outfit_matcher
-                "category": item_category # Used by outfit_matcher (potentially)
+    batch_size = max(8, num_recommendations * 2)
+    for batch_start in range(0, len(order), batch_size):
+        if len(scored_outfits) >= num_recommendations:
+            kth_score = sorted((s["score"] for s in scored_outfits), reverse=True)[num_recommendations - 1]
+            if upper_bounds[order[batch_start]] < kth_score:
+                break
+        batch = order[batch_start:batch_start + batch_size]
+        items_by_outfit = _outfit_item_features(db, outfit_ids[batch].tolist())
+
+        for position in batch:
+            outfit_item_features_for_matcher = items_by_outfit.get(int(outfit_ids[position]))
+            if not outfit_item_features_for_matcher: # Skip outfits with no items
+                continue
+
+            # Calculate Outfit Coherence
+            coherence_details = outfit_matcher.build_compatibility_matrix(outfit_item_features_for_matcher, compatibility_table)\
+                .score(range(len(outfit_item_features_for_matcher)))
+            internal_coherence_score = coherence_details["score"]
+
+            if internal_coherence_score < min_coherence_score:
+                continue # Skip outfits that are not internally coherent
+
+            final_match_score = (occasion_similarity_weight * similarity_to_occasion_normalized[position]) + \
+                                (coherence_weight * internal_coherence_score)
+            scored_outfits.append({
+                "outfit_id": int(outfit_ids[position]),
+                "score": float(final_match_score),
+                "debug_occasion_sim": float(similarity_to_occasion_normalized[position]),
+                "debug_coherence": internal_coherence_score
             })
-            item_embeddings_for_outfit_avg.append(np.array(item_emb_list))
-
-        if not outfit_item_features_for_matcher or not item_embeddings_for_outfit_avg:
-            continue # Not enough item data to process this outfit
-
-        # 1. Calculate Outfit Coherence
-        coherence_details = outfit_matcher.calculate_compatibility_score(outfit_item_features_for_matcher)
-        internal_coherence_score = coherence_details["score"]
-
-        if internal_coherence_score < min_coherence_score:
-            continue # Skip outfits that are not internally coherent
-
-        # 2. Create Outfit Embedding (average of item embeddings)
-        outfit_embedding_avg = np.mean(item_embeddings_for_outfit_avg, axis=0)
-
-        # 3. Calculate Match Score (Similarity to Occasion + Internal Coherence)
-        similarity_to_occasion = cosine_similarity(occasion_embedding.reshape(1, -1), outfit_embedding_avg.reshape(1, -1))[0][0]
-        # Normalize cosine similarity from [-1, 1] to [0, 1] for scoring
-        similarity_to_occasion_normalized = (similarity_to_occasion + 1) / 2
-
-        # Weighted score
-        occasion_similarity_weight = 0.7
-        coherence_weight = 0.3
-        final_match_score = (occasion_similarity_weight * similarity_to_occasion_normalized) + \
-                            (coherence_weight * internal_coherence_score)
-
-        scored_outfits.append({
-            "outfit_model": outfit, # Keep the SQLAlchemy model
-            "score": final_match_score,
-            "debug_occasion_sim": similarity_to_occasion_normalized,
-            "debug_coherence": internal_coherence_score
-        })
 
     # Sort outfits by the final match score
     # Adding a secondary sort by coherence in case of tie in final_match_score, or just to favor more coherent ones slightly
-    sorted_outfits = sorted(scored_outfits, key=lambda x: (x["score"], x["debug_coherence"]), reverse=True)
-
-    # logger.debug(f"Sorted Outfits: {[ (s['outfit_model'].name, s['score'], s['debug_occasion_sim'],s['debug_coherence']) for s in sorted_outfits[:5]]}")
+    sorted_outfits = sorted(scored_outfits, key=lambda x: (x["score"], x["debug_coherence"]), reverse=True)[:num_recommendations]
+    if not sorted_outfits:
+        return []
 
+    # Only the recommended outfits are loaded with their items
+    selected_ids = [s["outfit_id"] for s in sorted_outfits]
+    outfits_by_id = {
+        outfit.id: outfit for outfit in
+        db.query(models.Outfit).filter(models.Outfit.id.in_(selected_ids)).options(joinedload(models.Outfit.items)).all()
+    }
+    return [outfits_by_id[outfit_id] for outfit_id in selected_ids if outfit_id in outfits_by_id]
+
+
+def _outfit_item_features(db: Session, outfit_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Item features (id, name, colors, category) of the given outfits, without embeddings."""
+    association = models.outfit_item_association
+    rows = db.query(
+        association.c.outfit_id, models.WardrobeItem.id, models.WardrobeItem.name,
+        models.WardrobeItem.ai_dominant_colors, models.WardrobeItem.category
+    ).join(models.WardrobeItem, models.WardrobeItem.id == association.c.wardrobe_item_id)\
+        .filter(association.c.outfit_id.in_(outfit_ids))\
+        .order_by(association.c.outfit_id, models.WardrobeItem.id)\
+        .all()
 
-    return [s["outfit_model"] for s in sorted_outfits[:num_recommendations]]
+    features: Dict[int, List[Dict[str, Any]]] = {}
+    for outfit_id, item_id, name, colors, category in rows:
+        features.setdefault(outfit_id, []).append({
+            "id": item_id,
+            "name": name,
+            "colors": colors or [],
+            "category": category
+        })
+    return features
 
 
 async def recommend_outfits_for_occasion_service(
-    db: Session,
+    db: AsyncSession,
     user: schemas.User, # User for whom recommendations are being made
     occasion: schemas.Occasion, # The occasion details
-    num_recommendations: int = 3
+    num_recommendations: int = 3,
+    occasion_embedding: Optional[np.ndarray] = None # Stored embedding, see get_occasion_embedding
 ) -> List[schemas.Outfit]: # Return a list of Outfit schemas
 
-    occasion_text = f"{occasion.name} {occasion.notes if occasion.notes else ''}".strip()
-    if not occasion_text: # Handle empty occasion details
+    text = occasion_text(occasion)
+    if not text: # Handle empty occasion details
         # Fallback: maybe return most coherent or recently created outfits?
         # For now, return empty if no text to match.
         return []
 
+    # The matching queries and the lazy loads of schema validation run in the session's
+    # sync context, so their database waits do not block the event loop
+    return await db.run_sync(_occasion_recommendations, user.id, text, num_recommendations, occasion_embedding)
+
+
+def _occasion_recommendations(
+    db: Session,
+    user_id: int,
+    text: str,
+    num_recommendations: int,
+    occasion_embedding: Optional[np.ndarray]
+) -> List[schemas.Outfit]:
     # Use the new AI-driven helper
     db_outfits = find_ai_matched_outfits_for_occasion(
         db=db,
-        user_id=user.id,
-        occasion_text=occasion_text,
-        num_recommendations=num_recommendations
+        user_id=user_id,
+        occasion_text=text,
+        num_recommendations=num_recommendations,
+        occasion_embedding=occasion_embedding
     )
 
     recommendations = []
@@ -181,8 +245,47 @@ async def recommend_outfits_for_occasion_service(
     return recommendations
 
 
+def _outfit_candidate_pool(
+    items: List[Dict[str, Any]],
+    vector_index: UserVectorIndex,
+    per_category: int = OUTFIT_GENERATOR_ITEMS_PER_CATEGORY
+) -> List[Dict[str, Any]]:
+    """
+    The items outfit ideas are generated from: at most per_category items of every category
+    that appears in an outfit structure. A larger bucket keeps the nearest neighbours (in the
+    user's vector index) of the centroid of its partner categories' items, i.e. the items
+    with the highest mean style similarity to their possible partners; items without an
+    embedding fill the remaining places in wardrobe order. Pair scores are then built for
+    this bounded pool instead of the whole wardrobe.
+    """
+    buckets: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        buckets.setdefault(item["category"], []).append(item)
+    partner_categories = {
+        category: {c for s in DEFAULT_OUTFIT_STRUCTURES if category in s for c in s if c != category}
+        for category in buckets
+    }
+
+    kept = set()
+    for category, bucket in buckets.items():
+        if not partner_categories[category]:
+            continue # Never part of an outfit
+        bucket_ids = [item["id"] for item in bucket]
+        if len(bucket) <= per_category:
+            kept.update(bucket_ids)
+            continue
+        centroid = vector_index.centroid(item["id"] for c in partner_categories[category] for item in buckets.get(c, ()))
+        nearest = [] if centroid is None else [
+            item_id for item_id, _ in vector_index.top_k(centroid, k=per_category, filters={"id": bucket_ids})
+        ]
+        nearest_set = set(nearest)
+        kept.update(nearest)
+        kept.update([item_id for item_id in bucket_ids if item_id not in nearest_set][:per_category - len(nearest)])
+    return [item for item in items if item["id"] in kept]
+
+
 async def get_wardrobe_recommendations_service(
-    db: Session,
+    db: AsyncSession,
     user: schemas.User,
     num_recommendations: int = 5, # Max number of new outfit ideas
     latitude: Optional[float] = None,
@@ -196,6 +299,15 @@ async def get_wardrobe_recommendations_service(
         # If get_weather_data is not async, call it directly:
         # weather_conditions = get_weather_data(latitude=latitude, longitude=longitude)
 
+    return await db.run_sync(_wardrobe_recommendations, user, num_recommendations, weather_conditions)
+
+
+def _wardrobe_recommendations(
+    db: Session,
+    user: schemas.User,
+    num_recommendations: int,
+    weather_conditions: Optional[Dict[str, Any]]
+) -> schemas.PersonalizedWardrobeSuggestions:
     user_items_query = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == user.id)
 
     # Initial filtering based on very basic weather conditions if available
@@ -239,93 +351,50 @@ async def get_wardrobe_recommendations_service(
 
     user_items = user_items_query.all()
 
-    # Process items to ensure they have AI features (mocked if not present)
+    # Collect the features the compatibility scoring needs. Style similarities come from
+    # the persisted compatibility table, so items without an embedding are not mocked.
     processed_user_items: List[Dict[str, Any]] = []
-    for item in user_items: # Corrected variable name from user_items_from_db
-        # Use actual AI embedding if available, otherwise mock
-        embedding = item.ai_embedding
-        if embedding is None: # Check covers both missing attr and attr is None
-            embedding = np.random.rand(512).tolist() # Example ViT-base embedding
-
-        # Use actual AI dominant colors if available, otherwise mock
-        ai_colors = item.ai_dominant_colors
-        if ai_colors is None:
-            ai_colors = random.sample(["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0F0F0"], k=2)
-
-        # Ensure category is present, mock if not
-        category = getattr(item, "category", None)
-        if category is None:
-            category = random.choice(["Tops", "Bottoms", "Shoes", "Accessories", "Outerwear"])
-
+    for item in user_items:
         processed_user_items.append({
             "id": item.id,
             "name": item.name,
             "image_url": item.image_url, # Keep other useful fields
-            "category": category,
-            "embedding": embedding,
-            "colors": ai_colors,
-            # Add other fields like item.ai_style if it were available and needed
+            "category": item.category,
+            "embedding": item.ai_embedding,
+            "colors": item.ai_dominant_colors or [],
         })
 
     new_outfit_ideas: List[str] = []
 
     # --- "New Outfit Ideas" Generation ---
-    # Filter items that have necessary features for matching
-    matchable_items = [item for item in processed_user_items if item.get("embedding") and item.get("colors") and item.get("category")]
-
-    # Group items by category for easier selection
-    items_by_category: Dict[str, List[Dict[str, Any]]] = {}
-    for item in matchable_items:
-        items_by_category.setdefault(item["category"], []).append(item)
-
-    # Define typical outfit structures (e.g., top + bottom, top + bottom + shoes)
-    # This is a simplified approach. More complex logic could handle more variations.
-    outfit_structures = [
-        ["Tops", "Bottoms"],
-        ["Tops", "Bottoms", "Shoes"],
-        ["Tops", "Bottoms", "Outerwear"],
-    ]
-
-    attempts_to_find_outfits = 15 # Try a number of times to generate diverse outfits
-    generated_outfit_count = 0
+    # Outfits are enumerated best-first from the category buckets and picked for
+    # diversity (see outfit_generator.py), so the ideas are deterministic.
+    # Category buckets are capped to each one's best partners first, so the pair scores
+    # below cover a bounded pool regardless of wardrobe size.
+    matchable_items = _outfit_candidate_pool(
+        [item for item in processed_user_items if item.get("category")],
+        get_vector_index_registry().get(user.id, db)
+    )
+    compatibility_table = _compatibility_table(db, user.id)
+    compatibility = outfit_matcher.build_compatibility_matrix(matchable_items, compatibility_table)
+    matchable_ids = [item["id"] for item in matchable_items]
+    pair_scores = None
+    if compatibility_table is not None and all(i in compatibility_table for i in matchable_ids):
+        pair_scores = compatibility_table.pair_scores(matchable_ids)
 
     if len(matchable_items) >= 2: # Need at least 2 items to form an outfit
-        for _ in range(attempts_to_find_outfits):
-            if generated_outfit_count >= num_recommendations:
-                break
-
-            chosen_structure = random.choice(outfit_structures)
-            current_outfit_items_features: List[Dict[str, Any]] = []
-            current_outfit_item_names: List[str] = []
-
-            possible_to_form = True
-            for cat in chosen_structure:
-                if items_by_category.get(cat):
-                    chosen_item = random.choice(items_by_category[cat])
-                    # Avoid choosing the same item twice if a category is listed multiple times (not in current structures)
-                    if chosen_item["id"] not in [ci["id"] for ci in current_outfit_items_features]:
-                        current_outfit_items_features.append(chosen_item)
-                        current_outfit_item_names.append(chosen_item["name"])
-                    else: # Could not find a unique item for this part of the structure
-                        possible_to_form = False; break
-                else: # Not enough items in a required category
-                    possible_to_form = False; break
-
-            if possible_to_form and len(current_outfit_items_features) >= 2:
-                # Check if this specific combination of item names has been suggested already
-                # Sort names to ensure order doesn't matter for uniqueness
-                sorted_item_names = ", ".join(sorted(current_outfit_item_names))
-                if any(sorted_item_names in idea for idea in new_outfit_ideas): # Basic check to avoid exact duplicates by name
-                    continue
-
-                score_details = outfit_matcher.calculate_compatibility_score(current_outfit_items_features)
-                if score_details["score"] > 0.55: # Compatibility threshold
-                    idea = (f"Try combining: {', '.join(current_outfit_item_names)} "
-                            f"(Style: {score_details['style_cohesion_score']:.2f}, "
-                            f"Color: {score_details['color_harmony_score']:.2f}, "
-                            f"Overall: {score_details['score']:.2f})")
-                    new_outfit_ideas.append(idea)
-                    generated_outfit_count += 1
+        outfits = generate_outfits(
+            compatibility, [item["category"] for item in matchable_items], num_recommendations,
+            pair_scores=pair_scores, min_score=0.55 # Compatibility threshold
+        )
+        for rows, score_details in outfits:
+            item_names = [matchable_items[row]["name"] for row in rows]
+            new_outfit_ideas.append(
+                f"Try combining: {', '.join(item_names)} "
+                f"(Style: {score_details['style_cohesion_score']:.2f}, "
+                f"Color: {score_details['color_harmony_score']:.2f}, "
+                f"Overall: {score_details['score']:.2f})"
+            )
 
     if not new_outfit_ideas and matchable_items: # Fallback if no high-scoring outfits found
         new_outfit_ideas.append("Try experimenting with different combinations from your wardrobe! Use items from different categories like Tops, Bottoms, and Shoes.")
@@ -0,0 +1,258 @@
+# Cached sentence embeddings for short texts (occasion names and notes).
+# Encoding a sentence costs a transformer forward pass, and the same few texts are
+# encoded over and over (every read of an occasion ranks outfits against it), so
+# embeddings are kept in a small in-memory LRU backed by one file per text on disk.
+# Disk files are evicted least-recently-used (by mtime, refreshed on every disk hit)
+# once the directory exceeds TEXT_EMBEDDING_CACHE_MAX_MB or TEXT_EMBEDDING_CACHE_MAX_ENTRIES.
+#
+# Keys are a SHA-256 of the text model's name and version together with the
+# normalized text (whitespace collapsed, case folded - the MiniLM tokenizer is
+# uncased, so this does not change the embedding). Bumping the model version in
+# ModelManager.model_configs therefore invalidates old entries without a flush.
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..db.types import decode_embedding, encode_embedding
+from .model_manager import SENTENCE_MODEL_NAME, encode_text, get_model_manager
+from .inference_server import is_remote_inference, get_inference_client
+
+logger = logging.getLogger(__name__)
+
+TEXT_EMBEDDING_CACHE_ENABLED = os.getenv("TEXT_EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+TEXT_EMBEDDING_CACHE_DIR = os.getenv("TEXT_EMBEDDING_CACHE_DIR", "/tmp/wardrobe_text_embeddings")
+TEXT_EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("TEXT_EMBEDDING_CACHE_MEMORY_ENTRIES", "2048"))
+TEXT_EMBEDDING_CACHE_MAX_MB = float(os.getenv("TEXT_EMBEDDING_CACHE_MAX_MB", "64"))
+TEXT_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+# After an eviction pass the disk level is trimmed to this fraction of its limits.
+_EVICTION_LOW_WATER = 0.9
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def text_model_id() -> str:
+    """Name and version of the model that produces text embeddings."""
+    config = get_model_manager().model_configs[SENTENCE_MODEL_NAME]
+    return f"{SENTENCE_MODEL_NAME}:{config['version']}"
+
+
+def text_embedding_key(text: str, model_id: Optional[str] = None) -> str:
+    digest = hashlib.sha256()
+    digest.update((model_id or text_model_id()).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TextEmbeddingCache:
+    """
+    Two-level (memory LRU, then disk) cache of text embeddings. The disk level is
+    shared between processes using the same directory; writes are atomic renames.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = TEXT_EMBEDDING_CACHE_DIR,
+        memory_entries: int = TEXT_EMBEDDING_CACHE_MEMORY_ENTRIES,
+        enabled: bool = TEXT_EMBEDDING_CACHE_ENABLED,
+        max_bytes: int = int(TEXT_EMBEDDING_CACHE_MAX_MB * 1024 * 1024),
+        max_entries: int = TEXT_EMBEDDING_CACHE_MAX_ENTRIES
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.memory_entries = max(1, memory_entries)
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        # Running totals of the disk level, scanned on first write
+        self._scanned = False
+        self._total_bytes = 0
+        self._total_entries = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.bin"
+
+    def _entry_files(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry on disk."""
+        files = []
+        if not self.cache_dir.exists():
+            return files
+        for path in self.cache_dir.glob("*/*.bin"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError: # Evicted by another process meanwhile
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        # Caller holds self._lock
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return embedding
+
+        path = self._path(key)
+        try:
+            embedding = decode_embedding(path.read_bytes())
+            os.utime(path) # Mark as recently used
+        except FileNotFoundError:
+            embedding = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable text embedding cache entry {key}: {e}")
+            embedding = None
+
+        with self._lock:
+            if embedding is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._remember(key, embedding)
+        return embedding
+
+    def put(self, key: str, embedding: Any):
+        if not self.enabled:
+            return
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            self._remember(key, embedding)
+        path = self._path(key)
+        payload = encode_embedding(embedding, dtype="float32")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            previous_size = path.stat().st_size if path.exists() else None
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write text embedding cache entry: {e}")
+            return
+
+        with self._lock:
+            if not self._scanned:
+                files = self._entry_files() # Already includes the file just written
+                self._total_entries, self._total_bytes = len(files), sum(size for _, size, _ in files)
+                self._scanned = True
+            elif previous_size is None:
+                self._total_entries += 1
+                self._total_bytes += len(payload)
+            else:
+                self._total_bytes += len(payload) - previous_size
+            over_limit = self._total_bytes > self.max_bytes or self._total_entries > self.max_entries
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> int:
+        """Removes least recently used disk entries until the disk level is back under its limits."""
+        with self._lock:
+            # Rescan rather than trust the running totals: other processes share the directory.
+            files = sorted(self._entry_files())
+            total_bytes = sum(size for _, size, _ in files)
+            total_entries = len(files)
+            removed = 0
+            for _, size, path in files:
+                if total_bytes <= self.max_bytes * _EVICTION_LOW_WATER and total_entries <= self.max_entries * _EVICTION_LOW_WATER:
+                    break
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Could not remove text embedding cache entry {path.name}: {e}")
+                    continue
+                total_bytes -= size
+                total_entries -= 1
+            self._total_bytes, self._total_entries, self._scanned = total_bytes, total_entries, True
+            self._evictions += removed
+        if removed:
+            logger.info(f"Evicted {removed} text embedding cache entr{'y' if removed == 1 else 'ies'}")
+        return removed
+
+    def get_or_encode(self, text: str, encoder: Callable[[str], Any], model_id: Optional[str] = None) -> np.ndarray:
+        """Returns the cached embedding of text, encoding (and caching) it on a miss."""
+        key = text_embedding_key(text, model_id)
+        embedding = self.get(key)
+        if embedding is None:
+            embedding = np.asarray(encoder(text), dtype=np.float32).ravel()
+            self.put(key, embedding)
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.cache_dir.exists():
+                for path in self.cache_dir.glob("*/*.bin"):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+            self._total_bytes, self._total_entries, self._scanned = 0, 0, True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "cache_dir": str(self.cache_dir),
+                "memory_entries": len(self._memory),
+                "disk_entries": self._total_entries if self._scanned else None,
+                "disk_mb": round(self._total_bytes / (1024 * 1024), 2) if self._scanned else None,
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "max_entries": self.max_entries,
+                "evictions": self._evictions,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._memory_hits + self._disk_hits) / lookups, 3) if lookups else None,
+            }
+
+
+# Global text embedding cache instance
+text_embedding_cache = TextEmbeddingCache()
+
+def get_text_embedding_cache() -> TextEmbeddingCache:
+    """Get the global text embedding cache instance"""
+    return text_embedding_cache
+
+
+def _encode_uncached(text: str) -> np.ndarray:
+    if is_remote_inference():
+        return get_inference_client().encode_text(text)
+    return encode_text(text)
+
+
+def encode_text_cached(text: str) -> Optional[np.ndarray]:
+    """Sentence embedding of text, served from the cache when possible. None if the model is unavailable."""
+    try:
+        return get_text_embedding_cache().get_or_encode(text, _encode_uncached)
+    except Exception as e:
+        logger.error(f"Error encoding text: {e}")
+        return None
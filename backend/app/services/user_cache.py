@@ -0,0 +1,118 @@
+# In-process cache of authenticated users.
+# get_current_user runs on every authenticated request; instead of querying the users
+# table and re-validating the schema each time, the validated schemas.User is kept for
+# AUTH_USER_CACHE_TTL_SECONDS, keyed by username.
+#
+# Updates and deletes of User rows made through the ORM in this process drop the entry
+# (SQLAlchemy mapper events) and record when the user changed, so access tokens whose
+# embedded claims predate the change are looked up again instead of being trusted.
+# Other worker processes see the change when their entry expires.
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+from .. import model as models, tables as schemas
+
+AUTH_USER_CACHE_ENABLED = os.getenv("AUTH_USER_CACHE_ENABLED", "true").lower() == "true"
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class UserCache:
+    """TTL + LRU map of username -> schemas.User, plus the last change time per user."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = AUTH_USER_CACHE_TTL_SECONDS,
+        max_entries: int = AUTH_USER_CACHE_MAX_ENTRIES,
+        enabled: bool = AUTH_USER_CACHE_ENABLED,
+        change_retention_seconds: float = 24 * 3600
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.enabled = enabled
+        # Changes only matter while tokens issued before them are unexpired
+        self.change_retention_seconds = change_retention_seconds
+        self._users: "OrderedDict[str, Tuple[float, schemas.User]]" = OrderedDict()
+        self._changed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, username: str) -> Optional[schemas.User]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(username)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._users.move_to_end(username)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._users[username]
+            self.misses += 1
+            return None
+
+    def put(self, user: schemas.User):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._users[user.username] = (time.monotonic(), user)
+            self._users.move_to_end(user.username)
+            while len(self._users) > self.max_entries:
+                self._users.popitem(last=False)
+
+    def invalidate(self, username: str):
+        """Drops the cached user and records the change (wall-clock time, comparable to token iat)."""
+        now = time.time()
+        with self._lock:
+            self._users.pop(username, None)
+            self._changed_at[username] = now
+            cutoff = now - self.change_retention_seconds
+            for name in [name for name, changed in self._changed_at.items() if changed < cutoff]:
+                del self._changed_at[name]
+
+    def changed_since(self, username: str, issued_at: float) -> bool:
+        """Whether the user changed at or after issued_at (epoch seconds) in this process."""
+        with self._lock:
+            changed = self._changed_at.get(username)
+        return changed is not None and changed >= issued_at
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._changed_at.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._users),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Global cache instance
+user_cache = UserCache()
+
+def get_user_cache() -> UserCache:
+    """Get the global authenticated user cache instance"""
+    return user_cache
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    user_cache.invalidate(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted or (): # Renamed users
+        user_cache.invalidate(old_username)
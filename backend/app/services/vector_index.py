@@ -0,0 +1,284 @@
+# Per-user in-memory vector index over wardrobe item embeddings.
+# Each user's item embeddings are kept L2-normalized in one contiguous float32
+# matrix, so a similarity query is a single matrix-vector product followed by a
+# partial sort, instead of one cosine_similarity call per pair.
+# Indexes are built lazily from the database the first time a user is queried
+# and then kept up to date incrementally by the wardrobe router and the
+# enrichment worker. Since other processes may also write items, an index is
+# rebuilt after VECTOR_INDEX_TTL_SECONDS.
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import model as models
+from ..db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+VECTOR_INDEX_TTL_SECONDS = float(os.getenv("VECTOR_INDEX_TTL_SECONDS", "300"))
+VECTOR_INDEX_MAX_USERS = int(os.getenv("VECTOR_INDEX_MAX_USERS", "500"))
+
+# Item attributes stored alongside each vector and usable as top_k filters ("id" is always available)
+INDEXED_METADATA_FIELDS = ("category", "season", "favorite")
+
+
+def _normalize(vector: Any) -> Optional[np.ndarray]:
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(array))
+    if array.size == 0 or norm == 0.0 or not np.isfinite(norm):
+        return None
+    return array / norm
+
+
+class UserVectorIndex:
+    """
+    Normalized embedding matrix for one user's items with incremental upsert/remove.
+    Rows are stored densely in [0, len); removal moves the last row into the hole.
+    """
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 64):
+        self.dim = dim
+        self._capacity = initial_capacity
+        self._matrix: Optional[np.ndarray] = None
+        self._ids = np.zeros(initial_capacity, dtype=np.int64)
+        self._metadata: Dict[str, np.ndarray] = {
+            field: np.empty(initial_capacity, dtype=object) for field in INDEXED_METADATA_FIELDS
+        }
+        self._positions: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._positions
+
+    def _grow(self):
+        self._capacity *= 2
+        self._ids = np.resize(self._ids, self._capacity)
+        for field, column in self._metadata.items():
+            grown = np.empty(self._capacity, dtype=object)
+            grown[:len(column)] = column
+            self._metadata[field] = grown
+        if self._matrix is not None:
+            grown = np.zeros((self._capacity, self.dim), dtype=np.float32)
+            grown[:self._matrix.shape[0]] = self._matrix
+            self._matrix = grown
+
+    def upsert(self, item_id: int, vector: Any, **metadata) -> bool:
+        """Adds or replaces an item's vector. Returns False for unusable (zero, empty or wrong-sized) vectors."""
+        normalized = _normalize(vector)
+        if normalized is None:
+            self.remove(item_id)
+            return False
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = normalized.size
+            if normalized.size != self.dim:
+                logger.warning(f"Skipping item {item_id}: embedding has {normalized.size} dims, index has {self.dim}")
+                self.remove(item_id)
+                return False
+            if self._matrix is None:
+                self._matrix = np.zeros((self._capacity, self.dim), dtype=np.float32)
+
+            position = self._positions.get(item_id)
+            if position is None:
+                position = len(self._positions)
+                if position >= self._capacity:
+                    self._grow()
+                self._positions[item_id] = position
+                self._ids[position] = item_id
+
+            self._matrix[position] = normalized
+            for field in INDEXED_METADATA_FIELDS:
+                self._metadata[field][position] = metadata.get(field)
+            return True
+
+    def remove(self, item_id: int) -> bool:
+        with self._lock:
+            position = self._positions.pop(item_id, None)
+            if position is None:
+                return False
+            last = len(self._positions) # Index of the last row before removal
+            if position != last:
+                moved_id = int(self._ids[last])
+                self._ids[position] = moved_id
+                self._matrix[position] = self._matrix[last]
+                for column in self._metadata.values():
+                    column[position] = column[last]
+                self._positions[moved_id] = position
+            for column in self._metadata.values():
+                column[last] = None
+            return True
+
+    def vector(self, item_id: int) -> Optional[np.ndarray]:
+        """The stored (normalized) vector for an item, or None if it is not indexed."""
+        with self._lock:
+            position = self._positions.get(item_id)
+            return None if position is None else self._matrix[position].copy()
+
+    def centroid(self, item_ids: Iterable[int]) -> Optional[np.ndarray]:
+        """Mean of the stored vectors of the given items (those that are indexed), or None."""
+        with self._lock:
+            size = len(self._positions)
+            if size == 0:
+                return None
+            mask = np.isin(self._ids[:size], list(item_ids))
+            return self._matrix[:size][mask].mean(axis=0) if mask.any() else None
+
+    def _filter_mask(self, size: int, filters: Optional[Dict[str, Any]], exclude_ids: Optional[Iterable[int]]) -> Optional[np.ndarray]:
+        mask = None
+        for field, wanted in (filters or {}).items():
+            if field == "id":
+                column = self._ids[:size]
+            elif field in self._metadata:
+                column = self._metadata[field][:size]
+            else:
+                raise ValueError(f"Unknown vector index filter: {field}")
+            if isinstance(wanted, (list, tuple, set, frozenset)):
+                field_mask = np.isin(column, list(wanted))
+            else:
+                field_mask = column == wanted
+            mask = field_mask if mask is None else mask & field_mask
+        if exclude_ids:
+            field_mask = ~np.isin(self._ids[:size], list(exclude_ids))
+            mask = field_mask if mask is None else mask & field_mask
+        return mask
+
+    def top_k(
+        self,
+        query_vector: Any,
+        k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        exclude_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns up to k (item_id, cosine_similarity) pairs, most similar first.
+        `filters` maps a metadata field (or "id") to a value or a collection of accepted values.
+        """
+        query = _normalize(query_vector)
+        if query is None or k <= 0:
+            return []
+
+        with self._lock:
+            size = len(self._positions)
+            if size == 0 or query.size != self.dim:
+                return []
+            scores = self._matrix[:size] @ query
+            mask = self._filter_mask(size, filters, exclude_ids)
+            if mask is not None:
+                scores = np.where(mask, scores, -np.inf)
+            ids = self._ids[:size].copy()
+
+        k = min(k, size)
+        candidates = np.argpartition(-scores, k - 1)[:k] if k < size else np.arange(size)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in candidates if np.isfinite(scores[i])]
+
+
+class VectorIndexRegistry:
+    """LRU collection of per-user indexes, built on demand from the database."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        ttl_seconds: float = VECTOR_INDEX_TTL_SECONDS,
+        max_users: int = VECTOR_INDEX_MAX_USERS
+    ):
+        self.session_factory = session_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max(1, max_users)
+        self._indexes: "OrderedDict[int, UserVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, db: Session, user_id: int) -> UserVectorIndex:
+        rows = db.query(
+            models.WardrobeItem.id,
+            models.WardrobeItem.ai_embedding,
+            models.WardrobeItem.category,
+            models.WardrobeItem.season,
+            models.WardrobeItem.favorite
+        ).filter(
+            models.WardrobeItem.user_id == user_id,
+            models.WardrobeItem.ai_embedding.isnot(None)
+        ).all()
+
+        index = UserVectorIndex()
+        for row in rows:
+            index.upsert(row.id, row.ai_embedding, category=row.category, season=row.season, favorite=row.favorite)
+        logger.debug(f"Built vector index for user {user_id} with {len(index)} item(s)")
+        return index
+
+    def get(self, user_id: int, db: Optional[Session] = None) -> UserVectorIndex:
+        """Returns the user's index, (re)building it if it is missing or older than the TTL."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at < self.ttl_seconds:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        own_session = db is None
+        db = db or self.session_factory()
+        try:
+            index = self.build(db, user_id)
+        finally:
+            if own_session:
+                db.close()
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _loaded(self, user_id: int) -> Optional[UserVectorIndex]:
+        with self._lock:
+            return self._indexes.get(user_id)
+
+    def sync_item(self, db_item: models.WardrobeItem):
+        """Mirrors an item's current embedding and metadata into its owner's index, if that index is loaded."""
+        index = self._loaded(db_item.user_id)
+        if index is None:
+            return # Built with fresh data on next use
+        if db_item.ai_embedding is None:
+            index.remove(db_item.id)
+        else:
+            index.upsert(db_item.id, db_item.ai_embedding,
+                         category=db_item.category, season=db_item.season, favorite=db_item.favorite)
+
+    def remove_item(self, user_id: int, item_id: int):
+        index = self._loaded(user_id)
+        if index is not None:
+            index.remove(item_id)
+
+    def invalidate(self, user_id: Optional[int] = None):
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._indexes),
+                "items": sum(len(index) for index in self._indexes.values()),
+            }
+
+
+# Global registry instance
+vector_index_registry = VectorIndexRegistry()
+
+def get_vector_index_registry() -> VectorIndexRegistry:
+    """Get the global vector index registry instance"""
+    return vector_index_registry
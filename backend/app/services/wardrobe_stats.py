@@ -0,0 +1,273 @@
+# Materialized per-user wardrobe statistics.
+# The dashboard counts (item, outfit and favorite counts, items per category and season)
+# are kept in one UserWardrobeStats row per user, so the statistics endpoints read a single
+# row by primary key instead of running an aggregate query per figure on every load. The
+# most and least worn items are not materialized: they are read with LIMIT queries on the
+# (user_id, times_worn) index, so wear count changes (style history) never touch the row.
+#
+# Maintenance is incremental and transactional: an after_flush listener on every Session
+# turns the flushed inserts, updates and deletes of wardrobe items and outfits into
+# per-user deltas and applies them to the owners' rows in the same transaction. When a
+# change cannot be expressed as a delta (the previous value was never loaded), the user's
+# row is recomputed from the items instead. New users get an empty row (existing users got
+# theirs from migration 0005); a missing row is computed on read without being stored.
+#
+# Writes that bypass the ORM (raw SQL, bulk UPDATEs) are not seen. Repair drift with
+# `python -m app.services.wardrobe_stats [--user-id ID]`.
+
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import Select, event, func, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import model as models
+from ..db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+UNCATEGORIZED = "Uncategorized" # Category key for items without one
+WORN_ITEMS_LIMIT = 5 # Length of the most/least worn lists
+
+_stats = models.UserWardrobeStats.__table__
+_items = models.WardrobeItem.__table__
+_outfits = models.Outfit.__table__
+
+
+def empty_stats() -> Dict[str, Any]:
+    return {
+        "total_items": 0,
+        "total_outfits": 0,
+        "favorite_items_count": 0,
+        "items_by_category": {},
+        "items_by_season": {},
+    }
+
+
+def compute_stats(connection: Connection, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """Statistics of the given users (all users when None), computed from their items and outfits."""
+    users = select(models.User.__table__.c.id)
+    items = select(_items.c.user_id, _items.c.category, _items.c.season, _items.c.favorite)
+    outfits = select(_outfits.c.user_id, func.count(_outfits.c.id)).group_by(_outfits.c.user_id)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        users = users.where(models.User.__table__.c.id.in_(user_ids))
+        items = items.where(_items.c.user_id.in_(user_ids))
+        outfits = outfits.where(_outfits.c.user_id.in_(user_ids))
+
+    stats = {user_id: empty_stats() for user_id in connection.execute(users).scalars()}
+    for user_id, category, season, favorite in connection.execute(items):
+        values = stats.setdefault(user_id, empty_stats())
+        values["total_items"] += 1
+        values["favorite_items_count"] += 1 if favorite else 0
+        category = category or UNCATEGORIZED
+        values["items_by_category"][category] = values["items_by_category"].get(category, 0) + 1
+        if season:
+            values["items_by_season"][season] = values["items_by_season"].get(season, 0) + 1
+    for user_id, count in connection.execute(outfits):
+        stats.setdefault(user_id, empty_stats())["total_outfits"] = count
+    return stats
+
+
+def write_stats(connection: Connection, user_id: int, values: Dict[str, Any]):
+    """Replaces the user's row (inserting it if missing)."""
+    values = dict(values, updated_at=datetime.utcnow())
+    if connection.execute(_stats.update().where(_stats.c.user_id == user_id).values(**values)).rowcount == 0:
+        connection.execute(_stats.insert().values(user_id=user_id, **values))
+
+
+def rebuild_stats(connection: Connection, user_ids: Optional[Iterable[int]] = None) -> int:
+    """Recomputes the rows of the given users (all users when None). Returns the number of rows written."""
+    stats = compute_stats(connection, user_ids)
+    for user_id, values in stats.items():
+        write_stats(connection, user_id, values)
+    return len(stats)
+
+
+# --- Incremental maintenance ---
+
+class _Delta:
+    """Changes to one user's statistics from one flush."""
+
+    def __init__(self):
+        self.total_items = 0
+        self.total_outfits = 0
+        self.favorites = 0
+        self.categories: Counter = Counter()
+        self.seasons: Counter = Counter()
+
+    def count_item(self, category, season, favorite, sign: int):
+        self.total_items += sign
+        self.favorites += sign if favorite else 0
+        self.categories[category or UNCATEGORIZED] += sign
+        if season:
+            self.seasons[season] += sign
+
+    def apply(self, row) -> Dict[str, Any]:
+        categories = Counter(row.items_by_category or {})
+        categories.update(self.categories)
+        seasons = Counter(row.items_by_season or {})
+        seasons.update(self.seasons)
+        return {
+            "total_items": row.total_items + self.total_items,
+            "total_outfits": row.total_outfits + self.total_outfits,
+            "favorite_items_count": row.favorite_items_count + self.favorites,
+            "items_by_category": {key: count for key, count in categories.items() if count > 0},
+            "items_by_season": {key: count for key, count in seasons.items() if count > 0},
+        }
+
+
+_ITEM_FIELDS = ("category", "season", "favorite") # times_worn is not materialized
+
+
+def _previous_value(state, field: str) -> Tuple[bool, Any]:
+    """(known, value before this flush) of a mapped attribute."""
+    history = state.attrs[field].history
+    if history.deleted:
+        return True, history.deleted[0]
+    if history.added or field in state.unloaded:
+        return False, None # Overwritten (or never loaded) without its old value being loaded
+    return True, getattr(state.obj(), field)
+
+
+def _collect_changes(session: Session) -> Tuple[Dict[int, _Delta], Set[int], Set[int], Set[int]]:
+    """Per-user deltas, users to recompute, and users created/deleted by the pending flush."""
+    deltas: Dict[int, _Delta] = {}
+    rebuild, created, deleted = set(), set(), set()
+
+    def delta(user_id: int) -> _Delta:
+        return deltas.setdefault(user_id, _Delta())
+
+    for obj in session.new:
+        if isinstance(obj, models.WardrobeItem):
+            delta(obj.user_id).count_item(obj.category, obj.season, obj.favorite, +1)
+        elif isinstance(obj, models.Outfit):
+            delta(obj.user_id).total_outfits += 1
+        elif isinstance(obj, models.User):
+            created.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, (models.WardrobeItem, models.Outfit)):
+            state = inspect(obj)
+            known, user_id = _previous_value(state, "user_id")
+            if not known:
+                continue # Rare; left to the rebuild command
+            if isinstance(obj, models.Outfit):
+                delta(user_id).total_outfits -= 1
+                continue
+            previous = [_previous_value(state, field) for field in _ITEM_FIELDS]
+            if all(known for known, _ in previous):
+                delta(user_id).count_item(*(value for _, value in previous), -1)
+            else:
+                rebuild.add(user_id)
+        elif isinstance(obj, models.User):
+            deleted.add(obj.id)
+
+    for obj in session.dirty:
+        if not isinstance(obj, models.WardrobeItem) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        changed = [field for field in ("user_id",) + _ITEM_FIELDS if state.attrs[field].history.has_changes()]
+        if not changed:
+            continue
+        previous = {field: _previous_value(state, field) for field in changed}
+        if "user_id" in changed or not all(known for known, _ in previous.values()):
+            rebuild.add(obj.user_id)
+            if previous.get("user_id", (False, None))[0]:
+                rebuild.add(previous["user_id"][1])
+            continue
+        user_delta = delta(obj.user_id)
+        for field, (_, old) in previous.items():
+            new = getattr(obj, field)
+            if field == "category":
+                user_delta.categories[old or UNCATEGORIZED] -= 1
+                user_delta.categories[new or UNCATEGORIZED] += 1
+            elif field == "season":
+                if old:
+                    user_delta.seasons[old] -= 1
+                if new:
+                    user_delta.seasons[new] += 1
+            elif field == "favorite":
+                user_delta.favorites += bool(new) - bool(old)
+
+    return deltas, rebuild, created, deleted
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_stats(session: Session, flush_context):
+    # The flush's statements have run (ids are assigned) and the pre-flush attribute
+    # history is still available; the rows are written with Core statements on the
+    # session's connection, so they commit or roll back with the change itself.
+    deltas, rebuild, created, deleted = _collect_changes(session)
+    if not (deltas or rebuild or created or deleted):
+        return
+    connection = session.connection()
+    for user_id in created:
+        connection.execute(_stats.insert().values(user_id=user_id, updated_at=datetime.utcnow(), **empty_stats()))
+    if deleted:
+        connection.execute(_stats.delete().where(_stats.c.user_id.in_(deleted)))
+    if rebuild - deleted:
+        rebuild_stats(connection, rebuild - deleted)
+    for user_id, delta in deltas.items():
+        if user_id in rebuild or user_id in deleted:
+            continue
+        row = connection.execute(select(_stats).where(_stats.c.user_id == user_id).with_for_update()).first()
+        if row is None:
+            continue # Computed from the items on read
+        connection.execute(_stats.update().where(_stats.c.user_id == user_id).values(updated_at=datetime.utcnow(), **delta.apply(row)))
+
+
+# --- Reads ---
+
+def get_user_stats(db: Session, user_id: int) -> models.UserWardrobeStats:
+    """
+    The user's statistics row. If it is missing, the statistics are computed from the items
+    and returned as an unsaved row: reads never write (repair with rebuild_all).
+    """
+    stats = db.get(models.UserWardrobeStats, user_id)
+    if stats is not None:
+        return stats
+    values = compute_stats(db.connection(), [user_id]).get(user_id, empty_stats())
+    return models.UserWardrobeStats(user_id=user_id, **values)
+
+
+def most_worn_items_query(user_id: int, limit: int = WORN_ITEMS_LIMIT) -> Select:
+    """The most worn items (worn at least once), ties broken by id."""
+    item = models.WardrobeItem
+    return (
+        select(item).where(item.user_id == user_id, item.times_worn > 0)
+        .order_by(item.times_worn.desc(), item.id).limit(limit)
+    )
+
+
+def least_worn_items_query(user_id: int, limit: int = WORN_ITEMS_LIMIT) -> Select:
+    """The least worn items (never worn, NULL, first), ties broken by id."""
+    item = models.WardrobeItem
+    return select(item).where(item.user_id == user_id).order_by(item.times_worn, item.id).limit(limit)
+
+
+def rebuild_all(db: Session, user_id: Optional[int] = None) -> int:
+    """Recomputes and commits the statistics of one user, or of every user."""
+    count = rebuild_stats(db.connection(), None if user_id is None else [user_id])
+    db.commit()
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Rebuild the materialized wardrobe statistics")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's row")
+    args = parser.parse_args()
+
+    from ..db.database import Base, engine
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        logger.info(f"Rebuilt {rebuild_all(session, args.user_id)} statistics row(s)")
+    finally:
+        session.close()
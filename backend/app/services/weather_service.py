@@ -1,17 +1,202 @@
+# Current weather for outfit recommendations (OpenWeatherMap).
+# Weather changes on the scale of tens of minutes and barely varies across a few
+# kilometres, so lookups are cached per geohash cell (WEATHER_GEOHASH_PRECISION, 5 ~ 5x5 km)
+# for WEATHER_CACHE_TTL_SECONDS, and the upstream is queried for the cell's centre.
+# Requests go through one long-lived pooled httpx client (created lazily, closed by the
+# app lifespan), so they reuse connections instead of paying a TLS handshake each.
+#
+# Concurrent lookups for the same cell share a single upstream call. Once an entry is
+# older than the TTL, it is still served (stale-while-revalidate) for up to
+# WEATHER_STALE_TTL_SECONDS: the request waits at most WEATHER_REFRESH_WAIT_SECONDS for
+# the refresh and otherwise gets the stale value while the refresh completes in the
+# background. If the upstream fails, the stale value is used as well.
+
 import httpx
 import os
-from typing import Optional, Dict
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 import logging # Added for logging
 
 OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
-WEATHER_API_URL = "https://api.openweathermap.org/data/2.5/weather"
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.openweathermap.org/data/2.5/weather")
+WEATHER_CACHE_TTL_SECONDS = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", "900"))
+WEATHER_STALE_TTL_SECONDS = float(os.getenv("WEATHER_STALE_TTL_SECONDS", "3600"))
+WEATHER_REFRESH_WAIT_SECONDS = float(os.getenv("WEATHER_REFRESH_WAIT_SECONDS", "1.0"))
+WEATHER_GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "10000"))
+WEATHER_HTTP_TIMEOUT_SECONDS = float(os.getenv("WEATHER_HTTP_TIMEOUT_SECONDS", "10"))
+WEATHER_MAX_CONNECTIONS = int(os.getenv("WEATHER_MAX_CONNECTIONS", "20"))
 logger = logging.getLogger(__name__) # Added logger
 
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_cell(latitude: float, longitude: float, precision: int = WEATHER_GEOHASH_PRECISION) -> Tuple[str, float, float]:
+    """(geohash, centre latitude, centre longitude) of the cell containing the point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars), (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+
+class WeatherClient:
+    """Pooled, geohash-cached OpenWeatherMap client with request coalescing."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = OPENWEATHERMAP_API_KEY,
+        api_url: str = WEATHER_API_URL,
+        ttl_seconds: float = WEATHER_CACHE_TTL_SECONDS,
+        stale_ttl_seconds: float = WEATHER_STALE_TTL_SECONDS,
+        refresh_wait_seconds: float = WEATHER_REFRESH_WAIT_SECONDS,
+        precision: int = WEATHER_GEOHASH_PRECISION,
+        max_entries: int = WEATHER_CACHE_MAX_ENTRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.ttl_seconds = ttl_seconds
+        self.stale_ttl_seconds = max(ttl_seconds, stale_ttl_seconds)
+        self.refresh_wait_seconds = refresh_wait_seconds
+        self.precision = precision
+        self.max_entries = max(1, max_entries)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_served = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+
+    def start(self):
+        """Creates the pooled HTTP client (idempotent); called by the app lifespan."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=WEATHER_HTTP_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=WEATHER_MAX_CONNECTIONS, max_keepalive_connections=WEATHER_MAX_CONNECTIONS),
+                transport=self._transport,
+            )
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get(self, latitude: float, longitude: float) -> Optional[Dict]:
+        cell, center_lat, center_lon = geohash_cell(latitude, longitude, self.precision)
+        entry = self._cache.get(cell)
+        age = time.monotonic() - entry[0] if entry is not None else None
+        if age is not None and age < self.ttl_seconds:
+            self.hits += 1
+            self._cache.move_to_end(cell)
+            return entry[1]
+
+        task = self._inflight.get(cell)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.create_task(self._refresh(cell, center_lat, center_lon))
+            self._inflight[cell] = task
+        # shield: a caller giving up (or being cancelled) must not cancel the shared refresh
+        if age is None or age >= self.stale_ttl_seconds:
+            self.misses += 1
+            return await asyncio.shield(task)
+
+        try:
+            weather = await asyncio.wait_for(asyncio.shield(task), timeout=self.refresh_wait_seconds)
+        except asyncio.TimeoutError:
+            weather = None
+        if weather is None:
+            self.stale_served += 1
+            return entry[1]
+        self.hits += 1
+        return weather
+
+    async def _refresh(self, cell: str, latitude: float, longitude: float) -> Optional[Dict]:
+        try:
+            weather = await self._fetch(latitude, longitude)
+            if weather is not None:
+                self._cache[cell] = (time.monotonic(), weather)
+                self._cache.move_to_end(cell)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            return weather
+        finally:
+            self._inflight.pop(cell, None)
+
+    async def _fetch(self, latitude: float, longitude: float) -> Optional[Dict]:
+        self.start()
+        self.upstream_calls += 1
+        params = {
+            "lat": latitude,
+            "lon": longitude,
+            "appid": self.api_key,
+            "units": "metric"
+        }
+        try:
+            response = await self._client.get(self.api_url, params=params)
+            response.raise_for_status()  # Raises an HTTPStatusError for bad responses (4xx or 5xx)
+            data = response.json()
+
+            return {
+                "temperature_celsius": data.get("main", {}).get("temp"),
+                "condition": data.get("weather", [{}])[0].get("main") # e.g., "Clear", "Rain"
+            }
+        except httpx.RequestError as e:
+            logger.error(f"An error occurred while requesting weather data: {e}")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Weather API returned an error: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred: {e}")
+        self.upstream_errors += 1
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_served": self.stale_served,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "upstream_errors": self.upstream_errors,
+        }
+
+
+# Global client instance
+weather_client = WeatherClient()
+
+def get_weather_client() -> WeatherClient:
+    """Get the global weather client instance"""
+    return weather_client
+
+
 async def get_weather_data(latitude: float, longitude: float) -> Optional[Dict]:
     """
-    Fetches weather data from OpenWeatherMap API or returns a mock response.
+    Fetches weather data from OpenWeatherMap API (cached per area) or returns a mock response.
     """
-    if not OPENWEATHERMAP_API_KEY:
+    if not get_weather_client().api_key:
         # Mock response if API key is not available
         logger.warning("OPENWEATHERMAP_API_KEY not found. Using mocked weather data.")
         if latitude == 10.0 and longitude == 10.0: # Cold weather mock
@@ -23,31 +208,7 @@ async def get_weather_data(latitude: float, longitude: float) -> Optional[Dict]:
         else: # Generic mock for any other coordinates
             return {"temperature_celsius": 22.0, "condition": "Clear"}
 
-    params = {
-        "lat": latitude,
-        "lon": longitude,
-        "appid": OPENWEATHERMAP_API_KEY,
-        "units": "metric"
-    }
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(WEATHER_API_URL, params=params)
-            response.raise_for_status()  # Raises an HTTPStatusError for bad responses (4xx or 5xx)
-            data = response.json()
-
-            return {
-                "temperature_celsius": data.get("main", {}).get("temp"),
-                "condition": data.get("weather", [{}])[0].get("main") # e.g., "Clear", "Rain"
-            }
-    except httpx.RequestError as e:
-        logger.error(f"An error occurred while requesting weather data: {e}")
-        return None
-    except httpx.HTTPStatusError as e:
-        logger.error(f"Weather API returned an error: {e.response.status_code} - {e.response.text}")
-        return None
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
-        return None
+    return await get_weather_client().get(latitude, longitude)
 
 # Example usage (optional, for direct testing of this file)
 # if __name__ == "__main__":
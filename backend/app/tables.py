@@ -1,6 +1,8 @@
 from pydantic import BaseModel, model_validator
 from datetime import datetime, date
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
+
+from .responses import EmbeddingVector
 
 # Forward declaration for Outfit used in Occasion
 class Outfit(BaseModel):
@@ -44,7 +46,8 @@ class UserLogin(BaseModel):
     emailOrUsername: str
     password: str
 
-class WardrobeItem(BaseModel):
+class WardrobeItemSummary(BaseModel):
+    """Wardrobe item without the heavy AI fields (the `view=summary` projection)"""
     id: int
     user_id: int
     name: str
@@ -61,8 +64,32 @@ class WardrobeItem(BaseModel):
     date_added: datetime
     last_worn: Optional[datetime] = None
     updated_at: Optional[datetime] = None
-    ai_embedding: Optional[List[float]] = None
     ai_dominant_colors: Optional[List[str]] = None
+    ai_status: Optional[str] = None # pending, processing, completed, failed
+
+    class Config:
+        from_attributes = True
+
+class WardrobeItem(WardrobeItemSummary):
+    ai_embedding: Optional[EmbeddingVector] = None # Kept as the NumPy array the ORM column loads
+
+    class Config:
+        from_attributes = True
+
+class SimilarItem(BaseModel):
+    item: Union[WardrobeItem, WardrobeItemSummary]
+    similarity: float # Cosine similarity of the item embeddings, -1 to 1
+
+class EnrichmentJob(BaseModel):
+    id: int
+    item_id: int
+    status: str # pending, running, completed, failed, cancelled
+    attempts: int = 0
+    not_before: Optional[datetime] = None # Next retry, after a failed attempt
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -198,16 +225,23 @@ class WardrobeStats(BaseModel):
     total_outfits: int
     items_by_category: Dict[str, int]
     items_by_season: Dict[str, int]
-    most_worn_items: List[WardrobeItem]
-    least_worn_items: List[WardrobeItem]
+    most_worn_items: List[Union[WardrobeItem, WardrobeItemSummary]]
+    least_worn_items: List[Union[WardrobeItem, WardrobeItemSummary]]
     favorite_items_count: int
 
     class Config:
         from_attributes = True
 
 class ItemWearFrequency(BaseModel):
-    item: WardrobeItem
+    # One compact row per item: just what a wear ranking displays
+    item_id: int
+    name: str
+    category: str
+    image_url: Optional[str] = None
+    last_worn: Optional[datetime] = None
     wear_count: int
+    rank: int # 1 for the most worn; items with equal wear counts share a rank
+    wear_share: float # Percentage of all the user's recorded wears
 
     class Config:
         from_attributes = True
@@ -242,6 +276,7 @@ class OutfitAnalysisResponse(BaseModel):
     recommendations: List[str]
     colorPalette: Optional[List[ColorPaletteItem]] = None
     styleInsights: Optional[List[StyleInsightItem]] = None
+    degradedStages: Optional[List[str]] = None # Stages that timed out or failed; their fields hold placeholders
 
     class Config:
         from_attributes = True
@@ -424,6 +459,8 @@ class Feedback(FeedbackBase): # Actual definition of Feedback schema
 User.model_rebuild()
 Token.model_rebuild()
 WardrobeItem.model_rebuild()
+EnrichmentJob.model_rebuild()
+SimilarItem.model_rebuild()
 Outfit.model_rebuild()
 WeeklyPlan.model_rebuild()
 Occasion.model_rebuild()
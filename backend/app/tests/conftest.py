@@ -0,0 +1,77 @@
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base, async_database_url, get_async_db
+
+REGISTRATION = {"username": "u", "email": "u@example.com", "password": "pw"}
+
+
+@dataclass
+class Api:
+    client: TestClient
+    engine: Engine # Sync engine on the same database, for seeding and checking rows
+    Session: sessionmaker
+    statements: Optional[List[str]] # SQL run by the app, when recorded
+
+
+@pytest.fixture
+def make_api(tmp_path):
+    """
+    Factory for a test app serving router modules under /api from a fresh SQLite file,
+    through async sessions configured like the app's own:
+
+        make_api(routers, register=True, record_statements=False, overrides=None)
+
+    With register, user "u" is registered and the client sends its token. With
+    record_statements, the statements the app runs are appended to `statements`.
+    The clients are closed and the engines disposed when the test ends.
+    """
+    stack = ExitStack()
+
+    def make(
+        routers: Sequence[Any],
+        register: bool = True,
+        record_statements: bool = False,
+        overrides: Optional[Dict[Callable, Callable]] = None
+    ) -> Api:
+        url = f"sqlite:///{tmp_path / 'wardrobe.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        stack.callback(engine.dispose)
+
+        app = FastAPI()
+        for module in routers:
+            app.include_router(module.router, prefix="/api")
+        async_engine = create_async_engine(async_database_url(url))
+        AsyncSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+        async def override_get_db():
+            async with AsyncSession() as session:
+                yield session
+
+        app.dependency_overrides[get_async_db] = override_get_db
+        app.dependency_overrides.update(overrides or {})
+
+        statements = None
+        if record_statements:
+            statements = []
+            event.listen(async_engine.sync_engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+        client = stack.enter_context(TestClient(app))
+        stack.callback(client.portal.call, async_engine.dispose) # On the client's event loop, before it closes
+        if register:
+            token = client.post("/api/register", json=REGISTRATION).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+        return Api(client, engine, sessionmaker(bind=engine), statements)
+
+    with stack:
+        yield make
@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+from backend.app.services.analysis_cache import AnalysisCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(cache_dir=str(tmp_path), max_bytes=10 * 1024 * 1024, max_entries=100, enabled=True, fingerprint="test-v1")
+
+
+def test_round_trip_and_merge(cache):
+    key = cache.key_for(b"image-bytes")
+    assert cache.get(key) is None
+
+    cache.put(key, embedding=[0.5, 0.25, 1.0], palette=[["#ff0000", 100.0]])
+    cache.put(key, analysis={"style": "Modern Minimalist"}) # Merged into the same entry
+
+    entry = cache.get(key)
+    assert entry["embedding"] == [0.5, 0.25, 1.0]
+    assert entry["palette"] == [["#ff0000", 100.0]]
+    assert entry["analysis"] == {"style": "Modern Minimalist"}
+    assert cache.get_stats()["entries"] == 1
+
+
+def test_key_depends_on_content_and_model_versions(tmp_path):
+    v1 = AnalysisCache(cache_dir=str(tmp_path), fingerprint="mobilenet_v2:1.0")
+    v2 = AnalysisCache(cache_dir=str(tmp_path), fingerprint="mobilenet_v2:1.1")
+
+    assert v1.key_for(b"a") == v1.key_for(b"a")
+    assert v1.key_for(b"a") != v1.key_for(b"b")
+    assert v1.key_for(b"a") != v2.key_for(b"a") # A model upgrade invalidates old results
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = AnalysisCache(cache_dir=str(tmp_path), max_entries=3, enabled=True, fingerprint="test-v1")
+    keys = [cache.key_for(bytes([i])) for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, palette=[["#000000", 100.0]])
+        stamp = time.time() - 100 + age
+        os.utime(cache._path(key), (stamp, stamp))
+
+    cache.get(keys[0]) # Touch the oldest entry so it becomes the most recently used
+    cache.put(cache.key_for(b"new"), palette=[["#ffffff", 100.0]])
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get_stats()["entries"] <= 3
+
+
+def test_corrupt_entries_are_treated_as_misses(cache):
+    key = cache.key_for(b"image-bytes")
+    cache.put(key, palette=[["#ff0000", 100.0]])
+    cache._path(key).write_text("{not json")
+
+    assert cache.get(key) is None
+    assert not cache._path(key).exists()
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    cache = AnalysisCache(cache_dir=str(tmp_path), enabled=False, fingerprint="test-v1")
+    key = cache.key_for(b"image-bytes")
+    cache.put(key, palette=[["#ff0000", 100.0]])
+    assert cache.get(key) is None
+    assert list(tmp_path.iterdir()) == []
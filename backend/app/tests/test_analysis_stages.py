@@ -0,0 +1,70 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+from fastapi import UploadFile
+from PIL import Image
+
+from backend.app.services import ai_services
+from backend.app.services.analysis_cache import AnalysisCache
+
+
+def _upload() -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 30, 40)).save(buffer, "PNG")
+    buffer.seek(0)
+    return UploadFile(buffer, filename="outfit.png")
+
+
+@pytest.fixture(autouse=True)
+def no_cache(tmp_path, monkeypatch):
+    cache = AnalysisCache(cache_dir=str(tmp_path), enabled=False, fingerprint="test")
+    monkeypatch.setattr(ai_services, "get_analysis_cache", lambda: cache)
+
+
+def _slow(result, seconds):
+    def stage(image):
+        time.sleep(seconds)
+        return result
+    return stage
+
+
+def _meeting(result, barrier):
+    def stage(image):
+        barrier.wait() # Only passes once all three stages are running at the same time
+        return result
+    return stage
+
+
+def test_stages_run_concurrently(monkeypatch):
+    barrier = threading.Barrier(3, timeout=5)
+    monkeypatch.setattr(ai_services, "get_image_embedding", _meeting([0.1, 0.2], barrier))
+    monkeypatch.setattr(ai_services, "lw_detect_style", _meeting("Modern Minimalist", barrier))
+    monkeypatch.setattr(ai_services, "lw_identify_items", _meeting([{"label": "shirt", "confidence": 0.9}], barrier))
+
+    response = asyncio.run(ai_services.analyze_outfit_image_service(_upload(), None, None))
+
+    # Run one after another, the first stage would break the barrier and degrade
+    assert not barrier.broken
+    assert response.style == "Modern Minimalist"
+    assert response.identifiedItems == ["shirt"]
+    assert response.dominantColors == ["#c81e28"]
+    assert response.degradedStages is None
+
+
+def test_slow_or_failing_stage_degrades_instead_of_failing(monkeypatch):
+    def broken(image):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(ai_services.ANALYSIS_STAGE_TIMEOUTS, "items", 0.1)
+    monkeypatch.setattr(ai_services, "get_image_embedding", _slow([0.1, 0.2], 0))
+    monkeypatch.setattr(ai_services, "lw_detect_style", broken)
+    monkeypatch.setattr(ai_services, "lw_identify_items", _slow([{"label": "shirt", "confidence": 0.9}], 1.0))
+
+    response = asyncio.run(ai_services.analyze_outfit_image_service(_upload(), None, None))
+
+    assert sorted(response.degradedStages) == ["items", "style"]
+    assert response.identifiedItems[0].startswith("Error")
+    assert response.dominantColors == ["#c81e28"] # Unaffected stages still report results
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from backend.app.db.database import async_database_url
+from backend.app.routers import auth, outfits, user_profile, wardrobe, weekly_plans
+
+
+@pytest.fixture
+def client(make_api):
+    return make_api([auth, wardrobe, outfits, weekly_plans, user_profile]).client
+
+
+def test_async_database_url():
+    assert async_database_url("sqlite:///wardrobe.db") == "sqlite+aiosqlite:///wardrobe.db"
+    assert async_database_url("mysql+pymysql://u:p@host:3306/db") == "mysql+aiomysql://u:p@host:3306/db"
+    with pytest.raises(ValueError):
+        async_database_url("postgresql://u:p@host/db")
+
+
+def test_crud_round_trip_through_async_sessions(client):
+    assert client.post("/api/login", json={"emailOrUsername": "u@example.com", "password": "pw"}).status_code == 200
+    assert client.get("/api/users/me").json()["username"] == "u"
+
+    item_ids = [client.post("/api/wardrobe/items/", params={"name": f"item {i}", "category": "Tops"}).json()["id"] for i in range(3)]
+    assert client.put(f"/api/wardrobe/items/{item_ids[0]}", params={"name": "renamed", "category": "Tops", "favorite": False}).json()["name"] == "renamed"
+
+    outfit = client.post("/api/outfits/", json={"name": "o", "item_ids": item_ids[:2]}).json()
+    assert outfit["item_ids"] == item_ids[:2] and outfit["feedbacks"] == []
+    assert client.put(f"/api/outfits/{outfit['id']}", json={"item_ids": item_ids[1:]}).json()["item_ids"] == item_ids[1:]
+
+    plan = client.post("/api/weekly-plans/", json={
+        "name": "week", "start_date": "2024-01-01", "end_date": "2024-01-07", "daily_outfits": {"monday": outfit["id"]}
+    }).json()
+    assert plan["daily_outfits"] == {"monday": outfit["id"]}
+    plan = client.put(f"/api/weekly-plans/{plan['id']}", json={"daily_outfits": {"friday": outfit["id"]}}).json()
+    assert plan["daily_outfits"] == {"friday": outfit["id"]}
+
+    assert client.put("/api/profile/me", json={"preferred_styles": ["casual"]}).status_code == 200
+    assert client.get("/api/profile/me").json()["preferred_styles"] == ["casual"]
+
+    assert client.delete(f"/api/wardrobe/items/{item_ids[2]}").status_code == 204
+    assert client.get(f"/api/outfits/{outfit['id']}").json()["item_ids"] == [item_ids[1]]
+    assert client.delete(f"/api/weekly-plans/{plan['id']}").status_code == 204
+    assert client.delete(f"/api/outfits/{outfit['id']}").status_code == 204
+    assert [item["id"] for item in client.get("/api/wardrobe/items/").json()] == item_ids[:2]
+
+
+def test_concurrent_requests_share_the_event_loop(client):
+    async def hit_many():
+        import httpx
+        transport = httpx.ASGITransport(app=client.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=client.headers) as http:
+            responses = await asyncio.gather(*(
+                http.post("/api/wardrobe/items/", params={"name": f"item {i}", "category": "Tops"}) for i in range(10)
+            ))
+        return [response.status_code for response in responses]
+
+    assert asyncio.run(hit_many()) == [201] * 10
+    assert len(client.get("/api/wardrobe/items/").json()) == 10
@@ -0,0 +1,60 @@
+import pytest
+
+from backend.app import model as models, security
+from backend.app.routers import auth
+from backend.app.services.user_cache import UserCache, get_user_cache
+
+
+@pytest.fixture
+def app_and_statements(make_api):
+    get_user_cache().clear()
+    api = make_api([auth], register=False, record_statements=True)
+    yield api.client, api.statements, api.Session
+    get_user_cache().clear()
+
+
+def _me(client, token):
+    return client.get("/api/users/me", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_tokens_with_claims_authenticate_without_queries(app_and_statements):
+    client, statements, Session = app_and_statements
+    token = client.post("/api/register", json={"username": "u", "email": "u@example.com", "password": "pw"}).json()["access_token"]
+
+    statements.clear()
+    assert _me(client, token).json()["email"] == "u@example.com"
+    assert statements == []
+
+    # A change to the user makes tokens issued before it fall back to a lookup
+    db = Session()
+    db.query(models.User).filter(models.User.username == "u").one().email = "new@example.com"
+    db.commit()
+    db.close()
+    assert _me(client, token).json()["email"] == "new@example.com"
+    assert len(statements) == 1
+
+
+def test_tokens_without_claims_use_the_user_cache(app_and_statements):
+    client, statements, Session = app_and_statements
+    client.post("/api/register", json={"username": "u", "email": "u@example.com", "password": "pw"})
+    token = security.create_access_token({"sub": "u"})
+
+    statements.clear()
+    assert _me(client, token).status_code == 200 and len(statements) == 1
+    assert _me(client, token).status_code == 200 and len(statements) == 1
+    assert get_user_cache().get_stats()["hits"] == 1
+
+    assert _me(client, security.create_access_token({"sub": "nobody"})).status_code == 401
+    assert _me(client, security.create_access_token({"sub": "u", "uid": "not-an-id"})).status_code == 200
+
+
+def test_user_cache_expires_entries():
+    cache = UserCache(ttl_seconds=0)
+    user = security.schemas.User(id=1, username="u", email="e", created_at="2024-01-01T00:00:00", updated_at="2024-01-01T00:00:00")
+    cache.put(user)
+    assert cache.get("u") is None
+    cache.ttl_seconds = 60
+    cache.put(user)
+    assert cache.get("u") is user
+    cache.invalidate("u")
+    assert cache.get("u") is None and cache.changed_since("u", 0)
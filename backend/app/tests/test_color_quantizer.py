@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.app.services.color_quantizer import extract_palette, quantize_pixels
+
+
+def _hex_to_rgb(hex_color):
+    return np.array([int(hex_color[i:i + 2], 16) for i in (1, 3, 5)])
+
+
+def test_solid_image_is_a_single_color():
+    palette = extract_palette(Image.new("RGB", (64, 64), (200, 30, 40)))
+    assert palette == [("#c81e28", 100.0)]
+
+
+def test_percentages_reflect_pixel_coverage():
+    array = np.zeros((100, 100, 3), dtype=np.uint8)
+    array[:, :75] = (10, 20, 200) # 75% blue
+    array[:, 75:] = (250, 250, 250) # 25% white
+    palette = extract_palette(Image.fromarray(array))
+
+    assert [color for color, _ in palette] == ["#0a14c8", "#fafafa"]
+    assert [pct for _, pct in palette] == [75.0, 25.0]
+
+
+def test_near_identical_shades_merge_into_one_color():
+    rng = np.random.default_rng(0)
+    base = np.array([120, 60, 30])
+    noisy = np.clip(base + rng.normal(0, 6, (5000, 3)), 0, 255).astype(np.uint8) # One fabric with texture
+    accent = np.tile(np.array([20, 200, 90], dtype=np.uint8), (1000, 1))
+    palette = quantize_pixels(np.concatenate([noisy, accent]), num_colors=5)
+
+    # The textured fabric dominates and its mean color is recovered closely
+    assert np.abs(_hex_to_rgb(palette[0][0]) - base).max() <= 3
+    assert palette[0][1] == pytest.approx(83.3, abs=0.2)
+    assert any(np.abs(_hex_to_rgb(color) - [20, 200, 90]).max() <= 1 for color, _ in palette)
+    assert sum(pct for _, pct in palette) == pytest.approx(100.0, abs=0.5)
+
+
+def test_palette_size_is_capped_and_sorted():
+    rng = np.random.default_rng(1)
+    palette = quantize_pixels(rng.integers(0, 256, (20000, 3), dtype=np.uint8), num_colors=5)
+
+    assert len(palette) == 5
+    percentages = [pct for _, pct in palette]
+    assert percentages == sorted(percentages, reverse=True)
+
+
+def test_transparent_and_grayscale_images():
+    rgba = np.zeros((10, 10, 4), dtype=np.uint8)
+    rgba[:5] = (255, 0, 0, 255) # Opaque red top half; bottom half fully transparent
+    assert extract_palette(Image.fromarray(rgba, "RGBA")) == [("#ff0000", 100.0)]
+
+    assert extract_palette(Image.new("L", (10, 10), 128)) == [("#808080", 100.0)]
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base
+from backend.app import model as models
+from backend.app.services.compatibility_table import (
+    CompatibilityTableRegistry, build_compatibility_table, refresh_item_compatibility, refresh_items
+)
+from backend.app.services.outfit_matching_service import OutfitMatchingService, _cached_color_harmony
+
+COLORS = ["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0E68C"]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _wardrobe(db, n_items=8, seed=0):
+    rng = np.random.default_rng(seed)
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    items = [
+        models.WardrobeItem(
+            user_id=user.id, name=f"item {i}", category="Tops",
+            ai_embedding=rng.normal(size=16).astype(np.float32) if i % 4 else None, # Every fourth item is not analyzed
+            ai_dominant_colors=list(rng.choice(COLORS, size=2, replace=False))
+        )
+        for i in range(n_items)
+    ]
+    db.add_all(items)
+    db.commit()
+    return user, items
+
+
+def _expected(items):
+    n = len(items)
+    similarity = np.full((n, n), np.nan)
+    harmony = np.full((n, n), np.nan)
+    for i, a in enumerate(items):
+        for j, b in enumerate(items):
+            if i == j:
+                continue
+            if a.ai_embedding is not None and b.ai_embedding is not None and a.ai_embedding.size == b.ai_embedding.size:
+                similarity[i, j] = np.dot(a.ai_embedding, b.ai_embedding) / (np.linalg.norm(a.ai_embedding) * np.linalg.norm(b.ai_embedding))
+            harmony[i, j] = _cached_color_harmony(frozenset(a.ai_dominant_colors) | frozenset(b.ai_dominant_colors))
+    return similarity, harmony
+
+
+def _assert_table_matches(table, items):
+    similarity, harmony = _expected(items)
+    off_diagonal = ~np.eye(len(items), dtype=bool)
+    assert list(table.item_ids) == [item.id for item in items]
+    np.testing.assert_allclose(table.similarity[off_diagonal], similarity[off_diagonal], atol=1e-5)
+    np.testing.assert_allclose(table.color_harmony[off_diagonal], harmony[off_diagonal], atol=1e-6)
+
+
+def test_missing_rows_are_computed_on_load(session_factory):
+    db = session_factory()
+    user, items = _wardrobe(db)
+    assert db.query(models.ItemCompatibility).count() == 0
+
+    table = build_compatibility_table(db, user.id)
+
+    _assert_table_matches(table, items)
+    assert db.query(models.ItemCompatibility).count() == len(items)
+    db.close()
+
+
+def test_editing_an_item_only_recomputes_its_row(session_factory):
+    db = session_factory()
+    user, items = _wardrobe(db)
+    refresh_items(db, user.id)
+    versions = {row.item_id: row.version for row in db.query(models.ItemCompatibility)}
+
+    edited = items[2]
+    edited.ai_embedding = np.ones(16, dtype=np.float32)
+    edited.ai_dominant_colors = ["#FF0000"]
+    db.commit()
+    refresh_item_compatibility(db, edited)
+
+    rows = {row.item_id: row for row in db.query(models.ItemCompatibility)}
+    assert rows[edited.id].version > versions[edited.id]
+    assert all(rows[item_id].version == version for item_id, version in versions.items() if item_id != edited.id)
+    # Other rows still hold the old pair values; the newer row wins when assembling
+    _assert_table_matches(build_compatibility_table(db, user.id), items)
+    db.close()
+
+
+def test_added_and_deleted_items(session_factory):
+    db = session_factory()
+    user, items = _wardrobe(db)
+    refresh_items(db, user.id)
+
+    added = models.WardrobeItem(user_id=user.id, name="new", category="Shoes", ai_embedding=np.arange(16, dtype=np.float32), ai_dominant_colors=["#0000FF"])
+    db.add(added)
+    db.commit()
+    refresh_item_compatibility(db, added)
+    db.delete(items[1])
+    db.commit()
+
+    remaining = [item for item in items if item.id != items[1].id] + [added]
+    assert db.query(models.ItemCompatibility).count() == len(remaining)
+    _assert_table_matches(build_compatibility_table(db, user.id), remaining)
+    db.close()
+
+
+def test_registry_reuses_table_until_rows_change(session_factory):
+    db = session_factory()
+    user, items = _wardrobe(db)
+    registry = CompatibilityTableRegistry(session_factory=session_factory)
+
+    table = registry.get(user.id)
+    assert registry.get(user.id) is table
+
+    items[0].ai_dominant_colors = ["#FFFFFF"]
+    db.commit()
+    refresh_items(db, user.id, [items[0].id])
+    refreshed = registry.get(user.id)
+    assert refreshed is not table
+    _assert_table_matches(refreshed, items)
+    db.close()
+
+
+def test_matrix_from_table_scores_like_embeddings(session_factory):
+    db = session_factory()
+    user, items = _wardrobe(db, n_items=12, seed=4)
+    table = build_compatibility_table(db, user.id)
+    features = [{"id": item.id, "embedding": item.ai_embedding, "colors": item.ai_dominant_colors} for item in items]
+    candidates = [[0, 1, 2], [1, 2, 3, 5], [4, 8], [5, 6, 7], [9, 10, 11]]
+
+    service = OutfitMatchingService()
+    from_embeddings = service.build_compatibility_matrix(features).score_many(candidates)
+    from_table = service.build_compatibility_matrix(features, table).score_many(candidates)
+    assert from_table == from_embeddings
+    db.close()
+
+
+def test_migration_creates_table_and_reads_fall_back_without_it(tmp_path):
+    from backend.app.db.migrations import run_migrations
+    from backend.app.services.recommendation_services import _compatibility_table, find_ai_matched_outfits_for_occasion
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'wardrobe.db'}")
+    Base.metadata.create_all(engine)
+    models.ItemCompatibility.__table__.drop(engine)
+    db = sessionmaker(bind=engine)()
+    user, items = _wardrobe(db)
+    outfit = models.Outfit(user_id=user.id, name="o", items=items[1:4])
+    db.add(outfit)
+    db.commit()
+
+    # Without the table, reads score from the embeddings instead of failing
+    assert _compatibility_table(db, user.id) is None
+    query = np.ones(16, dtype=np.float32)
+    assert [o.id for o in find_ai_matched_outfits_for_occasion(db, user.id, "party", min_coherence_score=0, occasion_embedding=query)] == [outfit.id]
+
+    assert "0007_item_compatibility" in run_migrations(engine)
+    table = _compatibility_table(db, user.id)
+    _assert_table_matches(table, items)
+    db.close()
@@ -0,0 +1,43 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from backend.app.db.pool import TimedQueuePool, get_pool_stats, instrument_engine
+
+
+def _engine(tmp_path, name, ping_idle_seconds=None, **pool_options):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_logging_name=name, **pool_options
+    )
+    return engine, instrument_engine(engine, name, ping_idle_seconds=ping_idle_seconds)
+
+
+def test_pool_metrics_count_checkouts_and_timeouts(tmp_path):
+    engine, metrics = _engine(tmp_path, "test-timeouts", pool_size=1, max_overflow=1, pool_timeout=0.05)
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    stats = get_pool_stats()["test-timeouts"]
+    assert stats["checkouts"] == 2 and stats["timeouts"] == 1
+    assert stats["checked_out"] == 2 and stats["overflow"] == 1 and stats["max_overflow_used"] == 1
+    assert stats["wait_ms_max"] >= stats["wait_ms_avg"] >= 0
+
+    first.close()
+    second.close()
+    assert metrics.snapshot()["checked_out"] == 0 and metrics.checkins == 2
+    engine.dispose()
+
+
+def test_idle_connections_are_checked_and_dead_ones_replaced(tmp_path):
+    engine, metrics = _engine(tmp_path, "test-liveness", ping_idle_seconds=0, pool_size=1, max_overflow=0)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        pooled = connection.connection.dbapi_connection
+    pooled.close() # Dropped by the server while idle in the pool
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+
+    assert metrics.idle_pings == 1 and metrics.failed_pings == 1
+    assert metrics.connects == 2 and metrics.invalidations == 1
+    engine.dispose()
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, insert, select, text
+
+from backend.app.db.types import (
+    EMBEDDING_HEADER_SIZE,
+    EmbeddingBlob,
+    decode_embedding,
+    encode_embedding,
+)
+from backend.app.db.migrations import _0002_binary_embeddings
+
+
+def test_float32_round_trip_is_compact_and_zero_copy():
+    values = np.random.rand(1280).astype(np.float32)
+    blob = encode_embedding(values, dtype="float32")
+
+    assert len(blob) == EMBEDDING_HEADER_SIZE + 1280 * 4
+    decoded = decode_embedding(blob)
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, values)
+    assert not decoded.flags.owndata # A view over the blob, not a copy
+
+
+def test_float16_storage_halves_size():
+    values = np.linspace(-1, 1, 64)
+    blob = encode_embedding(values, dtype="float16")
+
+    assert len(blob) == EMBEDDING_HEADER_SIZE + 64 * 2
+    assert np.allclose(decode_embedding(blob), values, atol=1e-3)
+
+
+@pytest.mark.parametrize("legacy", ["[0.5, 1.0, 2.0]", b"[0.5, 1.0, 2.0]", [0.5, 1.0, 2.0]])
+def test_legacy_json_values_are_still_readable(legacy):
+    assert decode_embedding(legacy).tolist() == [0.5, 1.0, 2.0]
+
+
+@pytest.mark.parametrize("legacy", ["null", "", '"Error: model not loaded"'])
+def test_legacy_non_vectors_decode_to_none(legacy):
+    assert decode_embedding(legacy) is None
+
+
+def test_column_type_round_trip():
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    items = Table("items", metadata, Column("id", Integer, primary_key=True), Column("embedding", EmbeddingBlob()))
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(insert(items), [{"id": 1, "embedding": [0.25, 0.5]}, {"id": 2, "embedding": None}])
+        rows = dict(conn.execute(select(items.c.id, items.c.embedding)).all())
+
+    assert rows[1].tolist() == [0.25, 0.5]
+    assert rows[2] is None
+
+
+def test_migration_converts_json_rows_in_batches():
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    Table("wardrobe_items", metadata, Column("id", Integer, primary_key=True), Column("ai_embedding", Text))
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        for item_id in range(1, 8):
+            conn.execute(text("INSERT INTO wardrobe_items (id, ai_embedding) VALUES (:id, :emb)"),
+                         {"id": item_id, "emb": json.dumps([float(item_id)] * 3)})
+        conn.execute(text("INSERT INTO wardrobe_items (id, ai_embedding) VALUES (8, 'null')"))
+        _0002_binary_embeddings(conn, batch_size=3)
+        # Running again leaves already-converted rows alone
+        _0002_binary_embeddings(conn, batch_size=3)
+        rows = dict(conn.execute(text("SELECT id, ai_embedding FROM wardrobe_items")).all())
+
+    for item_id in range(1, 8):
+        assert isinstance(rows[item_id], bytes)
+        assert decode_embedding(rows[item_id]).tolist() == [float(item_id)] * 3
+    assert rows[8] is None
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import model as models
+from backend.app.db.database import Base
+from backend.app.routers import auth, wardrobe
+from backend.app.services.enrichment_queue import (
+    AI_STATUS_COMPLETED, AI_STATUS_FAILED, AI_STATUS_PENDING, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED,
+    JOB_PENDING, JOB_RUNNING, EnrichmentQueue, cancel_enrichment, enqueue_enrichment
+)
+
+EMBEDDING = np.arange(8, dtype=np.float32)
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wardrobe.db'}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _queued_item(Session, image_url="/static/wardrobe_images/a.jpg"):
+    with Session() as db:
+        if db.get(models.User, 1) is None:
+            db.add(models.User(id=1, username="u", email="u@example.com", hashed_password="x"))
+        item = models.WardrobeItem(user_id=1, name="shirt", category="Tops", image_url=image_url)
+        db.add(item)
+        db.flush()
+        job = enqueue_enrichment(db, item)
+        db.commit()
+        return item.id, job.id
+
+
+def _job(Session, job_id):
+    with Session() as db:
+        job = db.get(models.EnrichmentJob, job_id)
+        return job.status, job.attempts, job.item.ai_status
+
+
+def test_only_one_worker_claims_a_job(session_factory):
+    item_id, job_id = _queued_item(session_factory)
+    other = EnrichmentQueue(session_factory=session_factory)
+    claims = []
+
+    def processor(path):
+        # A second worker (e.g. another API process) tries the job while it runs
+        claims.append(other.process_job(job_id))
+        return EMBEDDING, ["#FFFFFF"]
+
+    queue = EnrichmentQueue(session_factory=session_factory, processor=processor)
+    assert queue.process_job(job_id) == JOB_COMPLETED
+    assert claims == [None]
+    assert other.process_job(job_id) is None
+    assert _job(session_factory, job_id) == (JOB_COMPLETED, 1, AI_STATUS_COMPLETED)
+    with session_factory() as db:
+        item = db.get(models.WardrobeItem, item_id)
+        np.testing.assert_array_equal(item.ai_embedding, EMBEDDING)
+        assert item.ai_dominant_colors == ["#FFFFFF"]
+
+
+def test_failing_analyzer_is_retried_then_fails(session_factory):
+    _, job_id = _queued_item(session_factory)
+
+    def processor(path):
+        raise RuntimeError("model unavailable")
+
+    queue = EnrichmentQueue(session_factory=session_factory, max_attempts=2, retry_backoff=60, processor=processor)
+    assert queue.process_job(job_id) == JOB_PENDING
+    assert _job(session_factory, job_id) == (JOB_PENDING, 1, AI_STATUS_PENDING)
+
+    # Not retried (or even dispatched) until the backoff has passed
+    assert queue.process_job(job_id) is None
+    with session_factory() as db:
+        job = db.get(models.EnrichmentJob, job_id)
+        assert timedelta(seconds=55) < job.not_before - datetime.utcnow() <= timedelta(seconds=60)
+        job.not_before = datetime.utcnow() - timedelta(seconds=1)
+        db.commit()
+    assert queue.process_job(job_id) == JOB_FAILED
+    assert _job(session_factory, job_id) == (JOB_FAILED, 2, AI_STATUS_FAILED)
+    assert queue.process_job(job_id) is None
+    with session_factory() as db:
+        assert db.get(models.EnrichmentJob, job_id).error == "model unavailable"
+
+
+def test_replaced_or_removed_images_cancel_jobs(session_factory):
+    item_id, first_job = _queued_item(session_factory)
+    with session_factory() as db:
+        item = db.get(models.WardrobeItem, item_id)
+        item.image_url = "/static/wardrobe_images/b.jpg"
+        job = enqueue_enrichment(db, item)
+        db.commit()
+        second_job = job.id
+    assert _job(session_factory, first_job)[0] == JOB_CANCELLED
+
+    # The image is replaced again while the analyzer runs: the result is discarded
+    def processor(path):
+        with session_factory() as db:
+            db.get(models.WardrobeItem, item_id).image_url = "/static/wardrobe_images/c.jpg"
+            db.commit()
+        return EMBEDDING, ["#000000"]
+
+    queue = EnrichmentQueue(session_factory=session_factory, processor=processor)
+    assert queue.process_job(first_job) is None
+    assert queue.process_job(second_job) == JOB_CANCELLED
+    with session_factory() as db:
+        assert db.get(models.WardrobeItem, item_id).ai_embedding is None
+
+    _, third_job = _queued_item(session_factory)
+    with session_factory() as db:
+        cancel_enrichment(db, db.get(models.EnrichmentJob, third_job).item_id)
+        db.commit()
+    assert _job(session_factory, third_job)[0] == JOB_CANCELLED
+
+
+def test_stale_running_jobs_are_requeued_on_start(session_factory):
+    _, stale_job = _queued_item(session_factory)
+    _, fresh_job = _queued_item(session_factory)
+    with session_factory() as db:
+        for job_id, started_at in ((stale_job, datetime.utcnow() - timedelta(hours=1)), (fresh_job, datetime.utcnow())):
+            job = db.get(models.EnrichmentJob, job_id)
+            job.status, job.started_at, job.attempts = JOB_RUNNING, started_at, 1
+        db.commit()
+
+    queue = EnrichmentQueue(session_factory=session_factory, processor=lambda path: (EMBEDDING, []))
+    assert queue.requeue_stale_jobs() == 1
+    assert _job(session_factory, fresh_job)[0] == JOB_RUNNING # Possibly still running in another process
+    assert queue.process_job(stale_job) == JOB_COMPLETED
+    assert _job(session_factory, stale_job)[:2] == (JOB_COMPLETED, 2)
+
+
+def test_status_endpoint_reports_the_latest_job(make_api, tmp_path, monkeypatch):
+    monkeypatch.setattr(wardrobe, "WARDROBE_IMAGES_DIR", str(tmp_path))
+    api = make_api([auth, wardrobe])
+    client, Session = api.client, api.Session
+
+    no_image = client.post("/api/wardrobe/items/", params={"name": "belt", "category": "Accessories"}).json()["id"]
+    assert client.get(f"/api/wardrobe/items/{no_image}/enrichment").status_code == 404
+
+    image = ("a.png", b"\x89PNG first", "image/png")
+    item = client.post("/api/wardrobe/items/", params={"name": "shirt", "category": "Tops"}, files={"image": image}).json()
+    assert item["ai_status"] == AI_STATUS_PENDING
+    first = client.get(f"/api/wardrobe/items/{item['id']}/enrichment").json()
+    assert first["status"] == JOB_PENDING and first["attempts"] == 0
+
+    image = ("b.png", b"\x89PNG second", "image/png")
+    client.put(f"/api/wardrobe/items/{item['id']}", params={"name": "shirt", "category": "Tops", "favorite": False}, files={"image": image})
+    latest = client.get(f"/api/wardrobe/items/{item['id']}/enrichment").json()
+    assert latest["id"] > first["id"] and latest["status"] == JOB_PENDING
+    with Session() as db:
+        statuses = db.scalars(select(models.EnrichmentJob.status).order_by(models.EnrichmentJob.id)).all()
+    assert statuses == [JOB_CANCELLED, JOB_PENDING]
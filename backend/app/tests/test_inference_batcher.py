@@ -0,0 +1,79 @@
+import threading
+import numpy as np
+import pytest
+
+from backend.app.services.inference_batcher import MicroBatcher
+
+
+def test_concurrent_requests_are_coalesced_into_one_batch():
+    batch_shapes = []
+    release = threading.Event()
+
+    def batch_fn(batch):
+        release.wait(timeout=5) # Hold the first batch so the rest queue up behind it
+        batch_shapes.append(batch.shape)
+        return batch.reshape(batch.shape[0], -1).sum(axis=1)
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=50, name="test")
+    try:
+        futures = [batcher.submit(np.full((2, 2, 3), i, dtype=np.float32)) for i in range(8)]
+        release.set()
+        results = [f.result(timeout=5) for f in futures]
+    finally:
+        batcher.stop()
+
+    # Each result is routed back to the caller that submitted the matching input
+    assert results == [pytest.approx(12.0 * i) for i in range(8)]
+    assert sum(shape[0] for shape in batch_shapes) == 8
+    assert len(batch_shapes) < 8
+    assert all(shape[1:] == (2, 2, 3) for shape in batch_shapes)
+
+
+def test_batch_size_is_capped():
+    sizes = []
+
+    def batch_fn(batch):
+        sizes.append(len(batch))
+        return batch
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=3, max_wait_ms=50, name="test")
+    try:
+        futures = [batcher.submit(np.zeros(4)) for _ in range(7)]
+        for f in futures:
+            f.result(timeout=5)
+    finally:
+        batcher.stop()
+
+    assert max(sizes) <= 3
+    assert sum(sizes) == 7
+
+
+def test_errors_propagate_to_every_caller_in_the_batch():
+    def batch_fn(batch):
+        raise RuntimeError("model exploded")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=20, name="test")
+    try:
+        futures = [batcher.submit(np.zeros(3)) for _ in range(3)]
+        for f in futures:
+            with pytest.raises(RuntimeError, match="model exploded"):
+                f.result(timeout=5)
+        assert batcher.get_metrics()["failed_batches"] >= 1
+    finally:
+        batcher.stop()
+
+
+def test_metrics_report_fill_ratio_and_queue_delay():
+    batcher = MicroBatcher(lambda batch: batch, max_batch_size=4, max_wait_ms=1, name="test")
+    try:
+        for _ in range(3):
+            batcher.infer(np.ones(2), timeout=5)
+        metrics = batcher.get_metrics()
+    finally:
+        batcher.stop()
+
+    assert metrics["items"] == 3
+    assert metrics["batches"] >= 1
+    assert 0.0 < metrics["avg_batch_fill_ratio"] <= 1.0
+    assert metrics["avg_queue_delay_ms"] >= 0.0
+    assert metrics["max_queue_delay_ms"] >= metrics["avg_queue_delay_ms"]
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from backend.app.services import inference_server
+from backend.app.services.inference_server import InferenceClient, InferenceError, InferenceServer
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setitem(inference_server.OPERATIONS, "double", lambda array: array * 2)
+    socket_path = str(tmp_path / "inference.sock")
+    srv = InferenceServer(socket_path=socket_path, authkey=b"test-key")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100): # Wait for the socket to appear
+        if (tmp_path / "inference.sock").exists():
+            break
+        time.sleep(0.01)
+    yield socket_path
+    srv.stop()
+
+
+def test_round_trip_and_connection_reuse(server):
+    client = InferenceClient(socket_path=server, authkey=b"test-key", timeout=5)
+    try:
+        assert client.call("ping") == "pong"
+        result = client.call("double", np.arange(4, dtype=np.float32))
+        assert result.tolist() == [0.0, 2.0, 4.0, 6.0]
+        assert client._idle.qsize() == 1 # The connection went back to the pool
+    finally:
+        client.close()
+
+
+def test_concurrent_callers_get_their_own_results(server):
+    client = InferenceClient(socket_path=server, authkey=b"test-key", timeout=5)
+    results = {}
+
+    def worker(i):
+        results[i] = client.call("double", np.full(3, i))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    client.close()
+
+    assert {i: r.tolist() for i, r in results.items()} == {i: [2 * i] * 3 for i in range(8)}
+
+
+def test_server_errors_are_raised_on_the_client(server):
+    client = InferenceClient(socket_path=server, authkey=b"test-key", timeout=5)
+    try:
+        with pytest.raises(InferenceError, match="Unknown inference operation"):
+            client.call("does_not_exist")
+        assert client.call("ping") == "pong" # The connection is still usable
+    finally:
+        client.close()
+
+
+def test_unreachable_server_raises_inference_error(tmp_path):
+    client = InferenceClient(socket_path=str(tmp_path / "missing.sock"), authkey=b"test-key", timeout=1)
+    with pytest.raises(InferenceError, match="unavailable"):
+        client.call("ping")
+
+
+def test_socket_directory_is_private(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o755)
+    shared.chmod(0o755)
+    srv = InferenceServer(socket_path=str(shared / "inference.sock"), authkey=b"test-key")
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if (shared / "inference.sock").exists():
+            break
+        time.sleep(0.01)
+    try:
+        assert (shared / "inference.sock").exists()
+        assert shared.stat().st_mode & 0o777 == 0o700
+    finally:
+        srv.stop()
+
+    nested = tmp_path / "run" / "inference"
+    InferenceServer(socket_path=str(nested / "inference.sock"), authkey=b"test-key")._make_socket_dir_private()
+    assert nested.stat().st_mode & 0o777 == 0o700
+
+
+def test_remote_mode_requires_an_explicit_authkey(tmp_path, monkeypatch):
+    monkeypatch.setattr(inference_server, "AI_INFERENCE_MODE", "remote")
+    monkeypatch.setattr(inference_server, "AI_INFERENCE_AUTHKEY", b"")
+    with pytest.raises(RuntimeError, match="AI_INFERENCE_AUTHKEY"):
+        inference_server.check_inference_config()
+    with pytest.raises(RuntimeError, match="authkey"):
+        InferenceServer(socket_path=str(tmp_path / "inference.sock"), authkey=b"").serve_forever()
+    with pytest.raises(InferenceError, match="AI_INFERENCE_AUTHKEY"):
+        InferenceClient(socket_path=str(tmp_path / "inference.sock"), authkey=b"").call("ping")
+
+    monkeypatch.setattr(inference_server, "AI_INFERENCE_AUTHKEY", b"secret")
+    inference_server.check_inference_config()
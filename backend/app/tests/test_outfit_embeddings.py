@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base
+from backend.app.db.migrations import _0004_outfit_embedding
+from backend.app import model as models
+from backend.app.services.compatibility_table import build_compatibility_table
+from backend.app.services.outfit_embeddings import refresh_outfit_embedding, refresh_outfits_containing
+from backend.app.services.outfit_matching_service import OutfitMatchingService
+from backend.app.services.recommendation_services import find_ai_matched_outfits_for_occasion
+
+COLORS = ["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0E68C", "#C19A6B", "#800020"]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _wardrobe(db, n_items, n_outfits, seed):
+    rng = np.random.default_rng(seed)
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    items = [
+        models.WardrobeItem(
+            user_id=user.id, name=f"item {i}", category="Tops",
+            ai_embedding=rng.normal(size=8).astype(np.float32) if i % 6 else None,
+            ai_dominant_colors=list(rng.choice(COLORS, size=2, replace=False))
+        )
+        for i in range(n_items)
+    ]
+    db.add_all(items)
+    db.commit()
+    outfits = []
+    for o in range(n_outfits):
+        outfit = models.Outfit(user_id=user.id, name=f"outfit {o}")
+        outfit.items.extend(items[i] for i in rng.choice(n_items, size=rng.integers(1, 5), replace=False))
+        db.add(outfit)
+        refresh_outfit_embedding(outfit)
+        outfits.append(outfit)
+    db.commit()
+    return user, items, outfits
+
+
+def test_outfit_embedding_follows_item_changes(engine):
+    db = sessionmaker(bind=engine)()
+    user, items, outfits = _wardrobe(db, n_items=6, n_outfits=0, seed=0)
+    outfit = models.Outfit(user_id=user.id, name="o", items=[items[0], items[1], items[2]]) # items[0] has no embedding
+    db.add(outfit)
+    refresh_outfit_embedding(outfit)
+    db.commit()
+    np.testing.assert_allclose(outfit.outfit_embedding, (items[1].ai_embedding + items[2].ai_embedding) / 2, rtol=1e-6)
+
+    items[0].ai_embedding = np.ones(8, dtype=np.float32)
+    db.commit()
+    refresh_outfits_containing(db, items[0].id)
+    db.expire_all()
+    np.testing.assert_allclose(outfit.outfit_embedding, (1 + items[1].ai_embedding + items[2].ai_embedding) / 3, rtol=1e-6)
+    db.close()
+
+
+def test_migration_backfills_outfit_embeddings(engine):
+    db = sessionmaker(bind=engine)()
+    _, items, outfits = _wardrobe(db, n_items=10, n_outfits=5, seed=1)
+    expected = {outfit.id: outfit.outfit_embedding for outfit in outfits}
+    db.query(models.Outfit).update({models.Outfit.outfit_embedding: None})
+    db.commit()
+
+    with engine.begin() as connection:
+        _0004_outfit_embedding(connection)
+    db.expire_all()
+    for outfit in db.query(models.Outfit):
+        if expected[outfit.id] is None:
+            assert outfit.outfit_embedding is None
+        else:
+            np.testing.assert_allclose(outfit.outfit_embedding, expected[outfit.id], rtol=1e-6)
+    db.close()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_occasion_matching_matches_exhaustive_scoring(engine, seed):
+    db = sessionmaker(bind=engine)()
+    user, items, outfits = _wardrobe(db, n_items=20, n_outfits=40, seed=seed)
+    occasion_embedding = np.random.default_rng(100 + seed).normal(size=8)
+
+    table = build_compatibility_table(db, user.id)
+    expected = []
+    for outfit in outfits:
+        features = [{"id": item.id, "colors": item.ai_dominant_colors} for item in outfit.items]
+        coherence = OutfitMatchingService().build_compatibility_matrix(features, table).score(range(len(features)))["score"]
+        if coherence < 0.4:
+            continue
+        similarity = 0.5
+        if outfit.outfit_embedding is not None:
+            e = outfit.outfit_embedding
+            similarity = (np.dot(e, occasion_embedding) / (np.linalg.norm(e) * np.linalg.norm(occasion_embedding)) + 1) / 2
+        expected.append((0.7 * similarity + 0.3 * coherence, coherence, outfit.id))
+    expected.sort(reverse=True)
+
+    matched = find_ai_matched_outfits_for_occasion(db, user.id, "party", num_recommendations=5, occasion_embedding=occasion_embedding)
+    assert [outfit.id for outfit in matched] == [outfit_id for _, _, outfit_id in expected[:5]]
+    assert all(outfit.items for outfit in matched)
+    db.close()
@@ -0,0 +1,110 @@
+import asyncio
+from itertools import product
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base
+from backend.app import model as models
+from backend.app.services.outfit_generator import OutfitGenerator, generate_outfits, select_diverse
+from backend.app.services.outfit_matching_service import CompatibilityMatrix
+from backend.app.services.recommendation_services import _outfit_candidate_pool, get_wardrobe_recommendations_service
+from backend.app.services.vector_index import UserVectorIndex
+
+COLORS = ["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0E68C", "#C19A6B", "#800020"]
+CATEGORIES = ["Tops", "Bottoms", "Shoes", "Outerwear"]
+
+
+def _pool(n_items, seed):
+    rng = np.random.default_rng(seed)
+    features = [
+        {"id": i, "embedding": rng.normal(size=8), "colors": list(rng.choice(COLORS, size=2, replace=False))}
+        for i in range(n_items)
+    ]
+    categories = [CATEGORIES[i % len(CATEGORIES)] for i in range(n_items)]
+    return CompatibilityMatrix(features), categories
+
+
+def test_stream_enumerates_every_outfit_once_in_ranking_order():
+    compatibility, categories = _pool(14, seed=0)
+    pair_scores = compatibility.pair_scores()
+    structures = [["Tops", "Bottoms"], ["Tops", "Bottoms", "Shoes"]]
+    outfits = list(OutfitGenerator(categories, pair_scores, structures))
+
+    rows = {c: [r for r, cat in enumerate(categories) if cat == c] for c in CATEGORIES}
+    expected = {combo for s in structures for combo in product(*(rows[c] for c in s))}
+    assert len(outfits) == len(expected) and set(outfits) == expected
+
+    def ranking_score(outfit):
+        structure = structures[len(outfit) - 2]
+        partner_means = [np.mean([pair_scores[r, p] for c in structure if c != categories[r] for p in rows[c]]) for r in outfit]
+        return np.mean(partner_means)
+    ranks = [ranking_score(outfit) for outfit in outfits]
+    assert all(a >= b - 1e-9 for a, b in zip(ranks, ranks[1:]))
+
+
+def test_without_diversity_and_unbounded_candidates_results_are_the_exact_top_k():
+    compatibility, categories = _pool(20, seed=1)
+    outfits = generate_outfits(compatibility, categories, k=6, max_candidates=10_000, diversity_lambda=1.0)
+
+    rows = {c: [r for r, cat in enumerate(categories) if cat == c] for c in CATEGORIES}
+    structures = [["Tops", "Bottoms"], ["Tops", "Bottoms", "Shoes"], ["Tops", "Bottoms", "Outerwear"]]
+    all_scores = sorted((compatibility.score(combo)["score"] for s in structures for combo in product(*(rows[c] for c in s))), reverse=True)
+    assert [details["score"] for _, details in outfits] == all_scores[:6]
+
+
+def test_diversity_spreads_items_across_ideas():
+    candidates = [((0, 1), {"score": 0.90}), ((0, 2), {"score": 0.89}), ((0, 3), {"score": 0.88}), ((4, 5), {"score": 0.80})]
+    assert [rows for rows, _ in select_diverse(candidates, 2, diversity_lambda=1.0)] == [(0, 1), (0, 2)]
+    assert [rows for rows, _ in select_diverse(candidates, 2, diversity_lambda=0.7)] == [(0, 1), (4, 5)]
+
+
+def test_candidate_pool_keeps_each_buckets_best_partners():
+    index = UserVectorIndex()
+    items = [{"id": 1, "category": "Bottoms"}, {"id": 2, "category": "Bottoms"}, {"id": 9, "category": "Hats"}]
+    index.upsert(1, [1.0, 0.0])
+    index.upsert(2, [0.8, 0.6])
+    # Tops 10..13 point further and further away from the bottoms; 14 has no embedding
+    for item_id, angle in zip(range(10, 14), (0.1, 0.5, 1.2, 2.5)):
+        index.upsert(item_id, [np.cos(angle), np.sin(angle)])
+    items += [{"id": item_id, "category": "Tops"} for item_id in (13, 12, 11, 10, 14)]
+
+    pool = _outfit_candidate_pool(items, index, per_category=2)
+    assert [item["id"] for item in pool] == [1, 2, 11, 10] # Wardrobe order, hats are never worn in an outfit
+    assert [item["id"] for item in _outfit_candidate_pool(items, UserVectorIndex(), per_category=2)] == [1, 2, 13, 12]
+
+
+def test_wardrobe_recommendations_are_deterministic_and_unique(tmp_path):
+    url = f"sqlite:///{tmp_path / 'wardrobe.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    rng = np.random.default_rng(5)
+    db.add_all([
+        models.WardrobeItem(
+            user_id=user.id, name=f"item {i}", category=CATEGORIES[i % len(CATEGORIES)],
+            ai_embedding=rng.normal(size=8).astype(np.float32) if i % 5 else None,
+            ai_dominant_colors=list(rng.choice(COLORS, size=2, replace=False))
+        )
+        for i in range(24)
+    ])
+    db.commit()
+
+    async def recommend():
+        async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        async with AsyncSession(async_engine) as session:
+            ideas = [await get_wardrobe_recommendations_service(session, user, num_recommendations=5) for _ in range(2)]
+        await async_engine.dispose()
+        return ideas
+
+    first, second = asyncio.run(recommend())
+
+    assert first.newOutfitIdeas == second.newOutfitIdeas
+    assert first.newOutfitIdeas and len(set(first.newOutfitIdeas)) == len(first.newOutfitIdeas)
+    assert all(idea.startswith("Try combining:") for idea in first.newOutfitIdeas)
+    db.close()
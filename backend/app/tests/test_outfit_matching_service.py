@@ -0,0 +1,82 @@
+import random
+from itertools import combinations
+
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from backend.app.services.outfit_matching_service import CompatibilityMatrix, OutfitMatchingService, check_color_harmony
+
+COLORS = ["#1A1A1A", "#FFFFFF", "#FF0000", "#00FF00", "#0000FF", "#F0F0F0", "#C19A6B", "#800020"]
+
+
+def _reference_score(item_features):
+    """The original per-pair implementation of calculate_compatibility_score."""
+    embeddings = [np.array(item["embedding"]) for item in item_features if item.get("embedding") is not None]
+    if len(embeddings) >= 2:
+        similarities = [cosine_similarity(a.reshape(1, -1), b.reshape(1, -1))[0][0] for a, b in combinations(embeddings, 2)]
+        style = (np.mean(similarities) + 1) / 2
+    else:
+        style = 0.5
+    colors = list({c for item in item_features for c in item.get("colors") or []})
+    color = check_color_harmony(colors)
+    return {
+        "score": round(max(0, min(1, style * 0.7 + color * 0.3)), 3),
+        "style_cohesion_score": round(style, 3),
+        "color_harmony_score": round(color, 3),
+    }
+
+
+@pytest.fixture
+def wardrobe():
+    rng = np.random.default_rng(42)
+    random.seed(42)
+    items = [
+        {"id": i, "embedding": rng.random(64).tolist(), "colors": random.sample(COLORS, k=2)}
+        for i in range(12)
+    ]
+    items[3]["embedding"] = None # Not analyzed yet
+    return items
+
+
+def _assert_same(result, expected):
+    for field in ("score", "style_cohesion_score", "color_harmony_score"):
+        assert result[field] == pytest.approx(expected[field], abs=1e-3)
+
+
+def test_single_outfit_score_matches_reference(wardrobe):
+    service = OutfitMatchingService()
+    for outfit in ([0, 1], [2, 3, 4], [5, 6, 7, 8]):
+        features = [wardrobe[i] for i in outfit]
+        _assert_same(service.calculate_compatibility_score(features), _reference_score(features))
+
+
+def test_batch_scores_match_reference_for_every_candidate(wardrobe):
+    service = OutfitMatchingService()
+    candidates = [list(c) for c in combinations(range(len(wardrobe)), 3)][:100] + [[0, 3], [3, 4], [9]]
+
+    results = service.score_outfits(wardrobe, candidates)
+
+    assert len(results) == len(candidates)
+    for indices, result in zip(candidates, results):
+        if len(indices) < 2:
+            assert result["score"] == 0.0
+            continue
+        _assert_same(result, _reference_score([wardrobe[i] for i in indices]))
+
+
+def test_mismatched_embedding_dimensions_are_ignored():
+    items = [
+        {"id": 1, "embedding": [1.0, 0.0, 0.0], "colors": ["#FFFFFF"]},
+        {"id": 2, "embedding": [1.0, 0.0, 0.0], "colors": ["#1A1A1A"]},
+        {"id": 3, "embedding": [0.5, 0.5], "colors": ["#F0F0F0"]},
+    ]
+    result = OutfitMatchingService().calculate_compatibility_score(items)
+    assert result["style_cohesion_score"] == pytest.approx(1.0)
+
+
+def test_pair_scores_match_per_pair_scores(wardrobe):
+    compatibility = CompatibilityMatrix(wardrobe)
+    pair_scores = compatibility.pair_scores()
+    for a, b in combinations(range(len(wardrobe)), 2):
+        assert pair_scores[a, b] == pytest.approx(compatibility.score([a, b])["score"], abs=1e-3)
@@ -0,0 +1,86 @@
+import random
+
+import numpy as np
+import pytest
+
+from backend.app.services.outfit_matcher import (
+    ClothingItem, OccasionType, OutfitMatcher, SeasonType, WeatherType
+)
+from backend.app.services.outfit_search import pairwise_compatibility
+
+STYLES = ["casual", "formal", "business", "bohemian", "vintage", "modern", "minimalist", "edgy", "sporty", "classic"]
+
+
+def make_wardrobe(n_items, seed, categories=("top", "bottom", "shoes", "outerwear", "accessory")):
+    rng = random.Random(seed)
+    return [
+        ClothingItem(
+            id=str(i), name=f"item {i}", category=rng.choice(categories),
+            color="#%02x%02x%02x" % (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+            style=rng.choice(STYLES),
+            occasion_suitability=[OccasionType.CASUAL], season_suitability=[SeasonType.FALL],
+            weather_suitability=list(WeatherType),
+            formality_level=rng.randint(1, 10), comfort_level=rng.randint(1, 10), tags=[]
+        )
+        for i in range(n_items)
+    ]
+
+
+def brute_force_ranking(matcher, wardrobe, weather, k):
+    """Every outfit the original create_complete_outfit loop considered, ranked."""
+    categories = {}
+    for item in wardrobe:
+        categories.setdefault(item.category, []).append(item)
+    candidates = []
+    order = 0
+    for top in categories.get("top", []):
+        for bottom in categories.get("bottom", []):
+            for shoes in categories.get("shoes", []):
+                outfit_items = [top, bottom, shoes]
+                if weather in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY] and categories.get("outerwear"):
+                    outfit_items.append(max(categories["outerwear"], key=lambda x: matcher._calculate_outfit_score(outfit_items + [x])))
+                if categories.get("accessory"):
+                    outfit_items.append(max(categories["accessory"][:2], key=lambda x: matcher._calculate_outfit_score(outfit_items + [x])))
+                score = matcher._calculate_outfit_score(outfit_items)
+                if score > 0:
+                    candidates.append((score, order, [item.id for item in outfit_items]))
+                order += 1
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+    return [(ids, score) for score, _, ids in candidates[:k]]
+
+
+def test_pairwise_matrix_matches_scalar_scores_exactly():
+    matcher = OutfitMatcher()
+    items = make_wardrobe(40, seed=3)
+    matrix = pairwise_compatibility(items, items, matcher.style_matcher, matcher.color_matcher)
+    expected = np.array([[matcher._calculate_item_compatibility(a, b) for b in items] for a in items])
+    assert np.array_equal(matrix, expected)
+
+
+@pytest.mark.parametrize("weather", [WeatherType.SUNNY, WeatherType.RAINY])
+@pytest.mark.parametrize("seed", range(4))
+def test_top_k_matches_exhaustive_search(seed, weather):
+    matcher = OutfitMatcher()
+    wardrobe = make_wardrobe(45, seed=seed)
+    outfits = matcher.create_top_outfits(wardrobe, OccasionType.CASUAL, SeasonType.FALL, weather, k=7)
+
+    found = [([item.id for item in outfit.items], outfit.confidence_score) for outfit in outfits]
+    assert found == brute_force_ranking(matcher, wardrobe, weather, k=7)
+
+
+def test_complete_outfit_without_optional_categories():
+    matcher = OutfitMatcher()
+    wardrobe = make_wardrobe(20, seed=9, categories=("top", "bottom", "shoes"))
+    outfit = matcher.create_complete_outfit(wardrobe, OccasionType.CASUAL, SeasonType.FALL, WeatherType.SNOWY)
+
+    expected_ids, expected_score = brute_force_ranking(matcher, wardrobe, WeatherType.SNOWY, k=1)[0]
+    assert [item.id for item in outfit.items] == expected_ids
+    assert outfit.confidence_score == expected_score
+
+
+def test_missing_required_category_falls_back():
+    matcher = OutfitMatcher()
+    wardrobe = make_wardrobe(10, seed=1, categories=("top", "bottom"))
+    assert matcher.create_top_outfits(wardrobe, OccasionType.CASUAL, SeasonType.FALL, WeatherType.SUNNY) == []
+    outfit = matcher.create_complete_outfit(wardrobe, OccasionType.CASUAL, SeasonType.FALL, WeatherType.SUNNY)
+    assert outfit.items == [] and outfit.confidence_score == 0.0
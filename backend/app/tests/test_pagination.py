@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import pytest
+
+from backend.app import model as models
+from backend.app.routers import auth, occasions, outfits, wardrobe, weekly_plans
+
+
+@pytest.fixture
+def env(make_api):
+    api = make_api([auth, wardrobe, outfits, weekly_plans, occasions])
+    return api.client, api.Session
+
+
+def _walk(client, path, limit, **params):
+    """Ids of every page fetched by following X-Next-Cursor."""
+    pages, cursor = [], None
+    while True:
+        response = client.get(path, params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_cursor_pages_follow_the_list_order(env):
+    client, Session = env
+    item_ids = [client.post("/api/wardrobe/items/", params={"name": f"item {i}", "category": "Tops"}).json()["id"] for i in range(5)]
+    with Session() as db: # Shared timestamps, so the id breaks the ties
+        for item_id in item_ids:
+            db.get(models.WardrobeItem, item_id).date_added = datetime(2024, 1, 1 + item_id // 3)
+        db.commit()
+
+    assert _walk(client, "/api/wardrobe/items/", 2) == [item_ids[:2], item_ids[2:4], item_ids[4:]]
+    assert _walk(client, "/api/wardrobe/items/", 5) == [item_ids]
+    assert _walk(client, "/api/wardrobe/items/", 2, view="summary", category="Tops") == [item_ids[:2], item_ids[2:4], item_ids[4:]]
+    # Offset paging without a cursor is unchanged
+    assert [item["id"] for item in client.get("/api/wardrobe/items/", params={"skip": 3, "limit": 10}).json()] == item_ids[3:]
+
+    outfit_ids = [client.post("/api/outfits/", json={"name": f"o{i}", "item_ids": item_ids[:1]}).json()["id"] for i in range(3)]
+    assert _walk(client, "/api/outfits/", 2) == [outfit_ids[:2], outfit_ids[2:]]
+
+    plan_ids = [
+        client.post("/api/weekly-plans/", json={"name": f"week {i}", "start_date": start, "end_date": start, "daily_outfits": {}}).json()["id"]
+        for i, start in enumerate(["2024-01-01", "2024-01-08", "2024-01-08", "2024-01-15"])
+    ]
+    assert _walk(client, "/api/weekly-plans/", 3) == [[plan_ids[3], plan_ids[2], plan_ids[1]], [plan_ids[0]]]
+
+
+def test_descending_cursor_with_null_dates(env):
+    client, Session = env
+    with Session() as db:
+        dates = [datetime(2024, 5, 1), None, datetime(2024, 6, 1), None, datetime(2024, 5, 1)]
+        db.add_all(models.Occasion(user_id=1, name=f"occasion {i}", date=date) for i, date in enumerate(dates))
+        db.commit()
+
+    # Newest first, NULL dates last, ties by descending id
+    expected = [3, 5, 1, 4, 2]
+    for limit in (1, 2, 3):
+        pages = _walk(client, "/api/occasions/", limit)
+        assert [row_id for page in pages for row_id in page] == expected
+        assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_invalid_cursors_and_limits_are_rejected(env):
+    client, _ = env
+    assert client.get("/api/wardrobe/items/", params={"cursor": "not a cursor"}).status_code == 400
+    assert client.get("/api/outfits/", params={"cursor": "WyJ4IiwgMV0"}).status_code == 400 # ["x", 1]
+    assert client.get("/api/weekly-plans/", params={"limit": 0}).status_code == 422
+    assert client.get("/api/occasions/", params={"skip": -1}).status_code == 422
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from backend.app import model as models
+from backend.app.routers import auth
+from backend.app.services import password_hashing
+from backend.app.services.password_hashing import PasswordHasher
+
+
+@pytest.fixture
+def client_and_session(make_api):
+    api = make_api([auth], register=False)
+    return api.client, api.Session
+
+
+def _stored_hash(Session) -> str:
+    with Session() as db:
+        return db.scalar(select(models.User.hashed_password).where(models.User.username == "u"))
+
+
+def test_login_rehashes_passwords_when_the_cost_changes(client_and_session, monkeypatch):
+    client, Session = client_and_session
+    monkeypatch.setattr(password_hashing, "password_hasher", PasswordHasher(rounds=4))
+    client.post("/api/register", json={"username": "u", "email": "u@example.com", "password": "pw"})
+    assert _stored_hash(Session).startswith("$2b$04$")
+
+    hasher = PasswordHasher(rounds=5)
+    monkeypatch.setattr(password_hashing, "password_hasher", hasher)
+    assert client.post("/api/login", json={"emailOrUsername": "u", "password": "wrong"}).status_code == 401
+    assert _stored_hash(Session).startswith("$2b$04$")
+    assert client.post("/api/login", json={"emailOrUsername": "u", "password": "pw"}).status_code == 200
+    assert _stored_hash(Session).startswith("$2b$05$")
+    assert client.post("/api/login", json={"emailOrUsername": "u", "password": "pw"}).status_code == 200
+    assert hasher.get_stats()["rehashes"] == 1 and hasher.get_stats()["verifications"] == 3
+
+
+def test_hashing_beyond_the_pending_limit_is_rejected():
+    hasher = PasswordHasher(rounds=4, workers=1, max_pending=1)
+
+    async def burst():
+        return await asyncio.gather(*(hasher.hash_async("pw") for _ in range(2)), return_exceptions=True)
+
+    hashed, rejected = asyncio.run(burst())
+    assert hasher.context.verify("pw", hashed)
+    assert isinstance(rejected, HTTPException) and rejected.status_code == 503
+    assert hasher.get_stats()["rejected"] == 1 and hasher.get_stats()["pending"] == 0
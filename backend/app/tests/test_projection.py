@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from backend.app import model as models, tables as schemas
+from backend.app.routers import outfits, statistics, wardrobe
+from backend.app.security import get_current_user
+
+
+@pytest.fixture
+def client_and_statements(make_api):
+    current_user = None
+    api = make_api([wardrobe, statistics, outfits], register=False, record_statements=True, overrides={get_current_user: lambda: current_user})
+
+    db = api.Session()
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    items = [
+        models.WardrobeItem(user_id=user.id, name=f"item {i}", category="Tops", times_worn=i,
+                            ai_embedding=np.full(1280, i, dtype=np.float32), ai_dominant_colors=["#FFFFFF"])
+        for i in range(3)
+    ]
+    db.add_all(items)
+    db.add(models.Outfit(user_id=user.id, name="o", items=items[:2], outfit_embedding=np.ones(1280, dtype=np.float32)))
+    db.commit()
+    current_user = schemas.User.model_validate(user)
+    db.close()
+    return api.client, api.statements
+
+
+def test_wardrobe_list_summary_omits_embeddings_in_query_and_response(client_and_statements):
+    client, statements = client_and_statements
+
+    summary = client.get("/api/wardrobe/items/").json()
+    assert len(summary) == 3 and all("ai_embedding" not in item for item in summary)
+    assert summary[0]["ai_dominant_colors"] == ["#FFFFFF"]
+    assert not any("ai_embedding" in statement for statement in statements)
+
+    full = client.get("/api/wardrobe/items/", params={"view": "full"}).json()
+    assert [len(item["ai_embedding"]) for item in full] == [1280] * 3
+
+    assert "ai_embedding" not in client.get("/api/wardrobe/items/1").json()
+    assert client.get("/api/wardrobe/items/1", params={"view": "full"}).json()["ai_embedding"][0] == 0.0
+    assert client.get("/api/wardrobe/items/", params={"view": "other"}).status_code == 422
+
+
+def test_statistics_and_outfits_do_not_load_embeddings(client_and_statements):
+    client, statements = client_and_statements
+
+    stats = client.get("/api/statistics/wardrobe-stats/").json()
+    assert [item["name"] for item in stats["most_worn_items"]] == ["item 2", "item 1"]
+    assert all("ai_embedding" not in item for item in stats["most_worn_items"] + stats["least_worn_items"])
+    frequency = client.get("/api/statistics/item-wear-frequency/").json()
+    # Compact rows, not nested items
+    assert [entry["name"] for entry in frequency[:2]] == ["item 2", "item 1"]
+    assert all(set(entry) == {"item_id", "name", "category", "image_url", "last_worn", "wear_count", "rank", "wear_share"} for entry in frequency)
+
+    outfit_list = client.get("/api/outfits/").json()
+    assert outfit_list[0]["item_ids"] == [1, 2]
+    assert not any("ai_embedding" in statement or "outfit_embedding" in statement for statement in statements)
+
+    full_stats = client.get("/api/statistics/wardrobe-stats/", params={"view": "full"}).json()
+    assert len(full_stats["most_worn_items"][0]["ai_embedding"]) == 1280
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def _run(tmp_path, script: str) -> dict:
+    """Runs a script against a fresh import of main (from backend/, as deployed) and returns its JSON output."""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'wardrobe.db'}", AI_INFERENCE_MODE="local")
+    env.pop("ASYNC_DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_does_not_import_ml_frameworks(tmp_path):
+    loaded = _run(tmp_path, """
+        import json, sys
+        import main
+        from app.routers import ai_analyzer, model_cache, occasions, recommendations, wardrobe
+        print(json.dumps([name for name in ("tensorflow", "tensorflow_hub", "sentence_transformers") if name in sys.modules]))
+    """)
+    assert loaded == []
+
+
+def test_ready_reports_model_state_before_and_after_warm_up(tmp_path):
+    responses = _run(tmp_path, """
+        import json
+        from fastapi.testclient import TestClient
+        import main
+        from app.services.model_manager import AI_WARMUP_MODELS, get_model_manager
+
+        client = TestClient(main.app) # Without the lifespan: nothing is warmed up
+        responses = {
+            "health": client.get("/health").status_code,
+            "ready": client.get("/ready").status_code,
+            "before": (lambda r: (r.status_code, r.json()))(client.get("/ready", params={"require_models": True})),
+        }
+        manager = get_model_manager()
+        manager._load_model = lambda name: object() # Stubbed load
+        manager.warm_up(AI_WARMUP_MODELS)
+        responses["after"] = (lambda r: (r.status_code, r.json()))(client.get("/ready", params={"require_models": True}))
+        responses["warmup_models"] = AI_WARMUP_MODELS
+        print(json.dumps(responses))
+    """)
+    assert responses["health"] == 200 and responses["ready"] == 200
+
+    status_code, body = responses["before"]
+    assert status_code == 503 and body["database"] == "ok" and body["models_ready"] is False
+    assert all(body["models"][name]["status"] == "not_loaded" for name in responses["warmup_models"])
+
+    status_code, body = responses["after"]
+    assert status_code == 200 and body["status"] == "ready" and body["models_ready"] is True
+    assert all(body["models"][name]["status"] == "loaded" for name in responses["warmup_models"])
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from backend.app import tables as schemas
+from backend.app.responses import NumpyORJSONResponse, dumps, model_response
+
+
+def _item(embedding=None):
+    return schemas.WardrobeItem(
+        id=1, user_id=1, name="shirt", category="Tops", tags=["a"], times_worn=2,
+        date_added=datetime(2024, 1, 2, 3, 4, 5), ai_embedding=embedding, ai_dominant_colors=["#FFFFFF"]
+    )
+
+
+def test_model_response_matches_standard_encoder():
+    embedding = np.linspace(-1, 1, 16, dtype=np.float32)
+    items = [_item(embedding), _item()]
+
+    fast = json.loads(model_response(items).body)
+    standard = json.loads(json.dumps(jsonable_encoder(items)))
+    # orjson writes float32 values at float32 precision
+    np.testing.assert_allclose(fast[0].pop("ai_embedding"), standard[0].pop("ai_embedding"), rtol=1e-6)
+    assert fast == standard
+    assert fast[0]["date_added"] == "2024-01-02T03:04:05"
+
+    assert json.loads(dumps({"n": np.int64(3), "m": np.arange(4)[::2], 1: {"x"}})) == {"n": 3, "m": [0, 2], "1": ["x"]}
+
+
+def test_default_response_class_serializes_response_models_and_arrays():
+    app = FastAPI(default_response_class=NumpyORJSONResponse)
+
+    @app.get("/item", response_model=schemas.WardrobeItem)
+    def get_item():
+        return _item(np.ones(4, dtype=np.float32))
+
+    @app.get("/raw")
+    def get_raw():
+        return NumpyORJSONResponse({"vector": np.arange(3, dtype=np.float32)})
+
+    client = TestClient(app)
+    assert client.get("/item").json()["ai_embedding"] == [1.0] * 4
+    assert client.get("/raw").json() == {"vector": [0.0, 1.0, 2.0]}
+    assert "ai_embedding" in app.openapi()["components"]["schemas"]["WardrobeItem"]["properties"]
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base
+from backend.app import model as models
+from backend.app.services import recommendation_services
+from backend.app.services.text_embeddings import TextEmbeddingCache, text_embedding_key
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return np.full(4, len(text), dtype=np.float32)
+
+
+def test_cache_hits_memory_then_disk(tmp_path):
+    encoder = CountingEncoder()
+    cache = TextEmbeddingCache(cache_dir=str(tmp_path), memory_entries=1)
+
+    first = cache.get_or_encode("Wedding  Guest", encoder, model_id="m:1")
+    assert np.array_equal(cache.get_or_encode("wedding guest ", encoder, model_id="m:1"), first) # Same normalized text
+    cache.get_or_encode("Beach party", encoder, model_id="m:1") # Pushes the first entry out of memory
+    assert np.array_equal(cache.get_or_encode("Wedding Guest", encoder, model_id="m:1"), first) # Served from disk
+    assert encoder.calls == ["Wedding  Guest", "Beach party"]
+
+    # Another process sharing the directory, and another model version
+    other = TextEmbeddingCache(cache_dir=str(tmp_path))
+    assert np.array_equal(other.get_or_encode("Beach party", encoder, model_id="m:1"), np.full(4, 11))
+    other.get_or_encode("Beach party", encoder, model_id="m:2")
+    assert encoder.calls == ["Wedding  Guest", "Beach party", "Beach party"]
+
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 2)
+
+
+def test_disk_level_evicts_least_recently_used(tmp_path):
+    cache = TextEmbeddingCache(cache_dir=str(tmp_path), memory_entries=1, max_entries=5)
+    keys = [text_embedding_key(f"text {i}", "m:1") for i in range(6)]
+    for age, key in enumerate(keys[:5]):
+        cache.put(key, np.full(4, age, dtype=np.float32))
+        os.utime(cache._path(key), (1000 + age, 1000 + age)) # Oldest first
+    assert cache.get(keys[0]) is not None # From disk, which refreshes its mtime
+
+    cache.put(keys[5], np.ones(4, dtype=np.float32))
+    assert sorted(path.stem for path in tmp_path.glob("*/*.bin")) == sorted([keys[0], keys[3], keys[4], keys[5]])
+    stats = cache.get_stats()
+    assert (stats["disk_entries"], stats["evictions"]) == (4, 2)
+
+
+def test_occasion_embedding_is_recomputed_only_when_text_changes(monkeypatch):
+    encoder = CountingEncoder()
+    monkeypatch.setattr(recommendation_services, "encode_text_cached", encoder)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    occasion = models.Occasion(user_id=user.id, name="Wedding", notes="Outdoor")
+    recommendation_services.refresh_occasion_embedding(occasion) # On create
+    db.add(occasion)
+    db.commit()
+    embedding = occasion.text_embedding
+
+    db.expire_all() # Reload from the database
+    assert np.array_equal(recommendation_services.get_occasion_embedding(occasion), embedding)
+    assert occasion.text_embedding_key == text_embedding_key("Wedding Outdoor")
+    occasion.date = None # Unrelated edits keep the stored embedding
+    recommendation_services.refresh_occasion_embedding(occasion)
+    db.commit()
+    recommendation_services.get_occasion_embedding(occasion)
+    assert encoder.calls == ["Wedding Outdoor"]
+
+    # Reads of a stale embedding encode the new text without storing it
+    occasion.notes = "Indoor, black tie"
+    recommendation_services.get_occasion_embedding(occasion)
+    assert encoder.calls == ["Wedding Outdoor", "Wedding Indoor, black tie"]
+    assert occasion.text_embedding_key == text_embedding_key("Wedding Outdoor")
+    recommendation_services.refresh_occasion_embedding(occasion) # On update
+    db.commit()
+    assert occasion.text_embedding_key == text_embedding_key("Wedding Indoor, black tie")
+    db.close()
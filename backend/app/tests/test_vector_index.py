@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.app.db.database import Base
+from backend.app import model as models
+from backend.app.services.vector_index import UserVectorIndex, VectorIndexRegistry
+
+
+def _brute_force(vectors, query, k):
+    scores = {
+        item_id: float(np.dot(v, query) / (np.linalg.norm(v) * np.linalg.norm(query)))
+        for item_id, v in vectors.items()
+    }
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+
+def test_top_k_matches_brute_force_cosine_similarity():
+    rng = np.random.default_rng(0)
+    vectors = {item_id: rng.normal(size=32) for item_id in range(1, 201)}
+    index = UserVectorIndex(initial_capacity=4) # Forces several resizes
+    for item_id, vector in vectors.items():
+        index.upsert(item_id, vector, category="Tops")
+
+    query = rng.normal(size=32)
+    result = index.top_k(query, k=5)
+    expected = _brute_force(vectors, query, 5)
+
+    assert [item_id for item_id, _ in result] == [item_id for item_id, _ in expected]
+    assert [score for _, score in result] == pytest.approx([score for _, score in expected], abs=1e-5)
+
+
+def test_upsert_remove_and_filters():
+    index = UserVectorIndex()
+    index.upsert(1, [1.0, 0.0], category="Tops")
+    index.upsert(2, [0.9, 0.1], category="Bottoms")
+    index.upsert(3, [0.0, 1.0], category="Bottoms")
+    index.upsert(4, [0.8, 0.2], category="Shoes")
+
+    assert [i for i, _ in index.top_k([1.0, 0.0], k=2, filters={"category": "Bottoms"})] == [2, 3]
+    assert [i for i, _ in index.top_k([1.0, 0.0], k=4, filters={"category": ["Tops", "Shoes"]}, exclude_ids=[1])] == [4]
+    assert [i for i, _ in index.top_k([1.0, 0.0], k=4, filters={"id": [3, 4]})] == [4, 3]
+
+    # Removing a row moves the last row into its slot; lookups must stay consistent
+    assert index.remove(2)
+    assert 2 not in index and len(index) == 3
+    assert [i for i, _ in index.top_k([1.0, 0.0], k=3)] == [1, 4, 3]
+    assert [i for i, _ in index.top_k([1.0, 0.0], k=3, filters={"category": "Shoes"})] == [4]
+
+    # Re-upserting replaces the vector and metadata in place
+    index.upsert(3, [1.0, 0.0], category="Tops")
+    assert index.top_k([1.0, 0.0], k=1, filters={"category": "Tops", "id": [3]})[0][0] == 3
+
+
+def test_unusable_vectors_are_not_indexed():
+    index = UserVectorIndex()
+    assert index.upsert(1, [1.0, 0.0, 0.0])
+    assert not index.upsert(2, [0.0, 0.0, 0.0]) # zero vector
+    assert not index.upsert(3, [1.0, 0.0]) # wrong dimension
+    assert len(index) == 1
+    assert index.top_k([1.0, 0.0], k=3) == []
+
+
+def test_registry_builds_from_database_and_syncs_items():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    user = models.User(username="u", email="u@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        models.WardrobeItem(user_id=user.id, name="a", category="Tops", ai_embedding=[1.0, 0.0]),
+        models.WardrobeItem(user_id=user.id, name="b", category="Bottoms", ai_embedding=[0.0, 1.0]),
+        models.WardrobeItem(user_id=user.id, name="c", category="Shoes"), # Not analyzed yet
+    ])
+    db.commit()
+
+    registry = VectorIndexRegistry(session_factory=Session)
+    index = registry.get(user.id)
+    assert len(index) == 2
+
+    pending = db.query(models.WardrobeItem).filter_by(name="c").one()
+    pending.ai_embedding = [0.9, 0.1]
+    db.commit()
+    registry.sync_item(pending)
+    assert registry.get(user.id).top_k([1.0, 0.0], k=2, exclude_ids=[1])[0][0] == pending.id
+
+    registry.remove_item(user.id, pending.id)
+    assert pending.id not in registry.get(user.id)
+    db.close()
@@ -0,0 +1,141 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, inspect, select, text
+
+from backend.app import model as models
+from backend.app.db.database import Base
+from backend.app.db.migrations import _0005_user_wardrobe_stats, _0009_wear_count_index
+from backend.app.routers import auth, outfits, statistics, wardrobe
+from backend.app.services.wardrobe_stats import compute_stats, rebuild_all
+
+
+@pytest.fixture
+def env(make_api):
+    api = make_api([auth, wardrobe, outfits, statistics], record_statements=True)
+    return api.client, api.engine, api.Session, api.statements
+
+
+def _stored(engine, user_id=1):
+    with engine.connect() as connection:
+        row = connection.execute(select(models.UserWardrobeStats.__table__).where(models.UserWardrobeStats.user_id == user_id)).mappings().first()
+        return {key: value for key, value in row.items() if key not in ("user_id", "updated_at")}
+
+
+def _assert_consistent(engine, user_id=1):
+    with engine.connect() as connection:
+        assert _stored(engine, user_id) == compute_stats(connection, [user_id])[user_id]
+
+
+def _add_item(client, name, category, **params):
+    return client.post("/api/wardrobe/items/", params={"name": name, "category": category, **params}).json()["id"]
+
+
+def test_stats_follow_item_outfit_and_wear_changes(env):
+    client, engine, Session, statements = env
+    assert _stored(engine)["total_items"] == 0
+
+    shirt = _add_item(client, "shirt", "Tops", season="Summer")
+    jeans = _add_item(client, "jeans", "Bottoms", season="All Seasons")
+    coat = _add_item(client, "coat", "Outerwear")
+    _assert_consistent(engine)
+
+    client.put(f"/api/wardrobe/items/{coat}", params={"name": "coat", "category": "Tops", "season": "Winter", "favorite": True})
+    outfit = client.post("/api/outfits/", json={"name": "o", "item_ids": [shirt, jeans]}).json()["id"]
+    _assert_consistent(engine)
+
+    # What logging style history does to the worn items: the stats row is not touched
+    wear_statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: wear_statements.append(statement))
+    with Session() as db:
+        for item in db.scalars(select(models.WardrobeItem).where(models.WardrobeItem.id.in_([shirt, jeans]))):
+            item.times_worn = (item.times_worn or 0) + 1
+        db.get(models.WardrobeItem, shirt).times_worn += 1
+        db.add(models.StyleHistory(user_id=1, item_id=shirt, date_worn=datetime.utcnow()))
+        db.commit()
+    assert wear_statements and not any("user_wardrobe_stats" in statement for statement in wear_statements)
+    _assert_consistent(engine)
+
+    statements.clear()
+    stats = client.get("/api/statistics/wardrobe-stats/").json()
+    assert len(statements) == 3 # The stats row and the most/least worn items
+    assert stats["total_items"] == 3 and stats["total_outfits"] == 1 and stats["favorite_items_count"] == 1
+    assert stats["items_by_category"] == {"Tops": 2, "Bottoms": 1}
+    assert stats["items_by_season"] == {"Summer": 1, "All Seasons": 1, "Winter": 1}
+    assert [item["id"] for item in stats["most_worn_items"]] == [shirt, jeans]
+    assert [item["id"] for item in stats["least_worn_items"]] == [coat, jeans, shirt]
+    assert client.get("/api/statistics/category-usage/").json() == [
+        {"category": "Bottoms", "item_count": 1, "usage_percentage": 33.33},
+        {"category": "Tops", "item_count": 2, "usage_percentage": 66.67},
+    ]
+
+    client.delete(f"/api/outfits/{outfit}")
+    client.delete(f"/api/wardrobe/items/{shirt}")
+    _assert_consistent(engine)
+    stats = client.get("/api/statistics/wardrobe-stats/").json()
+    assert [item["id"] for item in stats["most_worn_items"]] == [jeans]
+    assert [item["id"] for item in stats["least_worn_items"]] == [coat, jeans]
+
+
+def test_missing_or_drifted_rows_are_rebuilt(env):
+    client, engine, Session, statements = env
+    _add_item(client, "shirt", "Tops")
+    with engine.begin() as connection:
+        connection.execute(models.UserWardrobeStats.__table__.delete())
+    # Computed on read without being stored
+    statements.clear()
+    assert client.get("/api/statistics/wardrobe-stats/").json()["total_items"] == 1
+    assert client.get("/api/statistics/category-usage/").json()[0]["item_count"] == 1
+    assert all(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+    with Session() as db:
+        assert db.get(models.UserWardrobeStats, 1) is None
+        assert rebuild_all(db, user_id=1) == 1
+
+    # Writes that bypass the ORM are repaired by the rebuild command
+    with engine.begin() as connection:
+        connection.execute(models.WardrobeItem.__table__.update().values(category="Shoes"))
+    with Session() as db:
+        assert rebuild_all(db) == 1
+    assert client.get("/api/statistics/wardrobe-stats/").json()["items_by_category"] == {"Shoes": 1}
+
+    with engine.begin() as connection:
+        connection.execute(models.UserWardrobeStats.__table__.delete())
+        _0005_user_wardrobe_stats(connection)
+    _assert_consistent(engine)
+
+
+def test_wear_frequency_pages_compact_rows_in_one_query(env):
+    client, engine, Session, statements = env
+    item_ids = [_add_item(client, f"item {i}", "Tops") for i in range(5)]
+    with Session() as db:
+        for item_id, times_worn in zip(item_ids, [1, 3, 0, 3, None]):
+            db.get(models.WardrobeItem, item_id).times_worn = times_worn
+        db.commit()
+
+    statements.clear()
+    response = client.get("/api/statistics/item-wear-frequency/", params={"limit": 3})
+    assert len(statements) == 1 and "ai_embedding" not in statements[0]
+    assert response.headers["X-Total-Count"] == "5"
+    rows = response.json()
+    assert [(row["item_id"], row["wear_count"], row["rank"]) for row in rows] == [(item_ids[1], 3, 1), (item_ids[3], 3, 1), (item_ids[0], 1, 3)]
+    assert rows[0] == {
+        "item_id": item_ids[1], "name": "item 1", "category": "Tops", "image_url": None,
+        "last_worn": None, "wear_count": 3, "rank": 1, "wear_share": 42.86,
+    }
+
+    rows = client.get("/api/statistics/item-wear-frequency/", params={"skip": 3, "limit": 3}).json()
+    assert [(row["item_id"], row["wear_count"], row["rank"]) for row in rows] == [(item_ids[2], 0, 4), (item_ids[4], 0, 4)]
+    response = client.get("/api/statistics/item-wear-frequency/", params={"skip": 10})
+    assert response.json() == [] and response.headers["X-Total-Count"] == "5"
+
+
+def test_wear_counts_column_is_replaced_by_an_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection: # The table as created before migration 0009
+        connection.execute(text("DROP INDEX ix_wardrobe_items_user_times_worn"))
+        connection.execute(text("ALTER TABLE user_wardrobe_stats ADD COLUMN wear_counts JSON NOT NULL DEFAULT '{}'"))
+        _0009_wear_count_index(connection)
+        _0009_wear_count_index(connection) # Idempotent
+        assert "wear_counts" not in {column["name"] for column in inspect(connection).get_columns("user_wardrobe_stats")}
+        assert "ix_wardrobe_items_user_times_worn" in {index["name"] for index in inspect(connection).get_indexes("wardrobe_items")}
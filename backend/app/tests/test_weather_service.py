@@ -1,3 +1,9 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 import pytest_asyncio # Not strictly needed for @pytest.mark.asyncio but good for consistency
 import httpx
@@ -5,7 +11,7 @@ import os
 from unittest.mock import AsyncMock, patch, MagicMock # Import MagicMock
 
 # Import the function to test
-from backend.app.services.weather_service import get_weather_data, WEATHER_API_URL
+from backend.app.services.weather_service import get_weather_data, geohash_cell, WeatherClient, WEATHER_API_URL
 
 # Fixture for mocking httpx.AsyncClient
 @pytest_asyncio.fixture
@@ -27,7 +33,7 @@ async def test_get_weather_data_success_with_api_key(mock_async_client):
     mock_async_client.get.return_value = mock_response
 
     # Patch the module-level variable OPENWEATHERMAP_API_KEY within the weather_service module
-    with patch('backend.app.services.weather_service.OPENWEATHERMAP_API_KEY', "test_key"):
+    with patch('backend.app.services.weather_service.weather_client', WeatherClient(api_key="test_key")):
         with patch('backend.app.services.weather_service.httpx.AsyncClient', return_value=mock_async_client):
             result = await get_weather_data(latitude=10.0, longitude=10.0)
 
@@ -36,9 +42,12 @@ async def test_get_weather_data_success_with_api_key(mock_async_client):
     mock_async_client.get.assert_called_once()
     call_args = mock_async_client.get.call_args
     assert call_args[0][0] == expected_url
+    # The upstream is asked for the centre of the point's geohash cell
+    _, center_lat, center_lon = geohash_cell(10.0, 10.0)
+    assert abs(center_lat - 10.0) < 0.05 and abs(center_lon - 10.0) < 0.05
     assert call_args[1]['params'] == {
-        "lat": 10.0,
-        "lon": 10.0,
+        "lat": center_lat,
+        "lon": center_lon,
         "appid": "test_key",
         "units": "metric"
     }
@@ -98,7 +107,7 @@ async def test_get_weather_data_api_http_status_error(mock_async_client):
 
     mock_async_client.get.return_value = mock_response_from_get
 
-    with patch('backend.app.services.weather_service.OPENWEATHERMAP_API_KEY', "test_key"):
+    with patch('backend.app.services.weather_service.weather_client', WeatherClient(api_key="test_key")):
         with patch('backend.app.services.weather_service.httpx.AsyncClient', return_value=mock_async_client):
             result = await get_weather_data(latitude=10.0, longitude=10.0)
 
@@ -111,7 +120,7 @@ async def test_get_weather_data_network_error(mock_async_client):
     mock_httpx_request_obj = MagicMock(spec=httpx.Request) # Mock for the request object
     mock_async_client.get.side_effect = httpx.RequestError("Simulated network error", request=mock_httpx_request_obj)
 
-    with patch('backend.app.services.weather_service.OPENWEATHERMAP_API_KEY', "test_key"):
+    with patch('backend.app.services.weather_service.weather_client', WeatherClient(api_key="test_key")):
         with patch('backend.app.services.weather_service.httpx.AsyncClient', return_value=mock_async_client):
             result = await get_weather_data(latitude=10.0, longitude=10.0)
 
@@ -126,10 +135,87 @@ async def test_get_weather_data_json_decode_error(mock_async_client):
 
     mock_async_client.get.return_value = mock_response
 
-    with patch('backend.app.services.weather_service.OPENWEATHERMAP_API_KEY', "test_key"):
+    with patch('backend.app.services.weather_service.weather_client', WeatherClient(api_key="test_key")):
         with patch('backend.app.services.weather_service.httpx.AsyncClient', return_value=mock_async_client):
             result = await get_weather_data(latitude=10.0, longitude=10.0)
 
     assert result is None # Or however your service handles JSON errors
     mock_async_client.get.assert_called_once()
     mock_response.json.assert_called_once()
+
+
+# --- Pooled, cached client against a local stub server ---
+
+class StubWeatherHandler(BaseHTTPRequestHandler):
+    requests = []
+    delay = 0.0
+    temperature = 15.0
+    status = 200
+    release = None # threading.Event the handler waits for, if set
+
+    def do_GET(self):
+        type(self).requests.append(self.path)
+        time.sleep(type(self).delay)
+        if type(self).release is not None:
+            type(self).release.wait(timeout=10)
+        body = json.dumps({"main": {"temp": type(self).temperature}, "weather": [{"main": "Clear"}]}).encode()
+        self.send_response(type(self).status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubWeatherHandler.requests, StubWeatherHandler.delay = [], 0.0
+    StubWeatherHandler.temperature, StubWeatherHandler.status, StubWeatherHandler.release = 15.0, 200, None
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWeatherHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/weather"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_lookups_in_the_same_cell_share_one_upstream_call(stub_server):
+    client = WeatherClient(api_key="test_key", api_url=stub_server)
+    StubWeatherHandler.delay = 0.1
+    results = await asyncio.gather(*(client.get(48.8566 + i * 0.001, 2.3522) for i in range(10)))
+    assert results == [{"temperature_celsius": 15.0, "condition": "Clear"}] * 10
+    assert len(StubWeatherHandler.requests) == 1
+
+    assert await client.get(48.8566, 2.3522) == results[0] # Cached
+    await client.get(40.7128, -74.0060) # Another cell
+    assert len(StubWeatherHandler.requests) == 2
+    stats = client.get_stats()
+    assert stats["coalesced"] == 9 and stats["hits"] == 1 and stats["upstream_calls"] == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_served_while_the_upstream_is_slow(stub_server):
+    client = WeatherClient(api_key="test_key", api_url=stub_server, ttl_seconds=0, stale_ttl_seconds=60, refresh_wait_seconds=0.05)
+    assert (await client.get(48.8566, 2.3522))["temperature_celsius"] == 15.0
+
+    # The upstream holds the refresh until released, so only the stale value can be served
+    StubWeatherHandler.release, StubWeatherHandler.temperature = threading.Event(), 18.0
+    assert (await client.get(48.8566, 2.3522))["temperature_celsius"] == 15.0
+    assert client.get_stats()["stale_served"] == 1
+
+    # The refresh finishes in the background and updates the cell
+    refreshes = list(client._inflight.values())
+    assert refreshes
+    StubWeatherHandler.release.set()
+    await asyncio.gather(*refreshes)
+    assert (await client.get(48.8566, 2.3522))["temperature_celsius"] == 18.0
+
+    # Upstream errors fall back to the stale value too
+    StubWeatherHandler.status = 500
+    assert (await client.get(48.8566, 2.3522))["temperature_celsius"] == 18.0
+    assert client.get_stats()["upstream_errors"] == 1
+    await client.aclose()
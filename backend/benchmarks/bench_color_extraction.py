@@ -0,0 +1,75 @@
+# Per-image latency of dominant-color extraction: histogram quantizer vs. the
+# previous per-image KMeans path.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_color_extraction [image files...] [--repeat N]
+# Without image files a set of synthetic outfit-like images is generated.
+
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import numpy as np
+from PIL import Image, ImageDraw
+from sklearn.cluster import KMeans
+
+from app.services.color_quantizer import extract_palette
+
+
+def kmeans_colors(image: Image.Image, num_colors: int = 5) -> List[str]:
+    """The previous extract_colors implementation."""
+    image_work = image.copy()
+    image_work.thumbnail((100, 100))
+    pixels = np.array(image_work.convert("RGB")).reshape(-1, 3)
+    kmeans = KMeans(n_clusters=num_colors, random_state=0, n_init='auto').fit(pixels)
+    return [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in kmeans.cluster_centers_.astype(int)]
+
+
+def histogram_colors(image: Image.Image, num_colors: int = 5) -> List[str]:
+    return [color for color, _ in extract_palette(image, num_colors=num_colors)]
+
+
+def synthetic_images(count: int = 20, size: int = 800) -> List[Image.Image]:
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        background = tuple(int(c) for c in rng.integers(180, 256, 3))
+        image = Image.new("RGB", (size, size), background)
+        draw = ImageDraw.Draw(image)
+        for _ in range(rng.integers(2, 6)): # Garment-like blocks of color
+            x0, y0 = rng.integers(0, size // 2, 2)
+            width, height = rng.integers(size // 4, size // 2, 2)
+            draw.rectangle([int(x0), int(y0), int(x0 + width), int(y0 + height)], fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+        noise = rng.normal(0, 12, (size, size, 3)) # Fabric texture / lighting
+        images.append(Image.fromarray(np.clip(np.asarray(image) + noise, 0, 255).astype(np.uint8)))
+    return images
+
+
+def time_per_image(fn: Callable, images: List[Image.Image], repeat: int) -> List[float]:
+    fn(images[0]) # Warm-up
+    timings = []
+    for _ in range(repeat):
+        for image in images:
+            started = time.perf_counter()
+            fn(image)
+            timings.append((time.perf_counter() - started) * 1000.0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Color extraction benchmark")
+    parser.add_argument("images", nargs="*", help="Image files to use instead of synthetic images")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    images = [Image.open(path).convert("RGB") for path in args.images] or synthetic_images()
+    print(f"{len(images)} image(s) x {args.repeat} repeat(s)")
+    for name, fn in (("kmeans", kmeans_colors), ("histogram", histogram_colors)):
+        timings = sorted(time_per_image(fn, images, args.repeat))
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{name:>10}: mean {statistics.mean(timings):7.2f} ms  median {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Login throughput under a burst of concurrent logins (POST /api/login against a
+# temporary SQLite database): bcrypt verification inline on the event loop (the previous
+# behaviour) vs. on the password hashing pool. Besides logins/s and login latency, it
+# reports how long the event loop stalled and the latency of a trivial request made
+# while the burst is in flight, which is what every other user waits on.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_login_throughput [--logins 32] [--concurrency 16] [--rounds 12] [--workers 4]
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import model as models, security
+from app.db.database import Base, async_database_url, get_async_db
+from app.routers import auth
+from app.services import password_hashing
+from app.services.password_hashing import PasswordHasher
+
+
+async def inline_verify(plain_password, hashed_password):
+    """The previous login path: bcrypt called directly from the async handler."""
+    return password_hashing.get_password_hasher().verify_and_update(plain_password, hashed_password)
+
+
+def build_app(directory: Path, users: int, hasher: PasswordHasher) -> FastAPI:
+    url = f"sqlite:///{directory / 'bench.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    hashed_password = hasher.hash("password")
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(models.User(username=f"user{i}", email=f"user{i}@example.com", hashed_password=hashed_password) for i in range(users))
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api")
+    app.state.engine = create_async_engine(async_database_url(url))
+    AsyncSession = async_sessionmaker(app.state.engine, expire_on_commit=False)
+
+    async def override_get_db():
+        async with AsyncSession() as session:
+            yield session
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    app.dependency_overrides[get_async_db] = override_get_db
+    return app
+
+
+async def burst(app: FastAPI, logins: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stalls: List[float] = []
+    pings: List[float] = []
+    done = asyncio.Event()
+
+    async def login(http, i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await http.post("/api/login", json={"emailOrUsername": f"user{i}", "password": "password"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    async def watch_loop(http):
+        while not done.is_set():
+            due = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - due)
+            await http.get("/ping")
+            pings.append(time.perf_counter() - due) # Including the wait for the loop
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        watcher = asyncio.create_task(watch_loop(http))
+        started = time.perf_counter()
+        await asyncio.gather(*(login(http, i) for i in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await watcher
+
+    latencies.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "login_p50_ms": 1000 * statistics.median(latencies),
+        "login_p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "max_loop_stall_ms": 1000 * max(stalls, default=0.0),
+        "ping_max_ms": 1000 * max(pings, default=0.0),
+    }
+
+
+async def compare(app: FastAPI, logins: int, concurrency: int):
+    # One event loop for both runs: the app's async engine pool is bound to it
+    executor_verify = security.verify_password_async
+    for label, verify in (("inline", inline_verify), ("hashing pool", executor_verify)):
+        security.verify_password_async = verify
+        result = await burst(app, logins, concurrency)
+        print(
+            f"  {label:<13} {result['logins_per_s']:7.1f} logins/s   "
+            f"login p50 {result['login_p50_ms']:7.0f} ms  p95 {result['login_p95_ms']:7.0f} ms   "
+            f"max loop stall {result['max_loop_stall_ms']:6.0f} ms   ping max {result['ping_max_ms']:6.0f} ms"
+        )
+    security.verify_password_async = executor_verify
+    await app.state.engine.dispose() # aiosqlite connection threads keep the process alive
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(rounds=args.rounds, workers=args.workers, max_pending=args.logins)
+    password_hashing.password_hasher = hasher
+    with tempfile.TemporaryDirectory() as directory:
+        app = build_app(Path(directory), args.logins, hasher)
+        print(f"{args.logins} logins, concurrency {args.concurrency}, bcrypt cost {args.rounds}, {args.workers} hashing workers")
+
+        asyncio.run(compare(app, args.logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Outfit search latency: branch-and-bound top-K search (OutfitMatcher.create_top_outfits)
+# vs. the previous exhaustive create_complete_outfit loop, on synthetic wardrobes.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_outfit_search [--sizes 40 80 500] [--k 10] [--legacy-max 80]
+# The exhaustive loop is only timed up to --legacy-max items; beyond that it takes minutes.
+
+import argparse
+import random
+import time
+from typing import List
+
+from app.services.outfit_matcher import (
+    ClothingItem, OccasionType, OutfitMatcher, SeasonType, WeatherType
+)
+
+STYLES = ["casual", "formal", "business", "bohemian", "vintage", "modern", "minimalist", "edgy", "sporty", "classic"]
+# Rough category mix of a real wardrobe
+CATEGORY_WEIGHTS = {"top": 0.3, "bottom": 0.25, "shoes": 0.15, "outerwear": 0.15, "accessory": 0.15}
+
+
+def synthetic_wardrobe(n_items: int, seed: int = 0) -> List[ClothingItem]:
+    rng = random.Random(seed)
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    return [
+        ClothingItem(
+            id=str(i), name=f"item {i}", category=rng.choices(categories, weights)[0],
+            color="#%02x%02x%02x" % (rng.randrange(256), rng.randrange(256), rng.randrange(256)),
+            style=rng.choice(STYLES),
+            occasion_suitability=[OccasionType.CASUAL], season_suitability=[SeasonType.FALL],
+            weather_suitability=list(WeatherType),
+            formality_level=rng.randint(1, 10), comfort_level=rng.randint(1, 10), tags=[]
+        )
+        for i in range(n_items)
+    ]
+
+
+def legacy_complete_outfit(matcher: OutfitMatcher, wardrobe: List[ClothingItem], weather: WeatherType):
+    """The previous create_complete_outfit search loop (returns items and score)."""
+    categories = {}
+    for item in wardrobe:
+        categories.setdefault(item.category, []).append(item)
+    best_outfit, best_score = None, 0
+    for top in categories.get("top", []):
+        for bottom in categories.get("bottom", []):
+            for shoes in categories.get("shoes", []):
+                outfit_items = [top, bottom, shoes]
+                if weather in [WeatherType.RAINY, WeatherType.SNOWY, WeatherType.WINDY]:
+                    outerwear_options = categories.get("outerwear", [])
+                    if outerwear_options:
+                        outfit_items.append(max(outerwear_options, key=lambda x: matcher._calculate_outfit_score(outfit_items + [x])))
+                accessory_options = categories.get("accessory", [])
+                if accessory_options:
+                    outfit_items.append(max(accessory_options[:2], key=lambda x: matcher._calculate_outfit_score(outfit_items + [x])))
+                score = matcher._calculate_outfit_score(outfit_items)
+                if score > best_score:
+                    best_score, best_outfit = score, outfit_items
+    return best_outfit, best_score
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outfit search benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[40, 80, 200, 500])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--legacy-max", type=int, default=80)
+    args = parser.parse_args()
+
+    matcher = OutfitMatcher()
+    for weather in (WeatherType.SUNNY, WeatherType.RAINY):
+        print(f"weather={weather.value}")
+        for size in args.sizes:
+            wardrobe = synthetic_wardrobe(size)
+            search = lambda k: matcher.create_top_outfits(wardrobe, OccasionType.CASUAL, SeasonType.FALL, weather, k=k)
+            line = f"  {size:4d} items: top-1 {timed(lambda: search(1)):8.1f} ms  top-{args.k} {timed(lambda: search(args.k)):8.1f} ms"
+            if size <= args.legacy_max:
+                legacy_ms = timed(lambda: legacy_complete_outfit(matcher, wardrobe, weather), repeat=1)
+                legacy_items, legacy_score = legacy_complete_outfit(matcher, wardrobe, weather)
+                best = search(1)[0]
+                same = [i.id for i in best.items] == [i.id for i in legacy_items] and best.confidence_score == legacy_score
+                line += f"  exhaustive {legacy_ms:9.1f} ms  same result: {same}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Response encoding time for a wardrobe item list (default 500 items with 1280-float
+# embeddings): the previous path (List[float] schema, FastAPI JSON-mode dump, stdlib
+# json encoder) vs. the orjson response class on the FastAPI path and via
+# model_response, plus the summary view for reference.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_response_encoding [--items 500] [--dim 1280] [--repeat 5]
+
+import argparse
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, field_validator
+
+from app import tables as schemas
+from app.responses import NumpyORJSONResponse, model_response
+
+
+class LegacyWardrobeItem(schemas.WardrobeItemSummary):
+    """The previous schema: embeddings validated as a list of Python floats."""
+    ai_embedding: Optional[List[float]] = None
+
+    @field_validator("ai_embedding", mode="before")
+    @classmethod
+    def embedding_to_list(cls, value):
+        return value.tolist() if hasattr(value, "tolist") else value
+
+
+class FakeItem:
+    """Attribute bag standing in for an ORM row."""
+
+    def __init__(self, i: int, embedding: np.ndarray):
+        self.id, self.user_id, self.name, self.category = i, 1, f"item {i}", "Tops"
+        self.brand = self.size = self.price = self.material = self.season = self.last_worn = None
+        self.image_url = f"/static/wardrobe_images/{i}.jpg"
+        self.tags = ["casual", "cotton"]
+        self.favorite, self.times_worn = i % 7 == 0, i % 13
+        self.date_added = self.updated_at = datetime(2024, 1, 1, 12, 30)
+        self.ai_embedding = embedding
+        self.ai_dominant_colors = ["#1A1A1A", "#FFFFFF", "#C19A6B"]
+        self.ai_status = "completed"
+
+
+def fastapi_path(schema, response_class, rows) -> bytes:
+    """What FastAPI does for a response_model route: validate, JSON-mode dump, render."""
+    adapter = TypeAdapter(List[schema])
+    models = [schema.model_validate(row) for row in rows]
+    content = adapter.dump_python(adapter.validate_python(models), mode="json")
+    return response_class(content).body
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response encoding benchmark")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1280)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    rows = [FakeItem(i, rng.random(args.dim, dtype=np.float32)) for i in range(args.items)]
+
+    cases = {
+        "previous (List[float] + json)": lambda: fastapi_path(LegacyWardrobeItem, JSONResponse, rows),
+        "FastAPI path + orjson": lambda: fastapi_path(schemas.WardrobeItem, NumpyORJSONResponse, rows),
+        "model_response (numpy)": lambda: model_response([schemas.WardrobeItem.model_validate(r) for r in rows]).body,
+        "summary view": lambda: model_response([schemas.WardrobeItemSummary.model_validate(r) for r in rows]).body,
+    }
+    print(f"{args.items} items, {args.dim}-dim embeddings")
+    for name, fn in cases.items():
+        print(f"  {name:32s} {timed(fn, args.repeat):8.1f} ms  {len(fn()) / 1e6:6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
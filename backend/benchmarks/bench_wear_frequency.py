@@ -0,0 +1,105 @@
+# Item wear frequency query time for a large wardrobe (default 20000 items with
+# 1280-float embeddings, temporary SQLite database): the previous path (every item loaded
+# as a full ORM object and validated into the item schema) vs. the column-only window
+# function query behind GET /api/statistics/item-wear-frequency/, for one page and for
+# all rows.
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_wear_frequency [--items 20000] [--page 100] [--repeat 5]
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+from sqlalchemy import create_engine, desc, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import model as models, tables as schemas
+from app.db.database import Base
+
+
+def populate(url: str, items: int):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    rng = np.random.default_rng(0)
+    with sessionmaker(bind=engine)() as db:
+        db.add(models.User(id=1, username="bench", email="bench@example.com", hashed_password="x"))
+        db.commit()
+        for start in range(0, items, 1000):
+            db.add_all(
+                models.WardrobeItem(
+                    user_id=1, name=f"item {i}", category="Tops", times_worn=int(rng.integers(0, 50)),
+                    ai_embedding=rng.random(1280, dtype=np.float32), image_url=f"/static/wardrobe_images/{i}.jpg"
+                )
+                for i in range(start, min(items, start + 1000))
+            )
+            db.commit()
+    return engine
+
+
+def previous_path(db) -> int:
+    items = db.query(models.WardrobeItem).filter(models.WardrobeItem.user_id == 1) \
+        .order_by(desc(func.coalesce(models.WardrobeItem.times_worn, 0))).all()
+    return len([(schemas.WardrobeItem.model_validate(item), item.times_worn or 0) for item in items])
+
+
+def window_query(db, limit: int) -> int:
+    wear_count = func.coalesce(models.WardrobeItem.times_worn, 0)
+    rows = db.execute(
+        select(
+            models.WardrobeItem.id, models.WardrobeItem.name, models.WardrobeItem.category,
+            models.WardrobeItem.image_url, models.WardrobeItem.last_worn, wear_count.label("wear_count"),
+            func.rank().over(order_by=wear_count.desc()).label("rank"),
+            func.count().over().label("total_items"),
+            func.sum(wear_count).over().label("total_wears"),
+        )
+        .where(models.WardrobeItem.user_id == 1)
+        .order_by(wear_count.desc(), models.WardrobeItem.id)
+        .limit(limit)
+    ).all()
+    return len([
+        schemas.ItemWearFrequency(
+            item_id=row.id, name=row.name, category=row.category, image_url=row.image_url, last_worn=row.last_worn,
+            wear_count=row.wear_count, rank=row.rank, wear_share=round(row.wear_count * 100.0 / row.total_wears, 2)
+        )
+        for row in rows
+    ])
+
+
+def timed(fn: Callable[[], int], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Item wear frequency benchmark")
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--page", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = populate(f"sqlite:///{Path(directory) / 'bench.db'}", args.items)
+        Session = sessionmaker(bind=engine)
+        print(f"{args.items} items")
+        for label, fn in (
+            ("previous (full ORM rows)", previous_path),
+            (f"window query, page of {args.page}", lambda db: window_query(db, args.page)),
+            ("window query, all rows", lambda db: window_query(db, args.items)),
+        ):
+            def run():
+                with Session() as db:
+                    return fn(db)
+            print(f"  {label:<32} {1000 * timed(run, args.repeat):9.1f} ms")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from sqlalchemy import text
 
 import os
+import asyncio
 import logging
-import tensorflow as tf
 from app.db import database
 from app.db.database import Base
+from app.services.model_manager import AI_MODEL_LOADING, AI_WARMUP_MODELS
+from app.services.inference_server import AI_INFERENCE_MODE, check_inference_config
+from app.responses import NumpyORJSONResponse
 from app import models
 from app.routers import (
     auth,
@@ -35,36 +40,61 @@ async def lifespan(app: FastAPI):
     """
     Use FastAPI lifespan event to manage app startup and shutdown.
     Execute DDL statements in development mode only.
-    Preload AI models for better performance.
+    Load AI models according to AI_MODEL_LOADING.
     """
+    check_inference_config() # Refuse to start remote inference without an authkey
+
     if os.getenv("ENV") == "development" and os.getenv("RUN_MAIN") == "true":
         Base.metadata.drop_all(bind=database.engine)
         Base.metadata.create_all(bind=database.engine)
-    
-    # Preload AI models on startup
+
+    # Apply additive schema changes (new columns/tables) to existing databases
     try:
-        from app.services.model_manager import get_model_manager
-        model_manager = get_model_manager()
-        logging.info("Preloading AI models...")
-        
-        # Preload models in background
-        for model_name in ["mobilenet_v2", "efficientdet_lite0"]:
-            try:
-                model = model_manager.get_model(model_name)
-                if model is not None:
-                    logging.info(f"Model {model_name} preloaded successfully")
-                else:
-                    logging.warning(f"Failed to preload model {model_name}")
-            except Exception as e:
-                logging.error(f"Error preloading model {model_name}: {e}")
-        
-        logging.info("AI models preloading completed")
+        from app.db.migrations import run_migrations
+        applied = run_migrations(database.engine)
+        if applied:
+            logging.info(f"Applied schema migrations: {applied}")
     except Exception as e:
-        logging.error(f"Error during model preloading: {e}")
+        logging.error(f"Error applying schema migrations: {e}")
+
+    # Background AI enrichment for wardrobe uploads
+    from app.services.enrichment_queue import get_enrichment_queue, ENRICHMENT_ENABLED
+    enrichment_queue = get_enrichment_queue()
+    if ENRICHMENT_ENABLED:
+        enrichment_queue.start()
+    
+    # Pooled HTTP client for weather lookups, reused across requests
+    from app.services.weather_service import get_weather_client
+    weather_client = get_weather_client()
+    weather_client.start()
+
+    # Load AI models according to AI_MODEL_LOADING. Importing the model manager does not import TensorFlow.
+    from app.services.model_manager import get_model_manager
+    model_manager = get_model_manager()
+    warmup_task = None
+    if AI_INFERENCE_MODE == "remote":
+        logging.info("AI models are served by the shared inference process (AI_INFERENCE_MODE=remote)")
+    elif AI_MODEL_LOADING == "eager":
+        logging.info(f"Preloading AI models: {AI_WARMUP_MODELS}")
+        results = model_manager.warm_up(AI_WARMUP_MODELS)
+        logging.info(f"AI models preloading completed: {results}")
+    elif AI_MODEL_LOADING == "background":
+        logging.info(f"Warming up AI models in the background: {AI_WARMUP_MODELS}")
+        warmup_task = asyncio.create_task(asyncio.to_thread(model_manager.warm_up, AI_WARMUP_MODELS))
+    else:
+        logging.info("AI models will be loaded on first use")
     
     yield
 
-app = FastAPI(lifespan=lifespan)
+    if ENRICHMENT_ENABLED:
+        enrichment_queue.stop()
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await weather_client.aclose()
+    await database.async_engine.dispose()
+
+# orjson-based responses with native NumPy array support (see app/responses.py)
+app = FastAPI(lifespan=lifespan, default_response_class=NumpyORJSONResponse)
 
 # CORS configuration
 origins = [
@@ -82,6 +112,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"], # Pagination metadata readable by the browser app
 )
 
 # Static files
@@ -111,15 +142,81 @@ async def health_check():
     """Health check endpoint for deployment monitoring"""
     return {"status": "healthy", "service": "digital-wardrobe-backend"}
 
+async def _check_database() -> bool:
+    try:
+        async with database.async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logging.error(f"Readiness check: database unavailable: {e}")
+        return False
+
+@app.get("/ready")
+async def readiness_check(require_models: bool = False):
+    """
+    Readiness endpoint (distinct from /health liveness). Returns 503 when the database
+    is unreachable, or when require_models=true and the warm-up models are not loaded yet.
+    """
+    from app.services.model_manager import get_model_manager, MODEL_LOADED
+    from app.services.inference_server import get_inference_client
+    database_ok = await _check_database()
+    if AI_INFERENCE_MODE == "remote":
+        try:
+            model_states = await asyncio.to_thread(get_inference_client().get_model_states)
+        except Exception as e:
+            model_states = {name: {"status": "unreachable", "error": str(e)} for name in AI_WARMUP_MODELS}
+    else:
+        model_states = get_model_manager().get_model_states()
+    models_ready = all(model_states.get(name, {}).get("status") == MODEL_LOADED for name in AI_WARMUP_MODELS)
+
+    ready = database_ok and (models_ready or not require_models)
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "database": "ok" if database_ok else "unavailable",
+        "model_loading": AI_MODEL_LOADING,
+        "inference_mode": AI_INFERENCE_MODE,
+        "models_ready": models_ready,
+        "models": model_states,
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics/db-pool")
+async def database_pool_metrics():
+    """Connection pool usage per engine: checked-out connections, overflow, checkout wait times, timeouts and disconnects."""
+    from app.db.pool import get_pool_stats
+    return get_pool_stats()
+
+@app.get("/metrics/password-hashing")
+async def password_hashing_metrics():
+    """bcrypt pool usage: cost, workers, pending and rejected calls, average hash/verify time."""
+    from app.services.password_hashing import get_password_hasher
+    return get_password_hasher().get_stats()
+
 # Entry point
 if __name__ == "__main__":
     import uvicorn
+    # Several workers only make sense with AI_INFERENCE_MODE=remote; otherwise every
+    # worker loads its own copy of each model.
+    check_inference_config()
+    workers = int(os.getenv("UVICORN_WORKERS", "1"))
+    inference_process = None
+    if AI_INFERENCE_MODE == "remote" and os.getenv("AI_INFERENCE_SPAWN", "true").lower() == "true":
+        import multiprocessing
+        from app.services.inference_server import run_inference_server
+        inference_process = multiprocessing.Process(target=run_inference_server, name="inference-server", daemon=True)
+        inference_process.start()
+    elif workers > 1:
+        logging.warning(f"Running {workers} workers with AI_INFERENCE_MODE=local: each worker loads its own models")
     # In development, reload=True will set RUN_MAIN for our startup guard
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=False,
-        workers=1,
-        log_level="info",
-    )
+    try:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=False,
+            workers=workers,
+            log_level="info",
+        )
+    finally:
+        if inference_process is not None:
+            inference_process.terminate()